@@ -18,11 +18,18 @@ setup(name="docleaner-api",
             "fastapi",
             "jinja2",
             "motor",
+            "opentelemetry-api",
+            "pymongo[zstd]",
+            "zstandard",
             "podman",
+            "prometheus_client",
             "python-magic",
             "python-multipart",
             "uvicorn[standard]"
       ],
+      extras_require={
+            "tracing": ["opentelemetry-sdk", "opentelemetry-exporter-otlp-proto-http"]
+      },
       packages=find_namespace_packages(where="src", include=["docleaner.*"]),
       package_dir={"": "src"},
       url="https://docleaner.cert.tu-dresden.de",
@@ -0,0 +1,141 @@
+import asyncio
+import os
+import re
+import tempfile
+from typing import AsyncIterable, AsyncIterator, BinaryIO, Optional, Tuple
+
+from docleaner.api.services.blob_store import BlobStore
+
+
+class FilesystemBlobStore(BlobStore):
+    """Stores blobs as files within a local (or shared) directory. Files are sharded
+    into two levels of subdirectories named after the first characters of their key,
+    written atomically (via rename). File system operations are run
+    in a worker thread to avoid blocking the event loop."""
+
+    KEY_PATTERN = re.compile(r"^[0-9a-zA-Z_-]{5,}$")
+    STREAM_CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, root: str):
+        self._root = root
+        os.makedirs(root, exist_ok=True)
+
+    @property
+    def root(self) -> str:
+        return self._root
+
+    async def put(self, key: str, data: bytes) -> None:
+        await asyncio.to_thread(self._write, self._get_blob_path(key), data)
+
+    async def put_stream(self, key: str, chunks: AsyncIterable[bytes]) -> None:
+        path = self._get_blob_path(key)
+        f, tmp_path = await asyncio.to_thread(self._open_temporary, path)
+        try:
+            async for chunk in chunks:
+                await asyncio.to_thread(f.write, chunk)
+            await asyncio.to_thread(self._commit, f, tmp_path, path)
+        except BaseException:
+            f.close()
+            os.unlink(tmp_path)
+            raise
+
+    async def rename(self, key: str, new_key: str) -> None:
+        try:
+            await asyncio.to_thread(
+                self._replace, self._get_blob_path(key), self._get_blob_path(new_key)
+            )
+        except FileNotFoundError:
+            raise ValueError(f"No blob with key {key}")
+
+    async def get(self, key: str) -> bytes:
+        try:
+            return await asyncio.to_thread(self._read, self._get_blob_path(key))
+        except FileNotFoundError:
+            raise ValueError(f"No blob with key {key}")
+
+    async def get_stream(
+        self, key: str, start: int = 0, end: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        try:
+            f = await asyncio.to_thread(open, self._get_blob_path(key), "rb")
+        except FileNotFoundError:
+            raise ValueError(f"No blob with key {key}")
+        try:
+            await asyncio.to_thread(f.seek, start)
+            remaining = None if end is None else end - start
+            while remaining is None or remaining > 0:
+                chunk = await asyncio.to_thread(
+                    f.read,
+                    (
+                        self.STREAM_CHUNK_SIZE
+                        if remaining is None
+                        else min(self.STREAM_CHUNK_SIZE, remaining)
+                    ),
+                )
+                if len(chunk) == 0:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+        finally:
+            f.close()
+
+    async def delete(self, key: str) -> None:
+        try:
+            await asyncio.to_thread(os.unlink, self._get_blob_path(key))
+        except FileNotFoundError:
+            raise ValueError(f"No blob with key {key}")
+
+    def get_path(self, key: str) -> Optional[str]:
+        path = self._get_blob_path(key)
+        return path if os.path.isfile(path) else None
+
+    def _get_blob_path(self, key: str) -> str:
+        """Returns the sharded path of a blob, e.g. <root>/ab/cd/abcdef... for key abcdef...."""
+        if not self.KEY_PATTERN.match(key):
+            raise ValueError(f"Invalid blob key {key}")
+        return os.path.join(self._root, key[0:2], key[2:4], key)
+
+    @classmethod
+    def _write(cls, path: str, data: bytes) -> None:
+        if os.path.exists(path):
+            return
+        f, tmp_path = cls._open_temporary(path)
+        try:
+            f.write(data)
+            cls._commit(f, tmp_path, path)
+        except BaseException:
+            f.close()
+            os.unlink(tmp_path)
+            raise
+
+    @staticmethod
+    def _open_temporary(path: str) -> Tuple[BinaryIO, str]:
+        """Opens a temporary file within the directory of path. Blobs are written to such
+        a file first and renamed afterwards, so that readers never encounter partially
+        written blobs."""
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        return os.fdopen(fd, "wb"), tmp_path
+
+    @staticmethod
+    def _commit(f: BinaryIO, tmp_path: str, path: str) -> None:
+        """Persists a temporary file as path, unless a blob already exists there."""
+        f.flush()
+        os.fsync(f.fileno())
+        f.close()
+        if os.path.exists(path):
+            os.unlink(tmp_path)
+        else:
+            os.replace(tmp_path, path)
+
+    @staticmethod
+    def _replace(path: str, new_path: str) -> None:
+        os.makedirs(os.path.dirname(new_path), exist_ok=True)
+        os.replace(path, new_path)
+
+    @staticmethod
+    def _read(path: str) -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
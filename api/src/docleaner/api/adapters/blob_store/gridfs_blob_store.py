@@ -0,0 +1,76 @@
+from typing import Any, AsyncIterable, AsyncIterator, List, Optional
+
+from motor import motor_asyncio
+import gridfs
+
+from docleaner.api.services.blob_store import BlobStore
+
+
+class GridFSBlobStore(BlobStore):
+    """Stores blobs as GridFS files named after their key."""
+
+    STREAM_CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, fs: motor_asyncio.AsyncIOMotorGridFSBucket):  # type: ignore
+        self._fs = fs
+
+    async def put(self, key: str, data: bytes) -> None:
+        await self._fs.upload_from_stream(key, data)
+
+    async def put_stream(self, key: str, chunks: AsyncIterable[bytes]) -> None:
+        grid_in = self._fs.open_upload_stream(key)
+        try:
+            async for chunk in chunks:
+                await grid_in.write(chunk)
+        except BaseException:
+            await grid_in.abort()
+            raise
+        await grid_in.close()
+
+    async def rename(self, key: str, new_key: str) -> None:
+        file_ids = await self._find_file_ids(key)
+        if len(file_ids) == 0:
+            raise ValueError(f"No blob with key {key}")
+        for file_id in await self._find_file_ids(new_key):
+            await self._fs.delete(file_id)
+        for file_id in file_ids:
+            await self._fs.rename(file_id, new_key)
+
+    async def get(self, key: str) -> bytes:
+        try:
+            data = await (await self._fs.open_download_stream_by_name(key)).read()
+        except gridfs.errors.NoFile:
+            raise ValueError(f"No blob with key {key}")
+        assert isinstance(data, bytes)
+        return data
+
+    async def get_stream(
+        self, key: str, start: int = 0, end: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        try:
+            grid_out = await self._fs.open_download_stream_by_name(key)
+        except gridfs.errors.NoFile:
+            raise ValueError(f"No blob with key {key}")
+        grid_out.seek(start)
+        remaining = (grid_out.length if end is None else end) - start
+        while remaining > 0:
+            chunk = await grid_out.read(min(self.STREAM_CHUNK_SIZE, remaining))
+            if len(chunk) == 0:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+    async def delete(self, key: str) -> None:
+        # Concurrent uploads of the same blob might have left multiple files with the same name
+        file_ids = await self._find_file_ids(key)
+        if len(file_ids) == 0:
+            raise ValueError(f"No blob with key {key}")
+        for file_id in file_ids:
+            await self._fs.delete(file_id)
+
+    def get_path(self, key: str) -> Optional[str]:
+        return None
+
+    async def _find_file_ids(self, key: str) -> List[Any]:
+        """Returns the IDs of all GridFS files named key."""
+        return [grid_out._id async for grid_out in self._fs.find({"filename": key})]
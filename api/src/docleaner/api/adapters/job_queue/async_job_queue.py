@@ -1,7 +1,16 @@
 import asyncio
 import logging
-from typing import Literal, Set, Union
+import time
+from typing import Dict, List, Literal, Set, Tuple, Union
 
+from opentelemetry import context, propagate
+
+from docleaner.api.adapters.metrics.prometheus import (
+    JOBS_RUNNING,
+    QUEUE_DEPTH,
+    QUEUE_WAIT,
+)
+from docleaner.api.adapters.tracing.otel import tracer
 from docleaner.api.core.job import Job, JobStatus
 from docleaner.api.services.job_queue import JobQueue
 from docleaner.api.services.repository import Repository
@@ -9,6 +18,8 @@ from docleaner.api.services.sandbox import process_job_in_sandbox
 
 logger = logging.getLogger(__name__)
 
+QueuedJob = Tuple[str, str, float, Dict[str, str]]
+
 
 class AsyncJobQueue(JobQueue):
     """In-process job queue using Python's native asyncio library.
@@ -22,7 +33,8 @@ class AsyncJobQueue(JobQueue):
         self._ev_shutdown = asyncio.Event()
         self._repo = repo
         self._max_concurrent_jobs = max_concurrent_jobs
-        self._queue: asyncio.Queue[str] = asyncio.Queue()
+        # Queued jobs as (jid, job type id, time of enqueuing, trace context)
+        self._queue: asyncio.Queue[QueuedJob] = asyncio.Queue()
         self._worker_task = asyncio.create_task(self._worker())
         logger.info(
             "Job queue: in-process, async, concurrent job limit of %d",
@@ -31,15 +43,32 @@ class AsyncJobQueue(JobQueue):
 
     async def enqueue(self, job: Job) -> None:
         """Creates a new coroutine for job execution."""
-        if job.id is None:
-            raise ValueError("Only jobs with an ID can be enqueued")
-        if job.status != JobStatus.CREATED:
-            raise ValueError(
-                f"Can't enqueue job {job.id} due to its invalid status {job.status}"
-            )
-        logger.debug("Enqueuing job %s", job.id)
-        await self._repo.update_job(job.id, status=JobStatus.QUEUED)
-        await self._queue.put(job.id)
+        await self.enqueue_many([job])
+
+    async def enqueue_many(self, jobs: List[Job]) -> None:
+        """Validates all jobs prior to enqueuing any of them."""
+        for job in jobs:
+            if job.id is None:
+                raise ValueError("Only jobs with an ID can be enqueued")
+            if job.status != JobStatus.CREATED:
+                raise ValueError(
+                    f"Can't enqueue job {job.id} due to its invalid status {job.status}"
+                )
+        with tracer.start_as_current_span(
+            "AsyncJobQueue.enqueue", attributes={"docleaner.jobs": len(jobs)}
+        ):
+            await self._repo.update_jobs([job.id for job in jobs], JobStatus.QUEUED)
+            for job in jobs:
+                logger.debug("Enqueuing job %s", job.id)
+                await self._queue.put(
+                    (
+                        job.id,
+                        job.type.id,
+                        time.perf_counter(),
+                        job.params.trace_context,
+                    )
+                )
+                QUEUE_DEPTH.labels(job.type.id).inc()
 
     async def shutdown(self) -> None:
         self._ev_shutdown.set()
@@ -47,8 +76,8 @@ class AsyncJobQueue(JobQueue):
 
     async def _worker(self) -> None:
         running_tasks: Set[asyncio.Task[None]] = set()
-        await_shutdown: asyncio.Task[Union[Literal[True], str]] = asyncio.create_task(
-            self._ev_shutdown.wait()
+        await_shutdown: asyncio.Task[Union[Literal[True], QueuedJob]] = (
+            asyncio.create_task(self._ev_shutdown.wait())
         )
         while True:
             # Garbage-collect finished tasks
@@ -61,18 +90,30 @@ class AsyncJobQueue(JobQueue):
                 for t in completed_tasks:
                     running_tasks.remove(t)
             else:
-                await_job: asyncio.Task[Union[Literal[True], str]] = (
+                await_job: asyncio.Task[Union[Literal[True], QueuedJob]] = (
                     asyncio.create_task(self._queue.get())
                 )
                 done, pending = await asyncio.wait(
                     [await_job, await_shutdown], return_when=asyncio.FIRST_COMPLETED
                 )
                 if await_job in done:
-                    jid = await_job.result()
-                    assert isinstance(jid, str)
+                    queued_job = await_job.result()
+                    assert isinstance(queued_job, tuple)
+                    jid, job_type, enqueued, trace_context = queued_job
+                    wait = time.perf_counter() - enqueued
+                    QUEUE_DEPTH.labels(job_type).dec()
+                    QUEUE_WAIT.labels(job_type).observe(wait)
+                    # Join the trace the job was created in, the wait is recorded as span
+                    job_context = propagate.extract(trace_context)
+                    tracer.start_span(
+                        "AsyncJobQueue.dequeue",
+                        context=job_context,
+                        attributes={"docleaner.job.id": jid},
+                        start_time=time.time_ns() - int(wait * 1e9),
+                    ).end()
                     logger.debug("Processing job %s", jid)
                     running_tasks.add(
-                        asyncio.create_task(process_job_in_sandbox(jid, self._repo))
+                        asyncio.create_task(self._process(jid, job_type, job_context))
                     )
                     self._queue.task_done()
                 else:
@@ -82,3 +123,17 @@ class AsyncJobQueue(JobQueue):
                     for t in running_tasks:
                         await t
                     break
+
+    async def _process(
+        self, jid: str, job_type: str, job_context: context.Context
+    ) -> None:
+        """Processes a job within the given trace context
+        while accounting for it as running."""
+        running_jobs = JOBS_RUNNING.labels(job_type)
+        running_jobs.inc()
+        token = context.attach(job_context)
+        try:
+            await process_job_in_sandbox(jid, self._repo)
+        finally:
+            context.detach(token)
+            running_jobs.dec()
@@ -0,0 +1,112 @@
+import asyncio
+from contextvars import ContextVar
+import functools
+import inspect
+from typing import Any, Callable, Coroutine, TypeVar
+
+from prometheus_client import Counter, Gauge, Histogram
+
+T = TypeVar("T", bound=type)
+
+# Buckets (in seconds) for durations of job processing and queueing,
+# other durations (database and HTTP requests) use the default buckets
+JOB_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+QUEUE_DEPTH = Gauge(
+    "docleaner_queue_depth",
+    "Number of jobs waiting in the job queue",
+    ["job_type"],
+)
+QUEUE_WAIT = Histogram(
+    "docleaner_queue_wait_seconds",
+    "Time jobs spent in the job queue until their processing started",
+    ["job_type"],
+    buckets=JOB_BUCKETS,
+)
+JOBS_RUNNING = Gauge(
+    "docleaner_jobs_running",
+    "Number of jobs currently being processed",
+    ["job_type"],
+)
+SANDBOX_STAGE_DURATION = Histogram(
+    "docleaner_sandbox_stage_duration_seconds",
+    "Duration of the individual stages of processing a job in a sandbox",
+    ["job_type", "stage"],
+    buckets=JOB_BUCKETS,
+)
+SOURCE_BYTES = Counter(
+    "docleaner_source_bytes",
+    "Accumulated size of uploaded source documents passed to sandboxes",
+    ["job_type"],
+)
+RESULT_BYTES = Counter(
+    "docleaner_result_bytes",
+    "Accumulated size of result documents returned by sandboxes",
+    ["job_type"],
+)
+REPOSITORY_OPERATION_DURATION = Histogram(
+    "docleaner_repository_operation_duration_seconds",
+    "Duration of repository operations",
+    ["repository", "operation"],
+)
+MEMORY_REPOSITORY_BYTES = Gauge(
+    "docleaner_memory_repository_bytes",
+    "Size of the documents held by the in-memory repository, either resident or spilled to disk",
+    ["location"],
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "docleaner_http_request_duration_seconds",
+    "Time until the response to an HTTP request started (excluding streamed bodies)",
+    ["method", "route", "status"],
+)
+EVENT_LOOP_LAG = Histogram(
+    "docleaner_event_loop_lag_seconds",
+    "Delay of the event loop in resuming a task after a scheduled sleep",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+# Set while a repository operation is being observed, so that operations invoked by
+# another one (e.g. add_job() via add_jobs()) aren't recorded a second time
+_observing_repository: ContextVar[bool] = ContextVar(
+    "observing_repository", default=False
+)
+
+
+def instrument_repository(cls: T) -> T:
+    """Class decorator for repository adapters that records the duration
+    of all public coroutine methods defined by the decorated class.
+    Only the outermost of nested calls is recorded."""
+    for name, method in list(vars(cls).items()):
+        if not name.startswith("_") and inspect.iscoroutinefunction(method):
+            setattr(cls, name, _observe_duration(method, cls.__name__))
+    return cls
+
+
+async def monitor_event_loop_lag(interval: float = 1.0) -> None:
+    """Periodically measures by how much the event loop overshoots a scheduled
+    sleep of interval seconds, which indicates blocking code. Runs until cancelled."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, loop.time() - start - interval))
+
+
+def _observe_duration(
+    method: Callable[..., Coroutine[Any, Any, Any]], repository: str
+) -> Callable[..., Coroutine[Any, Any, Any]]:
+    @functools.wraps(method)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        if _observing_repository.get():
+            return await method(*args, **kwargs)
+        token = _observing_repository.set(True)
+        try:
+            # Labels are resolved on each call, so that only operations in use are exported
+            with REPOSITORY_OPERATION_DURATION.labels(
+                repository, method.__name__
+            ).time():
+                return await method(*args, **kwargs)
+        finally:
+            _observing_repository.reset(token)
+
+    return wrapper
@@ -1,10 +1,24 @@
+import bisect
 from collections import OrderedDict
 import dataclasses
-from datetime import timedelta
+from datetime import datetime, timedelta
+import heapq
+import itertools
 import logging
-from typing import Dict, List, Optional, Set
+import shutil
+import tempfile
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Set, Tuple
 
-from docleaner.api.core.job import Job, JobParams, JobStatus, JobType
+from docleaner.api.adapters.blob_store.filesystem_blob_store import (
+    FilesystemBlobStore,
+)
+from docleaner.api.adapters.metrics.prometheus import (
+    MEMORY_REPOSITORY_BYTES,
+    instrument_repository,
+)
+from docleaner.api.adapters.tracing.otel import trace_repository
+from docleaner.api.core.document import DocumentStream
+from docleaner.api.core.job import Job, JobParams, JobStatus, JobSummary, JobType
 from docleaner.api.core.metadata import DocumentMetadata
 from docleaner.api.core.session import Session
 from docleaner.api.services.clock import Clock
@@ -14,16 +28,52 @@ from docleaner.api.utils import generate_token
 logger = logging.getLogger(__name__)
 
 
+@trace_repository
+@instrument_repository
 class MemoryRepository(Repository):
-    """Repository implementation that stores all jobs in memory without further persistence."""
+    """Repository implementation that stores all jobs in memory without further persistence.
+    If max_resident_bytes is set, the documents (src and result) of finished jobs are spilled
+    to temporary files as soon as the size of all documents held in memory exceeds that budget.
+    Spilled documents are transparently reloaded when accessed."""
 
-    def __init__(self, clock: Clock) -> None:
+    def __init__(self, clock: Clock, max_resident_bytes: Optional[int] = None) -> None:
+        super().__init__()
         self._clock = clock
         self._jobs: Dict[str, Job] = (
             OrderedDict()
         )  # Preserve insertion order (job creation)
         self._sessions: Dict[str, Session] = {}
         self._total_jobs = 0
+        # Immutable summaries of all jobs (in insertion order), returned as-is by find_jobs()
+        self._summaries: Dict[str, JobSummary] = {}
+        # Sort key per job in the order of find_jobs(): (-created, seq, jid), with seq being
+        # an insertion sequence number that orders jobs created at the same time
+        self._job_keys: Dict[str, Tuple[float, int, str]] = {}
+        self._next_job_seq = itertools.count()
+        # Secondary indexes: Lists of sort keys of all jobs, of jobs per session and per
+        # status (each sorted by key) and a list of (updated, seq, jid) sorted by the time
+        # of each job's last update
+        self._jobs_by_key: List[Tuple[float, int, str]] = []
+        self._jobs_by_session: Dict[str, List[Tuple[float, int, str]]] = {}
+        self._jobs_by_status: Dict[JobStatus, List[Tuple[float, int, str]]] = {
+            s: [] for s in JobStatus
+        }
+        self._jobs_by_update: List[Tuple[datetime, int, str]] = []
+        self._max_resident_bytes = max_resident_bytes
+        self._resident_bytes = 0
+        self._spilled_bytes = 0
+        # Spilled documents per job: {jid: {"src"|"result": (spill key, size)}}
+        self._spilled: Dict[str, Dict[str, Tuple[str, int]]] = {}
+        self._spill_keys = itertools.count()
+        self._spill_store: Optional[FilesystemBlobStore] = None
+        # Finished jobs with documents held in memory (least recently finished first)
+        self._spillable_jobs: Dict[str, Job] = {}
+        MEMORY_REPOSITORY_BYTES.labels("resident").set_function(
+            lambda: self._resident_bytes
+        )
+        MEMORY_REPOSITORY_BYTES.labels("spilled").set_function(
+            lambda: self._spilled_bytes
+        )
         logger.info("Database backend: In-Memory Repository")
 
     async def add_job(
@@ -52,48 +102,138 @@ class MemoryRepository(Repository):
             session_id=sid,
         )
         self._jobs[jid] = job
+        self._job_keys[jid] = (-now.timestamp(), next(self._next_job_seq), jid)
+        self._update_summary(job)
+        self._add_to_indexes(job)
         if sid is not None:
             self._sessions[sid].updated = now
         self._total_jobs += 1
+        self._resident_bytes += len(src)
+        self._notify_updates(jid, sid)
+        await self._enforce_budget()
         return jid
 
-    async def find_job(self, jid: str) -> Optional[Job]:
-        return self._jobs.get(jid)
+    async def add_job_from_stream(
+        self,
+        src: AsyncIterator[bytes],
+        src_name: str,
+        job_type: JobType,
+        params: Optional[JobParams] = None,
+        sid: Optional[str] = None,
+    ) -> str:
+        # All documents are held in memory anyway
+        return await self.add_job(
+            b"".join([chunk async for chunk in src]), src_name, job_type, params, sid
+        )
+
+    async def add_jobs(
+        self,
+        sources: List[Tuple[AsyncIterator[bytes], str, JobType]],
+        params: Optional[JobParams] = None,
+        sid: Optional[str] = None,
+    ) -> List[str]:
+        if sid is not None and sid not in self._sessions:
+            raise ValueError(
+                f"Can't add to session {sid}, because the ID doesn't exist"
+            )
+        # Consume all documents first, so that either all or none of the jobs are created
+        documents = [
+            (b"".join([chunk async for chunk in src]), src_name, job_type)
+            for src, src_name, job_type in sources
+        ]
+        return [
+            await self.add_job(src, src_name, job_type, params, sid)
+            for src, src_name, job_type in documents
+        ]
+
+    async def find_job(self, jid: str, include_blobs: bool = True) -> Optional[Job]:
+        job = self._jobs.get(jid)
+        if job is None or (include_blobs and jid not in self._spilled):
+            return job
+        if include_blobs:
+            # Reload spilled documents without making them resident again
+            blobs = {"src": job.src, "result": job.result}
+            for field, (key, _) in self._spilled[jid].items():
+                assert self._spill_store is not None
+                blobs[field] = await self._spill_store.get(key)
+            j = dataclasses.replace(job, src=blobs["src"], result=blobs["result"])
+        else:
+            # Strip src and result document
+            j = dataclasses.replace(job, src=b"", result=b"")
+        j.updated = job.updated
+        return j
+
+    async def find_job_summary(self, jid: str) -> Optional[JobSummary]:
+        return self._summaries.get(jid)
 
     async def find_jobs(
         self,
         sid: Optional[str] = None,
         status: Optional[List[JobStatus]] = None,
         not_updated_for: Optional[timedelta] = None,
-    ) -> List[Job]:
-        result = []
+        after: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[JobSummary]:
+        result: List[JobSummary] = []
         if sid is not None and sid not in self._sessions:
             raise ValueError(
                 f"Can't fetch jobs from session {sid}, because the ID doesn't exist"
             )
-        for job in self._jobs.values():
-            if sid is not None and job.session_id != sid:
-                continue
-            if status is not None and job.status not in status:
+        if after is not None and after not in self._job_keys:
+            raise ValueError(f"Can't fetch jobs after {after}, no job with that ID")
+        if limit == 0:
+            return result
+        # Select candidates via the most specific index, then apply all other filters
+        indexes: List[List[Tuple[float, int, str]]]
+        if sid is not None:
+            indexes = [self._jobs_by_session[sid]]
+        elif status is not None:
+            indexes = [self._jobs_by_status[s] for s in set(status)]
+        elif not_updated_for is not None:
+            end = bisect.bisect_right(
+                self._jobs_by_update,
+                self._clock.now() - not_updated_for,
+                key=lambda entry: entry[0],
+            )
+            indexes = [
+                sorted(self._job_keys[jid] for _, _, jid in self._jobs_by_update[:end])
+            ]
+        else:
+            indexes = [self._jobs_by_key]
+        # Candidates are already sorted, so a page only visits the jobs after the given one
+        after_key = self._job_keys[after] if after is not None else None
+        for _, _, jid in heapq.merge(
+            *[self._iter_index(index, after_key) for index in indexes]
+        ):
+            summary = self._summaries[jid]
+            if status is not None and summary.status not in status:
                 continue
             if (
                 not_updated_for is not None
-                and self._clock.now() - job.updated < not_updated_for
+                and self._clock.now() - summary.updated < not_updated_for
             ):
                 continue
-            # Strip metadata, src and result document
-            j = dataclasses.replace(
-                job,
-                src=b"",
-                result=b"",
-                log=[],
-                metadata_result=None,
-                metadata_src=None,
-            )
-            j.updated = job.updated
-            result.append(j)
+            result.append(summary)
+            if len(result) == limit:
+                break
         return result
 
+    async def count_jobs(
+        self, sid: Optional[str] = None, status: Optional[List[JobStatus]] = None
+    ) -> int:
+        if sid is not None:
+            if sid not in self._sessions:
+                raise ValueError(
+                    f"Can't count jobs of session {sid}, because the ID doesn't exist"
+                )
+            jobs = self._jobs_by_session[sid]
+            if status is None:
+                return len(jobs)
+            return sum(1 for _, _, jid in jobs if self._summaries[jid].status in status)
+        if status is not None:
+            return sum(len(self._jobs_by_status[s]) for s in set(status))
+        return len(self._summaries)
+
     async def update_job(
         self,
         jid: str,
@@ -101,23 +241,71 @@ class MemoryRepository(Repository):
         metadata_src: Optional[DocumentMetadata] = None,
         result: Optional[bytes] = None,
         status: Optional[JobStatus] = None,
+        log: Optional[List[str]] = None,
     ) -> None:
         job = self._jobs.get(jid)
         if job is None:
             raise ValueError(f"No job with ID {jid}")
+        if log is not None:
+            job.log.extend(log)
         if metadata_result is not None:
             job.metadata_result = metadata_result
         if metadata_src is not None:
             job.metadata_src = metadata_src
         if result is not None:
+            self._resident_bytes += len(result) - len(job.result)
             job.result = result
-        if status is not None:
+        key = self._job_keys[jid]
+        if status is not None and status != job.status:
+            self._remove_from_index(self._jobs_by_status[job.status], key)
+            bisect.insort(self._jobs_by_status[status], key)
             job.status = status
         now = self._clock.now()
+        self._remove_from_index(self._jobs_by_update, (job.updated, key[1], jid))
         job.updated = now
+        bisect.insort(self._jobs_by_update, (now, key[1], jid))
+        self._update_summary(job)
         # If associated with a session, also update that session
         if job.session_id is not None:
             self._sessions[job.session_id].updated = now
+        self._notify_updates(jid, job.session_id)
+        if result is not None:
+            # Discard a previously spilled result
+            await self._unspill(jid, ["result"])
+        self._track_spillable(job)
+        await self._enforce_budget()
+
+    async def update_jobs(self, jids: List[str], status: JobStatus) -> None:
+        for jid in jids:
+            if jid not in self._jobs:
+                raise ValueError(f"No job with ID {jid}")
+        jobs = [self._jobs[jid] for jid in dict.fromkeys(jids)]
+        now = self._clock.now()
+        # Rebuild each affected index once instead of shifting it for every job
+        changed = [job for job in jobs if job.status != status]
+        for s in {job.status for job in changed}:
+            self._update_index(
+                self._jobs_by_status[s],
+                {self._job_keys[job.id] for job in changed if job.status == s},
+            )
+        self._update_index(
+            self._jobs_by_status[status],
+            added=[self._job_keys[job.id] for job in changed],
+        )
+        self._update_index(
+            self._jobs_by_update,
+            {(job.updated, self._job_keys[job.id][1], job.id) for job in jobs},
+            [(now, self._job_keys[job.id][1], job.id) for job in jobs],
+        )
+        for job in jobs:
+            job.status = status
+            job.updated = now
+            self._update_summary(job)
+            if job.session_id is not None:
+                self._sessions[job.session_id].updated = now
+            self._notify_updates(job.id, job.session_id)
+            self._track_spillable(job)
+        await self._enforce_budget()
 
     async def add_to_job_log(self, jid: str, entry: str) -> None:
         job = self._jobs.get(jid)
@@ -128,10 +316,26 @@ class MemoryRepository(Repository):
     async def delete_job(self, jid: str) -> None:
         if jid not in self._jobs:
             raise ValueError(f"Can't delete job {jid}, because the ID doesn't exist")
-        sid = self._jobs[jid].session_id
-        if sid is not None:
-            self._sessions[sid].updated = self._clock.now()
-        del self._jobs[jid]
+        job = self._jobs[jid]
+        self._remove_from_indexes(job)
+        if job.session_id is not None:
+            self._sessions[job.session_id].updated = self._clock.now()
+        await self._discard_job(job)
+
+    async def find_job_result_stream(self, jid: str) -> Optional[DocumentStream]:
+        job = await self.find_job(jid)
+        if job is None:
+            return None
+        return DocumentStream.from_bytes(job.result)
+
+    async def get_storage_stats(self) -> Tuple[int, int]:
+        # Documents aren't deduplicated
+        size = self._resident_bytes + self._spilled_bytes
+        return size, size
+
+    def get_memory_stats(self) -> Tuple[int, int]:
+        """Returns the size of all documents held in memory and of those spilled to disk."""
+        return self._resident_bytes, self._spilled_bytes
 
     async def get_total_job_count(self) -> int:
         return self._total_jobs
@@ -140,11 +344,26 @@ class MemoryRepository(Repository):
         sid = generate_token()
         session = Session(id=sid, created=self._clock.now())
         self._sessions[sid] = session
+        self._jobs_by_session[sid] = []
         return sid
 
     async def find_session(self, sid: str) -> Optional[Session]:
         return self._sessions.get(sid)
 
+    async def find_session_progress(
+        self, sid: str
+    ) -> Optional[Tuple[Session, int, int]]:
+        session = self._sessions.get(sid)
+        if session is None:
+            return None
+        jobs = self._jobs_by_session[sid]
+        finished_jobs = sum(
+            1
+            for _, _, jid in jobs
+            if self._summaries[jid].status in [JobStatus.SUCCESS, JobStatus.ERROR]
+        )
+        return session, len(jobs), finished_jobs
+
     async def find_sessions(
         self, not_updated_for: Optional[timedelta] = None
     ) -> Set[Session]:
@@ -163,6 +382,148 @@ class MemoryRepository(Repository):
             raise ValueError(
                 f"Can't delete session {sid}, because the ID doesn't exist"
             )
-        for job in await self.find_jobs(sid):
-            await self.delete_job(job.id)
+        jobs = [self._jobs[jid] for _, _, jid in self._jobs_by_session[sid]]
+        # Rebuild each affected index once instead of shifting it for every job
+        keys = {self._job_keys[job.id] for job in jobs}
+        self._update_index(self._jobs_by_key, keys)
+        for s in {job.status for job in jobs}:
+            self._update_index(self._jobs_by_status[s], keys)
+        self._update_index(
+            self._jobs_by_update,
+            {(job.updated, self._job_keys[job.id][1], job.id) for job in jobs},
+        )
+        for job in jobs:
+            await self._discard_job(job)
         del self._sessions[sid]
+        del self._jobs_by_session[sid]
+        self._notify_updates(sid)
+
+    async def disconnect(self) -> None:
+        if self._spill_store is not None:
+            shutil.rmtree(self._spill_store.root, ignore_errors=True)
+
+    def _update_summary(self, job: Job) -> None:
+        """(Re-)creates the summary of a job."""
+        summary = JobSummary(
+            id=job.id,
+            type=job.type,
+            status=job.status,
+            created=job.created,
+            updated=job.updated,
+            session_id=job.session_id,
+        )
+        self._summaries[job.id] = summary
+
+    def _add_to_indexes(self, job: Job) -> None:
+        """Inserts a new job into all secondary indexes."""
+        key = self._job_keys[job.id]
+        bisect.insort(self._jobs_by_key, key)
+        bisect.insort(self._jobs_by_status[job.status], key)
+        if job.session_id is not None:
+            bisect.insort(self._jobs_by_session[job.session_id], key)
+        bisect.insort(self._jobs_by_update, (job.updated, key[1], job.id))
+
+    def _remove_from_indexes(self, job: Job) -> None:
+        """Removes a job from all secondary indexes."""
+        key = self._job_keys[job.id]
+        self._remove_from_index(self._jobs_by_key, key)
+        self._remove_from_index(self._jobs_by_status[job.status], key)
+        if job.session_id is not None:
+            self._remove_from_index(self._jobs_by_session[job.session_id], key)
+        self._remove_from_index(self._jobs_by_update, (job.updated, key[1], job.id))
+
+    @staticmethod
+    def _remove_from_index(
+        index: List[Tuple[Any, int, str]], entry: Tuple[Any, int, str]
+    ) -> None:
+        del index[bisect.bisect_left(index, entry)]
+
+    @staticmethod
+    def _update_index(
+        index: List[Tuple[Any, int, str]],
+        removed: Optional[Set[Tuple[Any, int, str]]] = None,
+        added: Optional[List[Tuple[Any, int, str]]] = None,
+    ) -> None:
+        """Removes and inserts many entries of a sorted index at once, which rebuilds it
+        in linear time (removing or inserting entries one by one is quadratic)."""
+        if removed:
+            index[:] = [entry for entry in index if entry not in removed]
+        if added:
+            index.extend(added)
+            index.sort()
+
+    async def _discard_job(self, job: Job) -> None:
+        """Deletes a job that has already been removed from the secondary indexes."""
+        del self._jobs[job.id]
+        del self._summaries[job.id]
+        del self._job_keys[job.id]
+        self._spillable_jobs.pop(job.id, None)
+        self._resident_bytes -= len(job.src) + len(job.result)
+        self._notify_updates(job.id, job.session_id)
+        await self._unspill(job.id, ["src", "result"])
+
+    @staticmethod
+    def _iter_index(
+        index: List[Tuple[float, int, str]], after: Optional[Tuple[float, int, str]]
+    ) -> Iterator[Tuple[float, int, str]]:
+        """Yields the entries of a sorted index, starting after the given entry."""
+        start = 0 if after is None else bisect.bisect_right(index, after)
+        return (index[i] for i in range(start, len(index)))
+
+    async def _enforce_budget(self) -> None:
+        """Spills the documents of finished jobs (least recently finished first) to disk
+        until the size of all documents held in memory is within budget."""
+        if (
+            self._max_resident_bytes is None
+            or self._resident_bytes <= self._max_resident_bytes
+        ):
+            return
+        if self._spill_store is None:
+            self._spill_store = FilesystemBlobStore(
+                tempfile.mkdtemp(prefix="docleaner-spill-")
+            )
+        while (
+            self._resident_bytes > self._max_resident_bytes
+            and len(self._spillable_jobs) > 0
+        ):
+            job = self._spillable_jobs.pop(next(iter(self._spillable_jobs)))
+            for field in ["src", "result"]:
+                data: bytes = getattr(job, field)
+                if len(data) == 0:
+                    continue
+                key = f"{job.id}-{field}-{next(self._spill_keys)}"
+                await self._spill_store.put(key, data)
+                if self._jobs.get(job.id) is not job or getattr(job, field) is not data:
+                    # The job has been deleted or updated in the meantime
+                    await self._spill_store.delete(key)
+                    continue
+                logger.debug("Spilling %d bytes of job %s", len(data), job.id)
+                setattr(job, field, b"")
+                self._spilled.setdefault(job.id, {})[field] = (key, len(data))
+                self._resident_bytes -= len(data)
+                self._spilled_bytes += len(data)
+
+    def _track_spillable(self, job: Job) -> None:
+        """Keeps track of finished jobs with documents held in memory, which
+        are the candidates for spilling if the memory budget is exceeded."""
+        if self._max_resident_bytes is None:
+            return
+        if job.status in [JobStatus.SUCCESS, JobStatus.ERROR] and (
+            len(job.src) > 0 or len(job.result) > 0
+        ):
+            self._spillable_jobs.setdefault(job.id, job)
+        else:
+            self._spillable_jobs.pop(job.id, None)
+
+    async def _unspill(self, jid: str, fields: List[str]) -> None:
+        """Discards spilled documents of a job, e.g. because they have been replaced."""
+        spilled = self._spilled.get(jid, {})
+        for field in fields:
+            if field not in spilled:
+                continue
+            key, size = spilled.pop(field)
+            self._spilled_bytes -= size
+            if len(spilled) == 0:
+                del self._spilled[jid]
+            assert self._spill_store is not None
+            await self._spill_store.delete(key)
@@ -1,14 +1,27 @@
+import asyncio
 from dataclasses import asdict
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
+import hashlib
 import logging
-from typing import Any, Dict, List, Optional, Set, Union
+import traceback
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple, Union
 
+import bson
+from bson import Binary, ObjectId
 from motor import motor_asyncio
 import pymongo
+from pymongo import read_preferences
+from pymongo.write_concern import WriteConcern
+import zstandard
 
-from docleaner.api.core.job import Job, JobParams, JobStatus, JobType
+from docleaner.api.adapters.blob_store.gridfs_blob_store import GridFSBlobStore
+from docleaner.api.adapters.metrics.prometheus import instrument_repository
+from docleaner.api.adapters.tracing.otel import trace_repository
+from docleaner.api.core.document import DocumentStream
+from docleaner.api.core.job import Job, JobParams, JobStatus, JobSummary, JobType
 from docleaner.api.core.metadata import DocumentMetadata, MetadataField
 from docleaner.api.core.session import Session
+from docleaner.api.services.blob_store import BlobStore
 from docleaner.api.services.clock import Clock
 from docleaner.api.services.repository import Repository
 from docleaner.api.utils import generate_token
@@ -16,8 +29,63 @@ from docleaner.api.utils import generate_token
 logger = logging.getLogger(__name__)
 
 
+# Projection for job queries that only return the fields of a JobSummary
+JOB_SUMMARY_PROJECTION = {
+    "type": 1,
+    "status": 1,
+    "created": 1,
+    "updated": 1,
+    "session_id": 1,
+}
+# Projection for session queries that omit internal bookkeeping fields
+SESSION_PROJECTION = {"created": 1, "updated": 1}
+FINISHED_STATES = [JobStatus.SUCCESS, JobStatus.ERROR]
+# Supported codecs for compressed documents and metadata
+COMPRESSION_CODECS = ["zstd"]
+# BSON binary subtype (from the user-defined range) that tags zstd-compressed inline data
+ZSTD_BINARY_SUBTYPE = 0x80
+# Maximum number of garbage collection entries examined (or registered) at once
+SWEEP_BATCH_SIZE = 1000
+# Seconds between checks whether the deletion of a blob that's about to be stored again has finished
+BLOB_DELETION_POLL_INTERVAL = 0.05
+# Age after which the deletion of a blob is considered abandoned (e.g. due to a crash)
+BLOB_DELETION_TIMEOUT = timedelta(minutes=5)
+
+
+@trace_repository
+@instrument_repository
 class MongoDBRepository(Repository):
-    """Repository implementation backed by MongoDB."""
+    """Repository implementation backed by MongoDB.
+    Documents (job sources and results) smaller than inline_threshold bytes are stored inline
+    as binary data within their job document. Larger ones are content-addressed: They are saved
+    to blob_store (GridFS by default) once per SHA-256 digest and reference counted in the
+    'blobs' collection, job documents only refer to their digest. Jobs created prior to
+    content addressing might still refer to GridFS files directly (via an ObjectId).
+    Entries of new blobs are marked 'pending' until their data has been stored, entries of
+    blobs whose data is being deleted are marked 'deleting' (see _delete_blob()).
+    If ttl_expiry is set, stale jobs and sessions are purged by MongoDB itself via TTL indexes
+    on an 'expires_at' field, following the same rules as purge_jobs() and purge_sessions():
+    Finished standalone jobs expire job_keepalive after their last update, sessions expire
+    session_keepalive after their last update unless they have unfinished jobs.
+    Data not covered by TTL indexes (jobs of expired sessions and documents of expired jobs)
+    is removed by a background task every sweep_interval seconds. To do so without scanning
+    all stored data, sessions and standalone jobs with documents stored outside of their
+    job document are tracked in the 'pending_gc' collection along with the date they are due
+    to be checked for expiry (and, for jobs, their document references).
+    Refreshes of a session's 'updated' field caused by job operations are coalesced per
+    session and written behind within session_refresh_delay seconds (0 to write them
+    immediately). Single sessions are read with pending refreshes applied in memory,
+    listings of sessions flush all pending refreshes first.
+    client_options are passed on to the MongoDB client (e.g. pool size, timeouts, compressors).
+    List queries (find_jobs(), find_sessions() and statistics) are performed with
+    list_read_preference (e.g. 'secondaryPreferred' to offload them to replica set secondaries),
+    all other reads (including session checks and paging anchors) go to the primary.
+    Writes are performed with the write concern given in write_concerns for their operation
+    class ('create', 'update' or 'delete'), which defaults to the client's write concern.
+    If compression is set to a codec (currently only 'zstd'), documents and metadata are stored
+    compressed with the given compression_level whenever that reduces their size. Compressed
+    inline data is tagged via its BSON binary subtype, compressed blobs via a 'codec' field
+    of their entry in the 'blobs' collection. Uncompressed data remains readable."""
 
     def __init__(
         self,
@@ -26,13 +94,72 @@ class MongoDBRepository(Repository):
         db_host: str,
         db_port: int,
         db_name: str = "docleaner",
+        inline_threshold: int = 256 * 1024,
+        ttl_expiry: bool = False,
+        job_keepalive: timedelta = timedelta(minutes=10),
+        session_keepalive: timedelta = timedelta(hours=24),
+        sweep_interval: int = 60,
+        blob_store: Optional[BlobStore] = None,
+        session_refresh_delay: float = 1.0,
+        client_options: Optional[Dict[str, Any]] = None,
+        list_read_preference: str = "primary",
+        write_concerns: Optional[Dict[str, WriteConcern]] = None,
+        compression: Optional[str] = None,
+        compression_level: int = 3,
     ) -> None:
+        if compression is not None and compression not in COMPRESSION_CODECS:
+            raise ValueError(f"Unsupported compression codec {compression}")
+        super().__init__()
         self._clock = clock
-        self._job_types = job_types
-        self._mongo = motor_asyncio.AsyncIOMotorClient(db_host, db_port)
+        self._job_types = {jt.id: jt for jt in job_types}
+        self._inline_threshold = inline_threshold
+        self._ttl_expiry = ttl_expiry
+        self._job_keepalive = job_keepalive
+        self._session_keepalive = session_keepalive
+        self._sweep_interval = sweep_interval
+        self._compression = compression
+        self._compression_level = compression_level
+        self._mongo = motor_asyncio.AsyncIOMotorClient(
+            db_host, db_port, **(client_options or {})
+        )
         self._db = self._mongo[db_name]
+        if write_concerns is None:
+            write_concerns = {}
+        self._create_db = self._db.with_options(
+            write_concern=write_concerns.get("create")
+        )
+        self._update_db = self._db.with_options(
+            write_concern=write_concerns.get("update")
+        )
+        self._delete_db = self._db.with_options(
+            write_concern=write_concerns.get("delete")
+        )
+        self._list_db = self._db.with_options(
+            read_preference=read_preferences.make_read_preference(
+                read_preferences.read_pref_mode_from_name(list_read_preference), None
+            )
+        )
         self._fs = motor_asyncio.AsyncIOMotorGridFSBucket(self._db)  # type: ignore
+        self._blob_store = (
+            blob_store if blob_store is not None else GridFSBlobStore(self._fs)
+        )
+        self._sweeper_task: Optional[asyncio.Task[None]] = None
+        self._session_refresh_delay = session_refresh_delay
+        # Pending session refreshes: {sid: (updated, delta of unfinished jobs)}
+        self._pending_session_refreshes: Dict[str, Tuple[datetime, int]] = {}
+        # Refreshes that are currently being written by _flush_session_refreshes()
+        self._flushing_session_refreshes: Dict[str, Tuple[datetime, int]] = {}
+        self._session_flush_task: Optional[asyncio.Task[None]] = None
+        self._session_flush_lock = asyncio.Lock()
         logger.info("Database backend: MongoDB (%s:%d/%s)", db_host, db_port, db_name)
+        self._index_task = asyncio.create_task(self._create_indexes())
+        if self._ttl_expiry:
+            logger.info(
+                "Database expiry: TTL (jobs after %s, sessions after %s)",
+                job_keepalive,
+                session_keepalive,
+            )
+            self._sweeper_task = asyncio.create_task(self._sweeper())
 
     async def add_job(
         self,
@@ -42,55 +169,52 @@ class MongoDBRepository(Repository):
         params: Optional[JobParams] = None,
         sid: Optional[str] = None,
     ) -> str:
-        if sid is not None and await self._db.sessions.find_one({"_id": sid}) is None:
-            raise ValueError(
-                f"Can't add to session {sid}, because the ID doesn't exist"
-            )
-        if params is None:
-            params = JobParams()
-        jid = generate_token()
-        now = self._clock.now()
-        # Save source document to GridFS
-        logger.debug("Storing job %s src in GridFS", jid)
-        src_id = await self._fs.upload_from_stream(jid, src)
-        job = Job(
-            id=jid,
-            src=src_id,
-            name=src_name,
-            type=job_type,
-            params=params,
-            created=now,
-            session_id=sid,
+        return (await self._add_jobs([(src, src_name, job_type)], params, sid))[0]
+
+    async def add_job_from_stream(
+        self,
+        src: AsyncIterator[bytes],
+        src_name: str,
+        job_type: JobType,
+        params: Optional[JobParams] = None,
+        sid: Optional[str] = None,
+    ) -> str:
+        return (await self._add_jobs([(src, src_name, job_type)], params, sid))[0]
+
+    async def add_jobs(
+        self,
+        sources: List[Tuple[AsyncIterator[bytes], str, JobType]],
+        params: Optional[JobParams] = None,
+        sid: Optional[str] = None,
+    ) -> List[str]:
+        return await self._add_jobs(list(sources), params, sid)
+
+    async def find_job(self, jid: str, include_blobs: bool = True) -> Optional[Job]:
+        # Omits inline document data if blobs aren't requested
+        job_data = await self._db.jobs.find_one(
+            {"_id": jid}, None if include_blobs else {"src": 0, "result": 0}
         )
-        serialized_job = asdict(job)
-        serialized_job["type"] = job_type.id
-        serialized_job["_id"] = serialized_job.pop("id")
-        logger.debug("Adding job %s (%s)", jid, sid)
-        await self._db.jobs.insert_one(serialized_job)
-        if sid is not None:
-            await self._db.sessions.update_one({"_id": sid}, {"$set": {"updated": now}})
-        # Increment total job count
-        await self._db.stats.update_one(
-            {"type": "jobs"}, {"$inc": {"total_count": 1}}, upsert=True
+        if job_data is None:
+            return None
+        return await self._create_job_from_job_data(
+            job_data, include_blobs=include_blobs
         )
-        return jid
 
-    async def find_job(self, jid: str) -> Optional[Job]:
-        job_data = await self._db.jobs.find_one({"_id": jid})
+    async def find_job_summary(self, jid: str) -> Optional[JobSummary]:
+        job_data = await self._db.jobs.find_one({"_id": jid}, JOB_SUMMARY_PROJECTION)
         if job_data is None:
             return None
-        return await self._create_job_from_job_data(job_data)
+        return self._create_job_summary_from_job_data(job_data)
 
     async def find_jobs(
         self,
         sid: Optional[str] = None,
         status: Optional[List[JobStatus]] = None,
         not_updated_for: Optional[timedelta] = None,
-    ) -> List[Job]:
-        if sid is not None and await self._db.sessions.find_one({"_id": sid}) is None:
-            raise ValueError(
-                f"Can't fetch jobs from session {sid}, because the ID doesn't exist"
-            )
+        after: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[JobSummary]:
+        await self._check_session(sid)
         conditions: Dict[str, Any] = {}
         if sid is not None:
             conditions["session_id"] = sid
@@ -98,13 +222,37 @@ class MongoDBRepository(Repository):
             conditions["status"] = {"$in": status}
         if not_updated_for is not None:
             conditions["updated"] = {"$lt": self._clock.now() - not_updated_for}
+        if after is not None:
+            cursor = await self._db.jobs.find_one({"_id": after}, {"created": 1})
+            if cursor is None:
+                raise ValueError(f"Can't fetch jobs after {after}, no job with that ID")
+            conditions["$or"] = [
+                {"created": {"$lt": cursor["created"]}},
+                {"created": cursor["created"], "_id": {"$gt": after}},
+            ]
+        if limit == 0:
+            return []
+        # Jobs created at the same time are ordered by ID to allow paging through them
+        jobs = self._list_db.jobs.find(conditions, JOB_SUMMARY_PROJECTION).sort(
+            [("created", pymongo.DESCENDING), ("_id", pymongo.ASCENDING)]
+        )
+        if limit is not None:
+            jobs = jobs.limit(limit)
         return [
-            await self._create_job_from_job_data(job_data, True)
-            async for job_data in self._db.jobs.find(conditions).sort(
-                "created", pymongo.DESCENDING
-            )
+            self._create_job_summary_from_job_data(job_data) async for job_data in jobs
         ]
 
+    async def count_jobs(
+        self, sid: Optional[str] = None, status: Optional[List[JobStatus]] = None
+    ) -> int:
+        await self._check_session(sid)
+        conditions: Dict[str, Any] = {}
+        if sid is not None:
+            conditions["session_id"] = sid
+        if status is not None:
+            conditions["status"] = {"$in": status}
+        return int(await self._list_db.jobs.count_documents(conditions))
+
     async def update_job(
         self,
         jid: str,
@@ -112,54 +260,220 @@ class MongoDBRepository(Repository):
         metadata_src: Optional[DocumentMetadata] = None,
         result: Optional[bytes] = None,
         status: Optional[JobStatus] = None,
+        log: Optional[List[str]] = None,
     ) -> None:
-        job = await self._db.jobs.find_one({"_id": jid})
-        if job is None:
-            raise ValueError(f"No job with ID {jid}")
         now = self._clock.now()
         update_fields: Dict[str, Any] = {"updated": now}
         if metadata_result is not None:
-            update_fields["metadata_result"] = asdict(metadata_result)
+            update_fields["metadata_result"] = self._serialize_metadata(metadata_result)
         if metadata_src is not None:
-            update_fields["metadata_src"] = asdict(metadata_src)
+            update_fields["metadata_src"] = self._serialize_metadata(metadata_src)
         if result is not None:
-            # Save result document to GridFS
-            result_id = await self._fs.upload_from_stream(jid, result)
-            update_fields["result"] = result_id
+            update_fields["result"] = await self._store_blob(jid, result)
         if status is not None:
             update_fields["status"] = status
+            if self._ttl_expiry:
+                update_fields["expires_at"] = self._get_job_expiry(status, now)
         logger.debug("Updating job %s (%s)", jid, ", ".join(update_fields.keys()))
-        await self._db.jobs.update_one({"_id": jid}, {"$set": update_fields})
+        update: Dict[str, Any] = {"$set": update_fields}
+        if log is not None:
+            update["$push"] = {"log": {"$each": log}}
+        # Returns the job's session, status and (if replaced) result prior to the update
+        projection = {"session_id": 1, "status": 1}
+        if "result" in update_fields:
+            projection["result"] = 1
+        job = await self._update_db.jobs.find_one_and_update(
+            {"_id": jid}, update, projection=projection
+        )
+        if job is None:
+            if "result" in update_fields:
+                await self._delete_blob(update_fields["result"])
+            raise ValueError(f"No job with ID {jid}")
+        if "result" in update_fields:
+            await self._delete_blob(job["result"])
+            if (
+                self._ttl_expiry
+                and job["session_id"] is None
+                and (
+                    self._get_stored_ref(update_fields["result"]) is not None
+                    or self._get_stored_ref(job["result"]) is not None
+                )
+            ):
+                # Keep track of the result to release in case the job expires
+                await self._update_db.pending_gc.update_one(
+                    {"_id": jid},
+                    {
+                        "$set": {
+                            "result": self._get_stored_ref(update_fields["result"])
+                        },
+                        "$setOnInsert": {
+                            "type": "job",
+                            "due": self._to_utc(now) + self._job_keepalive,
+                            "src": None,
+                        },
+                    },
+                    upsert=True,
+                )
+        if self._ttl_expiry and status is None and job["status"] in FINISHED_STATES:
+            # Without a status change, a finished job's expiry date has to be refreshed separately
+            await self._update_db.jobs.update_one(
+                {"_id": jid},
+                {"$set": {"expires_at": self._get_job_expiry(job["status"], now)}},
+            )
         # If associated with a session, also update that session
         if job["session_id"] is not None:
-            await self._db.sessions.update_one(
-                {"_id": job["session_id"]}, {"$set": {"updated": now}}
+            unfinished_jobs = 0
+            if status is not None:
+                unfinished_jobs = int(status not in FINISHED_STATES) - int(
+                    job["status"] not in FINISHED_STATES
+                )
+            await self._refresh_session(job["session_id"], now, unfinished_jobs)
+        self._notify_updates(jid, job["session_id"])
+
+    async def update_jobs(self, jids: List[str], status: JobStatus) -> None:
+        now = self._clock.now()
+        update_fields: Dict[str, Any] = {"updated": now, "status": status}
+        if self._ttl_expiry:
+            update_fields["expires_at"] = self._get_job_expiry(status, now)
+        logger.debug("Updating status of %d jobs to %s", len(jids), status.name)
+        # The jobs' sessions and status prior to the update
+        jobs = [
+            job
+            async for job in self._db.jobs.find(
+                {"_id": {"$in": jids}}, {"session_id": 1, "status": 1}
             )
+        ]
+        missing_jids = set(jids) - {job["_id"] for job in jobs}
+        if len(missing_jids) > 0:
+            raise ValueError(f"No jobs with IDs {', '.join(missing_jids)}")
+        await self._update_db.jobs.update_many(
+            {"_id": {"$in": jids}}, {"$set": update_fields}
+        )
+        # If associated with sessions, also update those sessions
+        unfinished_jobs: Dict[str, int] = {}
+        for job in jobs:
+            if job["session_id"] is not None:
+                unfinished_jobs[job["session_id"]] = (
+                    unfinished_jobs.get(job["session_id"], 0)
+                    + int(status not in FINISHED_STATES)
+                    - int(job["status"] not in FINISHED_STATES)
+                )
+        for sid, delta in unfinished_jobs.items():
+            await self._refresh_session(sid, now, delta)
+        self._notify_updates(*jids, *unfinished_jobs)
 
     async def add_to_job_log(self, jid: str, entry: str) -> None:
-        if await self._db.jobs.find_one({"_id": jid}) is None:
+        result = await self._update_db.jobs.update_one(
+            {"_id": jid}, {"$push": {"log": entry}}
+        )
+        if result.matched_count == 0:
             raise ValueError(f"No job with ID {jid}")
-        await self._db.jobs.update_one({"_id": jid}, {"$push": {"log": entry}})
 
     async def delete_job(self, jid: str) -> None:
-        job_data = await self._db.jobs.find_one({"_id": jid})
+        logger.debug("Deleting job %s", jid)
+        gc_entry = None
+        if self._ttl_expiry:
+            # Claim the job's garbage collection entry, so that the sweeper doesn't
+            # release its documents as well
+            gc_entry = await self._delete_db.pending_gc.find_one_and_delete(
+                {"_id": jid}
+            )
+        job_data = await self._delete_db.jobs.find_one_and_delete(
+            {"_id": jid},
+            projection={"session_id": 1, "status": 1, "src": 1, "result": 1},
+        )
         if job_data is None:
+            if gc_entry is not None:
+                # The job has expired in the meantime
+                await self._delete_blob(gc_entry["src"])
+                await self._delete_blob(gc_entry["result"])
             raise ValueError(f"Can't delete job {jid}, because the ID doesn't exist")
         if job_data["session_id"] is not None:
-            await self._db.sessions.update_one(
-                {"_id": job_data["session_id"]},
-                {"$set": {"updated": self._clock.now()}},
-            )
-        # Delete associated fragments from GridFS
-        logger.debug("Deleting GridFS data of job %s", jid)
-        self._fs.delete(job_data["src"])
-        if job_data["result"] != b"":
-            self._fs.delete(job_data["result"])
-        logger.debug("Deleting job %s", jid)
-        await self._db.jobs.delete_one({"_id": jid})
+            await self._refresh_session(
+                job_data["session_id"],
+                self._clock.now(),
+                -int(job_data["status"] not in FINISHED_STATES),
+            )
+        self._notify_updates(jid, job_data["session_id"])
+        # Release associated documents
+        await self._delete_blob(job_data["src"])
+        await self._delete_blob(job_data["result"])
+
+    async def find_job_result_stream(self, jid: str) -> Optional[DocumentStream]:
+        job_data = await self._db.jobs.find_one({"_id": jid}, {"result": 1})
+        if job_data is None:
+            return None
+        if not isinstance(job_data["result"], str):
+            # Inline documents and GridFS files of jobs created prior to content addressing
+            return DocumentStream.from_bytes(await self._load_blob(job_data["result"]))
+        digest = job_data["result"]
+        blob_data = await self._db.blobs.find_one(
+            {"_id": digest}, {"size": 1, "codec": 1}
+        )
+        if blob_data is None:
+            raise ValueError(f"Blob {digest} of job {jid} is missing")
+        if "codec" in blob_data:
+            # Compressed blobs are decompressed on the fly and can't be served as files
+            return DocumentStream(
+                digest=digest,
+                size=blob_data["size"],
+                read=lambda start, end: self._read_compressed_blob(
+                    digest, blob_data["codec"], start, end
+                ),
+            )
+        return DocumentStream(
+            digest=digest,
+            size=blob_data["size"],
+            read=lambda start, end: self._blob_store.get_stream(digest, start, end),
+            path=self._blob_store.get_path(digest),
+        )
+
+    async def get_storage_stats(self) -> Tuple[int, int]:
+        referenced_size = stored_size = 0
+        async for inline_stats in self._list_db.jobs.aggregate(
+            [
+                {
+                    "$group": {
+                        "_id": None,
+                        "size": {
+                            "$sum": {
+                                "$add": [
+                                    {
+                                        "$cond": [
+                                            {"$eq": [{"$type": f"${f}"}, "binData"]},
+                                            {"$binarySize": f"${f}"},
+                                            0,
+                                        ]
+                                    }
+                                    for f in ["src", "result"]
+                                ]
+                            }
+                        },
+                    }
+                }
+            ]
+        ):
+            referenced_size += inline_stats["size"]
+            stored_size += inline_stats["size"]
+        async for blob_stats in self._list_db.blobs.aggregate(
+            [
+                {
+                    "$group": {
+                        "_id": None,
+                        "referenced_size": {
+                            "$sum": {"$multiply": ["$size", "$refcount"]}
+                        },
+                        "stored_size": {"$sum": {"$ifNull": ["$stored_size", "$size"]}},
+                    }
+                }
+            ]
+        ):
+            referenced_size += blob_stats["referenced_size"]
+            stored_size += blob_stats["stored_size"]
+        return referenced_size, stored_size
 
     async def get_total_job_count(self) -> int:
-        job_stats = await self._db.stats.find_one({"type": "jobs"})
+        job_stats = await self._list_db.stats.find_one({"type": "jobs"})
         if job_stats is None:
             return 0
         assert isinstance(job_stats["total_count"], int)
@@ -170,51 +484,916 @@ class MongoDBRepository(Repository):
         session = Session(id=sid, created=self._clock.now())
         serialized_session = asdict(session)
         serialized_session["_id"] = serialized_session.pop("id")
+        if self._ttl_expiry:
+            serialized_session["unfinished_jobs"] = 0
+            serialized_session["expires_at"] = (
+                self._to_utc(session.created) + self._session_keepalive
+            )
         logger.debug("Adding session %s", sid)
-        await self._db.sessions.insert_one(serialized_session)
+        await self._create_db.sessions.insert_one(serialized_session)
+        if self._ttl_expiry:
+            await self._create_db.pending_gc.insert_one(
+                {"_id": sid, "type": "session", "due": serialized_session["expires_at"]}
+            )
         return sid
 
     async def find_session(self, sid: str) -> Optional[Session]:
-        session_data = await self._db.sessions.find_one({"_id": sid})
+        session_data = await self._db.sessions.find_one(
+            {"_id": sid}, SESSION_PROJECTION
+        )
         if session_data is None:
             return None
-        return self._create_session_from_session_data(session_data)
+        session = self._create_session_from_session_data(session_data)
+        # Apply refreshes that haven't been written yet instead of flushing them
+        for refreshes in [
+            self._flushing_session_refreshes,
+            self._pending_session_refreshes,
+        ]:
+            if sid in refreshes:
+                session.updated = max(session.updated, refreshes[sid][0])
+        return session
+
+    async def find_session_progress(
+        self, sid: str
+    ) -> Optional[Tuple[Session, int, int]]:
+        session = await self.find_session(sid)
+        if session is None:
+            return None
+        # Count total and finished jobs with a single aggregation
+        counts = {
+            group["_id"]: group["count"]
+            async for group in self._list_db.jobs.aggregate(
+                [
+                    {"$match": {"session_id": sid}},
+                    {
+                        "$group": {
+                            "_id": {"$in": ["$status", FINISHED_STATES]},
+                            "count": {"$sum": 1},
+                        }
+                    },
+                ]
+            )
+        }
+        return session, sum(counts.values()), counts.get(True, 0)
 
     async def find_sessions(
         self, not_updated_for: Optional[timedelta] = None
     ) -> Set[Session]:
+        await self._flush_session_refreshes()
         conditions = {}
         if not_updated_for is not None:
             conditions["updated"] = {"$lt": self._clock.now() - not_updated_for}
         return {
             self._create_session_from_session_data(session_data)
-            async for session_data in self._db.sessions.find(conditions)
+            async for session_data in self._list_db.sessions.find(
+                conditions, SESSION_PROJECTION
+            )
         }
 
     async def delete_session(self, sid: str) -> None:
-        session = await self.find_session(sid)
-        if session is None:
+        logger.debug("Deleting session %s and all associated jobs", sid)
+        self._pending_session_refreshes.pop(sid, None)
+        if (
+            await self._delete_db.sessions.find_one_and_delete(
+                {"_id": sid}, projection={"_id": 1}
+            )
+            is None
+        ):
             raise ValueError(
                 f"Can't delete session {sid}, because the ID doesn't exist"
             )
-        # Delete associated job fragments from GridFS
-        logger.debug("Deleting GridFS data of session %s", sid)
-        async for job_data in self._db.jobs.find({"session_id": sid}):
-            if job_data["src"] != b"":
-                self._fs.delete(job_data["src"])
-            if job_data["result"] != b"":
-                self._fs.delete(job_data["result"])
-        logger.debug("Deleting session %s and all associated jobs", sid)
-        await self._db.jobs.delete_many({"session_id": sid})
-        await self._db.sessions.delete_one({"_id": sid})
+        await self._delete_session_jobs({"session_id": sid})
+        if self._ttl_expiry:
+            await self._delete_db.pending_gc.delete_one({"_id": sid})
+        self._notify_updates(sid)
 
     async def disconnect(self) -> None:
+        self._index_task.cancel()
+        if self._sweeper_task is not None:
+            self._sweeper_task.cancel()
+        # Waits for a write-behind that's already in progress and writes all remaining
+        # refreshes, the write-behind task is only cancelled afterwards (while idle)
+        await self._flush_session_refreshes()
+        if self._session_flush_task is not None:
+            self._session_flush_task.cancel()
         self._mongo.close()
 
+    def _get_job_expiry(self, status: JobStatus, now: datetime) -> Optional[datetime]:
+        """Returns the TTL expiry date for a job with the given status, which is only set for finished jobs.
+        Jobs associated with a session receive one as well, but aren't covered by the TTL index.
+        """
+        if status in FINISHED_STATES:
+            return self._to_utc(now) + self._job_keepalive
+        return None
+
     @staticmethod
+    def _to_utc(timestamp: datetime) -> datetime:
+        """Converts a timestamp of the clock (naive local time) to naive UTC. Dates that are
+        compared to the current time by MongoDB's TTL monitor (expiry dates) or by the sweeper
+        (garbage collection due dates) are stored in UTC, independent of the host's time zone.
+        """
+        return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+
+    async def _check_session(self, sid: Optional[str]) -> None:
+        """Raises a ValueError if sid is given, but no such session exists."""
+        if sid is not None and await self._db.sessions.find_one({"_id": sid}) is None:
+            raise ValueError(
+                f"Can't fetch jobs from session {sid}, because the ID doesn't exist"
+            )
+
+    async def _refresh_session(
+        self,
+        sid: str,
+        now: datetime,
+        unfinished_jobs: int = 0,
+        check_existence: bool = False,
+    ) -> bool:
+        """Refreshes the 'updated' field of a session. With TTL expiry, the session's number
+        of unfinished jobs is changed by the given delta as well. Refreshes are coalesced with
+        other pending refreshes of the same session and written behind, unless check_existence
+        is set: Then, the refresh is written immediately (together with a pending one) to
+        determine whether the session exists. Returns False if the session doesn't exist.
+        """
+        if self._session_refresh_delay <= 0 or check_existence:
+            pending = self._pending_session_refreshes.pop(sid, None)
+            if pending is not None:
+                now, unfinished_jobs = (
+                    max(pending[0], now),
+                    pending[1] + unfinished_jobs,
+                )
+            try:
+                session_data = await self._update_db.sessions.find_one_and_update(
+                    {"_id": sid},
+                    self._get_session_refresh_update(now, unfinished_jobs),
+                    projection={"_id": 1},
+                )
+            except pymongo.errors.PyMongoError:
+                if pending is not None:
+                    self._add_session_refreshes({sid: pending})
+                raise
+            return session_data is not None
+        self._add_session_refreshes({sid: (now, unfinished_jobs)})
+        return True
+
+    def _add_session_refreshes(
+        self, refreshes: Dict[str, Tuple[datetime, int]]
+    ) -> None:
+        """Coalesces refreshes with pending ones and schedules writing them behind."""
+        for sid, (now, unfinished_jobs) in refreshes.items():
+            pending = self._pending_session_refreshes.get(sid)
+            if pending is None:
+                self._pending_session_refreshes[sid] = (now, unfinished_jobs)
+            else:
+                self._pending_session_refreshes[sid] = (
+                    max(pending[0], now),
+                    pending[1] + unfinished_jobs,
+                )
+        if self._session_flush_task is None or self._session_flush_task.done():
+            self._session_flush_task = asyncio.create_task(
+                self._write_behind_session_refreshes()
+            )
+
+    async def _write_behind_session_refreshes(self) -> None:
+        """Flushes pending session refreshes after the refresh delay until none are left,
+        including those that have been added while a previous flush was in progress."""
+        while len(self._pending_session_refreshes) > 0:
+            await asyncio.sleep(self._session_refresh_delay)
+            await self._flush_session_refreshes()
+
+    async def _flush_session_refreshes(self) -> None:
+        """Writes all pending session refreshes with a single bulk operation.
+        Refreshes that fail are added to the pending ones again to be retried later."""
+        async with self._session_flush_lock:
+            if len(self._pending_session_refreshes) == 0:
+                return
+            refreshes = self._flushing_session_refreshes = (
+                self._pending_session_refreshes
+            )
+            self._pending_session_refreshes = {}
+            logger.debug("Refreshing %d sessions", len(refreshes))
+            try:
+                await self._update_db.sessions.bulk_write(
+                    [
+                        pymongo.UpdateOne(
+                            {"_id": sid},
+                            self._get_session_refresh_update(now, unfinished_jobs),
+                        )
+                        for sid, (now, unfinished_jobs) in refreshes.items()
+                    ],
+                    ordered=False,
+                )
+            except pymongo.errors.BulkWriteError as e:
+                # Only retry the refreshes that haven't been applied
+                sids = list(refreshes.keys())
+                failed = {
+                    sids[error["index"]]: refreshes[sids[error["index"]]]
+                    for error in e.details.get("writeErrors", [])
+                }
+                logger.warning(
+                    f"Failed to refresh sessions {', '.join(failed.keys())}, retrying\n"
+                    f"{traceback.format_exc()}"
+                )
+                self._add_session_refreshes(failed)
+            except pymongo.errors.PyMongoError:
+                logger.warning(
+                    f"Failed to refresh sessions {', '.join(refreshes.keys())}, retrying\n"
+                    f"{traceback.format_exc()}"
+                )
+                self._add_session_refreshes(refreshes)
+            finally:
+                self._flushing_session_refreshes = {}
+
+    def _get_session_refresh_update(
+        self, now: datetime, unfinished_jobs: int
+    ) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+        """Returns the update document to refresh a session (see _refresh_session())."""
+        update: Union[Dict[str, Any], List[Dict[str, Any]]]
+        if self._ttl_expiry:
+            update = [
+                {
+                    "$set": {
+                        "updated": now,
+                        # Counters of sessions created while TTL expiry was disabled
+                        # are initialized by _backfill_expiry() instead
+                        "unfinished_jobs": {
+                            "$cond": [
+                                {"$eq": [{"$type": "$unfinished_jobs"}, "missing"]},
+                                "$$REMOVE",
+                                {
+                                    "$max": [
+                                        0,
+                                        {"$add": ["$unfinished_jobs", unfinished_jobs]},
+                                    ]
+                                },
+                            ]
+                        },
+                    }
+                },
+                {
+                    "$set": {
+                        "expires_at": {
+                            "$switch": {
+                                "branches": [
+                                    {
+                                        "case": {
+                                            "$eq": [
+                                                {"$type": "$unfinished_jobs"},
+                                                "missing",
+                                            ]
+                                        },
+                                        "then": "$expires_at",
+                                    },
+                                    {
+                                        "case": {"$gt": ["$unfinished_jobs", 0]},
+                                        "then": None,
+                                    },
+                                ],
+                                "default": self._to_utc(now) + self._session_keepalive,
+                            }
+                        }
+                    }
+                },
+            ]
+        else:
+            update = {"$set": {"updated": now}}
+        return update
+
+    async def _create_indexes(self) -> None:
+        """Background task that sets up the indexes required independent of TTL expiry."""
+        try:
+            # Listing (and paging through) the jobs of a session in the order of find_jobs()
+            await self._db.jobs.create_index(
+                [
+                    ("session_id", pymongo.ASCENDING),
+                    ("created", pymongo.DESCENDING),
+                    ("_id", pymongo.ASCENDING),
+                ]
+            )
+        except pymongo.errors.PyMongoError:
+            logger.error(f"Could not create indexes:\n{traceback.format_exc()}")
+
+    async def _sweeper(self) -> None:
+        """Background task for TTL expiry that sets up the required indexes, registers
+        untracked data for garbage collection and periodically invokes _sweep()."""
+        try:
+            # Only standalone jobs expire on their own, jobs within a session expire with the session
+            await self._db.jobs.create_index(
+                "expires_at",
+                expireAfterSeconds=0,
+                partialFilterExpression={"session_id": {"$type": "null"}},
+            )
+            await self._db.sessions.create_index("expires_at", expireAfterSeconds=0)
+            await self._db.pending_gc.create_index("due")
+            await self._backfill_expiry()
+            await self._register_pending_gc()
+        except pymongo.errors.PyMongoError:
+            logger.error(f"Could not create TTL indexes:\n{traceback.format_exc()}")
+            return
+        while True:
+            try:
+                await self._sweep()
+            except pymongo.errors.PyMongoError:
+                logger.warning(f"Exception during sweep:\n{traceback.format_exc()}")
+            await asyncio.sleep(self._sweep_interval)
+
+    async def _backfill_expiry(self) -> None:
+        """Sets the expiry dates of finished standalone jobs and sessions as well as the number
+        of unfinished jobs per session for data created while TTL expiry was disabled, based on
+        the date of their last update. Afterwards, they expire like any other job or session.
+        """
+        local_now = self._clock.now()
+        # Dates of the last update are stored in local time, expiry dates in UTC
+        utc_offset = self._to_utc(local_now) - local_now
+        await self._update_db.jobs.update_many(
+            {
+                "session_id": None,
+                "status": {"$in": FINISHED_STATES},
+                "expires_at": {"$exists": False},
+            },
+            [
+                {
+                    "$set": {
+                        "expires_at": {
+                            "$add": [
+                                "$updated",
+                                (utc_offset + self._job_keepalive)
+                                // timedelta(milliseconds=1),
+                            ]
+                        }
+                    }
+                }
+            ],
+        )
+        unfinished_jobs = {
+            group["_id"]: group["count"]
+            async for group in self._db.jobs.aggregate(
+                [
+                    {
+                        "$match": {
+                            "session_id": {"$ne": None},
+                            "status": {"$nin": FINISHED_STATES},
+                        }
+                    },
+                    {"$group": {"_id": "$session_id", "count": {"$sum": 1}}},
+                ]
+            )
+        }
+        requests = []
+        async for session_data in self._db.sessions.find(
+            {"unfinished_jobs": {"$exists": False}}, {"updated": 1}
+        ):
+            count = unfinished_jobs.get(session_data["_id"], 0)
+            requests.append(
+                pymongo.UpdateOne(
+                    {"_id": session_data["_id"], "unfinished_jobs": {"$exists": False}},
+                    {
+                        "$set": {
+                            "unfinished_jobs": count,
+                            "expires_at": (
+                                None
+                                if count > 0
+                                else session_data["updated"]
+                                + utc_offset
+                                + self._session_keepalive
+                            ),
+                        }
+                    },
+                )
+            )
+            if len(requests) >= SWEEP_BATCH_SIZE:
+                await self._update_db.sessions.bulk_write(requests, ordered=False)
+                requests = []
+        if len(requests) > 0:
+            await self._update_db.sessions.bulk_write(requests, ordered=False)
+
+    async def _register_pending_gc(self) -> None:
+        """Adds garbage collection entries (due immediately) for all sessions with jobs and all
+        standalone jobs with documents stored outside of their job document, which covers data
+        created while TTL expiry was disabled. Existing entries are left untouched."""
+        now = self._to_utc(self._clock.now())
+        requests = []
+        for sid in await self._db.jobs.distinct(
+            "session_id", {"session_id": {"$ne": None}}
+        ):
+            requests.append(
+                pymongo.UpdateOne(
+                    {"_id": sid},
+                    {"$setOnInsert": {"type": "session", "due": now}},
+                    upsert=True,
+                )
+            )
+        async for job_data in self._db.jobs.find(
+            {
+                "session_id": None,
+                "$or": [
+                    {"src": {"$type": ["objectId", "string"]}},
+                    {"result": {"$type": ["objectId", "string"]}},
+                ],
+            },
+            {"src": 1, "result": 1},
+        ):
+            requests.append(
+                pymongo.UpdateOne(
+                    {"_id": job_data["_id"]},
+                    {
+                        "$setOnInsert": {
+                            "type": "job",
+                            "due": now,
+                            "src": self._get_stored_ref(job_data["src"]),
+                            "result": self._get_stored_ref(job_data["result"]),
+                        }
+                    },
+                    upsert=True,
+                )
+            )
+            if len(requests) >= SWEEP_BATCH_SIZE:
+                await self._db.pending_gc.bulk_write(requests, ordered=False)
+                requests = []
+        if len(requests) > 0:
+            await self._db.pending_gc.bulk_write(requests, ordered=False)
+
+    async def _sweep(self) -> None:
+        """Removes data left behind by MongoDB's TTL monitor: Documents of expired jobs and finished
+        jobs of expired sessions. Only examines garbage collection entries that are due (in batches
+        of SWEEP_BATCH_SIZE), entries of jobs and sessions that still exist are rescheduled.
+        """
+        now = self._to_utc(self._clock.now())
+        while True:
+            entries = await (
+                self._db.pending_gc.find({"due": {"$lte": now}})
+                .sort("due", pymongo.ASCENDING)
+                .limit(SWEEP_BATCH_SIZE)
+                .to_list(None)
+            )
+            await self._sweep_jobs([e for e in entries if e["type"] == "job"], now)
+            await self._sweep_sessions(
+                [e for e in entries if e["type"] == "session"], now
+            )
+            if len(entries) < SWEEP_BATCH_SIZE:
+                break
+        # Temporary files of uploads to GridFS that have been interrupted (e.g. by a restart)
+        async for file_data in self._db["fs.files"].find(
+            {
+                "filename": {"$regex": "^upload-"},
+                "uploadDate": {"$lt": now - timedelta(seconds=self._sweep_interval)},
+            },
+            {"_id": 1},
+        ):
+            await self._fs.delete(file_data["_id"])
+
+    async def _sweep_jobs(self, entries: List[Dict[str, Any]], now: datetime) -> None:
+        """Releases the documents of expired jobs given as garbage collection entries."""
+        existing_jobs = {
+            job_data["_id"]: job_data
+            async for job_data in self._db.jobs.find(
+                {"_id": {"$in": [e["_id"] for e in entries]}}, {"expires_at": 1}
+            )
+        }
+        reschedules = []
+        for entry in entries:
+            job_data = existing_jobs.get(entry["_id"])
+            if job_data is not None:
+                reschedules.append(
+                    self._reschedule_gc_entry(
+                        entry["_id"],
+                        job_data.get("expires_at"),
+                        self._job_keepalive,
+                        now,
+                    )
+                )
+            elif (
+                await self._delete_db.pending_gc.delete_one({"_id": entry["_id"]})
+            ).deleted_count == 1:
+                await self._delete_blob(entry["src"])
+                await self._delete_blob(entry["result"])
+        if len(reschedules) > 0:
+            await self._update_db.pending_gc.bulk_write(reschedules, ordered=False)
+        logger.debug("Swept %d expired jobs", len(entries) - len(reschedules))
+
+    async def _sweep_sessions(
+        self, entries: List[Dict[str, Any]], now: datetime
+    ) -> None:
+        """Deletes the finished jobs of expired sessions given as garbage collection entries.
+        Entries are kept until all jobs of their session have finished and been deleted.
+        """
+        existing_sessions = {
+            session_data["_id"]: session_data
+            async for session_data in self._db.sessions.find(
+                {"_id": {"$in": [e["_id"] for e in entries]}}, {"expires_at": 1}
+            )
+        }
+        reschedules = []
+        for entry in entries:
+            sid = entry["_id"]
+            if sid in existing_sessions:
+                reschedules.append(
+                    self._reschedule_gc_entry(
+                        sid,
+                        existing_sessions[sid].get("expires_at"),
+                        self._session_keepalive,
+                        now,
+                    )
+                )
+                continue
+            await self._delete_session_jobs(
+                {"session_id": sid, "status": {"$in": FINISHED_STATES}}
+            )
+            if await self._db.jobs.find_one({"session_id": sid}, {"_id": 1}) is None:
+                await self._delete_db.pending_gc.delete_one({"_id": sid})
+                logger.debug("Swept jobs of expired session %s", sid)
+            else:
+                # Unfinished jobs are swept once they have finished
+                reschedules.append(
+                    self._reschedule_gc_entry(sid, None, self._job_keepalive, now)
+                )
+        if len(reschedules) > 0:
+            await self._update_db.pending_gc.bulk_write(reschedules, ordered=False)
+
+    def _reschedule_gc_entry(
+        self,
+        gc_id: str,
+        expires_at: Optional[datetime],
+        keepalive: timedelta,
+        now: datetime,
+    ) -> pymongo.UpdateOne:
+        """Returns an update that postpones a garbage collection entry to the given expiry
+        date (or, if there's none, by keepalive), but at least until the next sweep."""
+        due = max(
+            expires_at if expires_at is not None else now + keepalive,
+            now + timedelta(seconds=self._sweep_interval),
+        )
+        return pymongo.UpdateOne({"_id": gc_id}, {"$set": {"due": due}})
+
+    async def _delete_session_jobs(self, conditions: Dict[str, Any]) -> None:
+        """Deletes all jobs matching conditions. Jobs with documents stored outside of their
+        job document are deleted one by one to release these documents exactly once,
+        even if jobs are deleted concurrently."""
+        async for job_data in self._db.jobs.find(
+            {
+                **conditions,
+                "$or": [
+                    {"src": {"$type": ["objectId", "string"]}},
+                    {"result": {"$type": ["objectId", "string"]}},
+                ],
+            },
+            {"_id": 1},
+        ):
+            deleted_job = await self._delete_db.jobs.find_one_and_delete(
+                {"_id": job_data["_id"]}, projection={"src": 1, "result": 1}
+            )
+            if deleted_job is not None:
+                await self._delete_blob(deleted_job["src"])
+                await self._delete_blob(deleted_job["result"])
+        await self._delete_db.jobs.delete_many(conditions)
+
+    async def _add_jobs(
+        self,
+        sources: List[Tuple[Union[bytes, AsyncIterator[bytes]], str, JobType]],
+        params: Optional[JobParams] = None,
+        sid: Optional[str] = None,
+    ) -> List[str]:
+        """Creates jobs for (source document, name, type) tuples with a single bulk insert.
+        Source documents may be given either as bytes or as stream of chunks."""
+        now = self._clock.now()
+        # Check for and refresh the associated session with a single operation
+        if sid is not None and not await self._refresh_session(
+            sid, now, unfinished_jobs=len(sources), check_existence=True
+        ):
+            raise ValueError(
+                f"Can't add to session {sid}, because the ID doesn't exist"
+            )
+        if params is None:
+            params = JobParams()
+        serialized_jobs = []
+        try:
+            for src, src_name, job_type in sources:
+                jid = generate_token()
+                job = Job(
+                    id=jid,
+                    src=b"",
+                    name=src_name,
+                    type=job_type,
+                    params=params,
+                    created=now,
+                    session_id=sid,
+                )
+                serialized_job = asdict(job)
+                serialized_job["src"] = await (
+                    self._store_blob(jid, src)
+                    if isinstance(src, bytes)
+                    else self._store_blob_stream(jid, src)
+                )
+                serialized_job["type"] = job_type.id
+                serialized_job["_id"] = serialized_job.pop("id")
+                serialized_jobs.append(serialized_job)
+        except Exception:
+            for serialized_job in serialized_jobs:
+                await self._delete_blob(serialized_job["src"])
+            if sid is not None:
+                await self._refresh_session(sid, now, -len(sources))
+            raise
+        jids = [serialized_job["_id"] for serialized_job in serialized_jobs]
+        if len(jids) == 0:
+            return jids
+        logger.debug("Adding jobs %s (%s)", ", ".join(jids), sid)
+        await self._create_db.jobs.insert_many(serialized_jobs)
+        if self._ttl_expiry and sid is None:
+            gc_entries = [
+                {
+                    "_id": serialized_job["_id"],
+                    "type": "job",
+                    "due": self._to_utc(now) + self._job_keepalive,
+                    "src": serialized_job["src"],
+                    "result": None,
+                }
+                for serialized_job in serialized_jobs
+                if self._get_stored_ref(serialized_job["src"]) is not None
+            ]
+            if len(gc_entries) > 0:
+                await self._create_db.pending_gc.insert_many(gc_entries)
+        # Increment total job count
+        await self._create_db.stats.update_one(
+            {"type": "jobs"}, {"$inc": {"total_count": len(jids)}}, upsert=True
+        )
+        self._notify_updates(sid, *jids)
+        return jids
+
+    async def _store_blob(self, jid: str, data: bytes) -> Union[bytes, str]:
+        """Stores a document of the job identified by jid and returns a reference to be saved
+        within the job document: Either the document itself (if small enough to be stored inline)
+        or the SHA-256 digest of a content-addressed blob. Identical blobs are only stored once.
+        """
+        if len(data) < self._inline_threshold:
+            return self._compress(data)
+        digest = hashlib.sha256(data).hexdigest()
+        pending = await self._reference_blob(digest)
+        if pending is False:
+            logger.debug("Deduplicated %d bytes of job %s", len(data), jid)
+            return digest
+        stored_data = await asyncio.to_thread(self._compress, data)
+        if pending is None:
+            blob_data: Dict[str, Any] = {
+                "_id": digest,
+                "refcount": 1,
+                "size": len(data),
+                "created": self._clock.now(),
+            }
+            if isinstance(stored_data, Binary):
+                blob_data["codec"] = self._compression
+                blob_data["stored_size"] = len(stored_data)
+            if not await self._claim_blob(blob_data):
+                logger.debug("Deduplicated %d bytes of job %s", len(data), jid)
+                return digest
+        logger.debug("Storing %d bytes of job %s as blob %s", len(data), jid, digest)
+        try:
+            await self._blob_store.put(digest, stored_data)
+            await self._update_db.blobs.update_one(
+                {"_id": digest}, {"$unset": {"pending": ""}}
+            )
+        except BaseException:
+            await self._delete_blob(digest)
+            raise
+        return digest
+
+    async def _store_blob_stream(
+        self, jid: str, chunks: AsyncIterator[bytes]
+    ) -> Union[bytes, str]:
+        """Like _store_blob(), but consumes the document from a stream of chunks. Large
+        documents are streamed into the blob store under a temporary key (compressed if
+        enabled) while computing their digest and renamed afterwards (or discarded if they
+        turn out to be duplicates)."""
+        head = bytearray()
+        async for chunk in chunks:
+            head += chunk
+            if len(head) >= self._inline_threshold:
+                break
+        else:
+            return await self._store_blob(jid, bytes(head))
+        digest = hashlib.sha256()
+        size = stored_size = 0
+        compressor = (
+            zstandard.ZstdCompressor(level=self._compression_level).compressobj()
+            if self._compression is not None
+            else None
+        )
+
+        async def encode(chunk: bytes) -> bytes:
+            nonlocal size, stored_size
+            digest.update(chunk)
+            size += len(chunk)
+            if compressor is not None:
+                chunk = await asyncio.to_thread(compressor.compress, chunk)
+            stored_size += len(chunk)
+            return chunk
+
+        async def encoded_chunks() -> AsyncIterator[bytes]:
+            nonlocal stored_size
+            yield await encode(bytes(head))
+            async for chunk in chunks:
+                yield await encode(chunk)
+            if compressor is not None:
+                chunk = compressor.flush()
+                stored_size += len(chunk)
+                yield chunk
+
+        upload_key = f"upload-{jid}"
+        await self._blob_store.put_stream(upload_key, encoded_chunks())
+        hexdigest = digest.hexdigest()
+        try:
+            pending = await self._reference_blob(hexdigest)
+            if pending is None:
+                blob_data: Dict[str, Any] = {
+                    "_id": hexdigest,
+                    "refcount": 1,
+                    "size": size,
+                    "created": self._clock.now(),
+                }
+                if self._compression is not None:
+                    blob_data["codec"] = self._compression
+                    blob_data["stored_size"] = stored_size
+                pending = await self._claim_blob(blob_data)
+        except BaseException:
+            await self._blob_store.delete(upload_key)
+            raise
+        if not pending:
+            logger.debug("Deduplicated %d bytes of job %s", size, jid)
+            await self._blob_store.delete(upload_key)
+            return hexdigest
+        logger.debug("Stored %d bytes of job %s as blob %s", size, jid, hexdigest)
+        try:
+            await self._blob_store.rename(upload_key, hexdigest)
+            await self._update_db.blobs.update_one(
+                {"_id": hexdigest}, {"$unset": {"pending": ""}}
+            )
+        except BaseException:
+            await self._delete_blob(hexdigest)
+            raise
+        return hexdigest
+
+    async def _reference_blob(self, digest: str) -> Optional[bool]:
+        """Increments the reference count of a blob unless there's no entry for it
+        (or its data is being deleted). Returns None in that case, otherwise whether
+        the blob is pending, which requires the caller to store its data as well."""
+        blob_data = await self._create_db.blobs.find_one_and_update(
+            {"_id": digest, "deleting": {"$exists": False}},
+            {"$inc": {"refcount": 1}},
+            projection={"pending": 1},
+        )
+        if blob_data is None:
+            return None
+        return bool(blob_data.get("pending", False))
+
+    async def _claim_blob(self, blob_data: Dict[str, Any]) -> bool:
+        """Inserts a pending entry for a new blob. If an entry has been inserted concurrently,
+        references that one instead, after waiting for any deletion of its data to finish.
+        Returns whether the caller has to store the data (and clear 'pending')."""
+        while True:
+            try:
+                await self._create_db.blobs.insert_one({**blob_data, "pending": True})
+                return True
+            except pymongo.errors.DuplicateKeyError:
+                pass
+            pending = await self._reference_blob(blob_data["_id"])
+            if pending is not None:
+                return pending
+            await self._await_blob_deletion(blob_data["_id"])
+
+    async def _await_blob_deletion(self, digest: str) -> None:
+        """Waits until the data of a blob marked as 'deleting' has been deleted and its entry
+        removed. Completes deletions abandoned for longer than BLOB_DELETION_TIMEOUT."""
+        while True:
+            blob_data = await self._db.blobs.find_one(
+                {"_id": digest, "deleting": {"$exists": True}}, {"deleting": 1}
+            )
+            if blob_data is None:
+                return
+            if blob_data["deleting"] < self._clock.now() - BLOB_DELETION_TIMEOUT:
+                await self._delete_blob_entry(digest)
+            else:
+                await asyncio.sleep(BLOB_DELETION_POLL_INTERVAL)
+
+    @staticmethod
+    def _get_stored_ref(ref: Any) -> Union[str, ObjectId, None]:
+        """Returns a document reference unless it refers to an inline document (or None)."""
+        return ref if isinstance(ref, (str, ObjectId)) else None
+
+    async def _load_blob(self, ref: Union[bytes, str, ObjectId]) -> bytes:
+        """Returns the document for a reference created by _store_blob()."""
+        if isinstance(ref, bytes):
+            return self._decompress(ref)
+        if isinstance(ref, str):
+            blob_data = await self._db.blobs.find_one({"_id": ref}, {"codec": 1})
+            data = await self._blob_store.get(ref)
+            if blob_data is not None and "codec" in blob_data:
+                return await asyncio.to_thread(
+                    self._decompress, data, blob_data["codec"]
+                )
+            return data
+        data = await (await self._fs.open_download_stream(ref)).read()
+        assert isinstance(data, bytes)
+        return data
+
+    async def _read_compressed_blob(
+        self, digest: str, codec: str, start: int, end: Optional[int]
+    ) -> AsyncIterator[bytes]:
+        """Yields the decompressed bytes of a compressed blob from start to end."""
+        if codec != "zstd":
+            raise ValueError(f"Unsupported compression codec {codec}")
+        decompressor = zstandard.ZstdDecompressor().decompressobj()
+        position = 0
+        async for chunk in self._blob_store.get_stream(digest):
+            data = await asyncio.to_thread(decompressor.decompress, chunk)
+            # Skip data before start and stop after end
+            lower = max(start - position, 0)
+            upper = len(data) if end is None else min(end - position, len(data))
+            position += len(data)
+            if lower < upper:
+                yield data[lower:upper]
+            if end is not None and position >= end:
+                break
+
+    async def _delete_blob(self, ref: Union[bytes, str, ObjectId]) -> None:
+        """Releases a document referenced by a job. Content-addressed blobs are deleted
+        as soon as they aren't referenced anymore, inline documents don't require any work.
+        """
+        if isinstance(ref, ObjectId):
+            await self._fs.delete(ref)
+        elif isinstance(ref, str):
+            blob_data = await self._delete_db.blobs.find_one_and_update(
+                {"_id": ref, "deleting": {"$exists": False}},
+                {"$inc": {"refcount": -1}},
+                projection={"refcount": 1},
+                return_document=pymongo.ReturnDocument.AFTER,
+            )
+            if blob_data is None or blob_data["refcount"] > 0:
+                return
+            # Mark the entry instead of removing it right away, so that the blob can't be
+            # referenced (and stored) again while its data is being deleted
+            if (
+                await self._delete_db.blobs.update_one(
+                    {
+                        "_id": ref,
+                        "refcount": {"$lte": 0},
+                        "deleting": {"$exists": False},
+                    },
+                    {"$set": {"deleting": self._clock.now()}},
+                )
+            ).modified_count == 1:
+                await self._delete_blob_entry(ref)
+
+    async def _delete_blob_entry(self, digest: str) -> None:
+        """Deletes the data of a blob marked as 'deleting', then removes its entry."""
+        logger.debug("Deleting unreferenced blob %s", digest)
+        try:
+            await self._blob_store.delete(digest)
+        except ValueError:
+            logger.warning(f"Blob {digest} is missing from the blob store")
+        await self._delete_db.blobs.delete_one(
+            {"_id": digest, "deleting": {"$exists": True}}
+        )
+
+    def _compress(self, data: bytes) -> bytes:
+        """Compresses data with the configured codec unless that doesn't reduce its size.
+        Compressed data is returned as Binary tagged with the codec's subtype."""
+        if self._compression is None:
+            return data
+        compressed = zstandard.ZstdCompressor(level=self._compression_level).compress(
+            data
+        )
+        if len(compressed) >= len(data):
+            return data
+        return Binary(compressed, ZSTD_BINARY_SUBTYPE)
+
+    @staticmethod
+    def _decompress(data: bytes, codec: Optional[str] = None) -> bytes:
+        """Returns the original data of data compressed with codec. If no codec is given,
+        inline data is decompressed according to its binary subtype."""
+        if (
+            codec is None
+            and isinstance(data, Binary)
+            and data.subtype == ZSTD_BINARY_SUBTYPE
+        ):
+            codec = "zstd"
+        if codec == "zstd":
+            # Streamed blobs lack the content size in their frame header
+            return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+        return data
+
+    def _serialize_metadata(self, metadata: DocumentMetadata) -> Any:
+        """Returns document metadata in the format to store it with its job,
+        either as subdocument or (if enabled) as compressed BSON."""
+        metadata_data = asdict(metadata)
+        if self._compression is None:
+            return metadata_data
+        return self._compress(bson.encode(metadata_data))
+
+    @classmethod
     def _create_document_metadata(
-        raw_data: Dict[str, Union[bool, Dict[str, Any]]],
+        cls,
+        raw_data: Union[bytes, Dict[str, Union[bool, Dict[str, Any]]]],
     ) -> DocumentMetadata:
+        if isinstance(raw_data, bytes):
+            raw_data = bson.decode(cls._decompress(raw_data))
         embeds = {}
         assert isinstance(raw_data["primary"], dict)
         assert isinstance(raw_data["embeds"], dict)
@@ -227,48 +1406,59 @@ class MongoDBRepository(Repository):
             signed=raw_data["signed"],
         )
 
+    def _create_job_summary_from_job_data(self, job_data: Dict[str, Any]) -> JobSummary:
+        """Creates JobSummary instances from raw job data as returned by MongoDB."""
+        return JobSummary(
+            id=job_data["_id"],
+            type=self._job_types[job_data["type"]],
+            status=JobStatus(job_data["status"]),
+            created=job_data["created"],
+            updated=job_data["updated"],
+            session_id=job_data["session_id"],
+        )
+
     async def _create_job_from_job_data(
-        self, job_data: Dict[str, Any], summary_only: bool = False
+        self,
+        job_data: Dict[str, Any],
+        include_blobs: bool = True,
     ) -> Job:
         """Creates Job instances from raw job data as returned by MongoDB.
-        If summary_only is True, omit metadata, the job log, src and result document data from the result.
+        If include_blobs is False, omit src and result document data (skips blob retrieval).
         """
-        job_data["type"] = next(
-            filter(lambda jt: jt.id == job_data["type"], self._job_types)
-        )
-        job_data["id"] = job_data.pop("_id")
-        updated = job_data.pop("updated")
-        if summary_only:
-            job_data["src"] = b""
-            job_data["result"] = b""
-            job_data["log"] = []
-            job_data["metadata_result"] = None
-            job_data["metadata_src"] = None
+        if include_blobs:
+            # Retrieve src and result documents (if not stored inline)
+            src = await self._load_blob(job_data["src"])
+            result = await self._load_blob(job_data["result"])
         else:
-            # Retrieve src and result documents from GridFS
-            job_data["src"] = await (
-                await self._fs.open_download_stream(job_data["src"])
-            ).read()
-            if job_data["result"] != b"":
-                job_data["result"] = await (
-                    await self._fs.open_download_stream(job_data["result"])
-                ).read()
-        # Create DocumentMetadata instances
-        if job_data["metadata_result"] is not None:
-            job_data["metadata_result"] = self._create_document_metadata(
-                job_data["metadata_result"]
-            )
-        if job_data["metadata_src"] is not None:
-            job_data["metadata_src"] = self._create_document_metadata(
-                job_data["metadata_src"]
-            )
-        # Create MetadataField and JobParams instances
-        job_data["params"]["metadata"] = [
-            MetadataField(**m) for m in job_data["params"]["metadata"]
-        ]
-        job_data["params"] = JobParams(**job_data["params"])
-        job = Job(**job_data)
-        job.updated = updated
+            src = result = b""
+        metadata_result = job_data["metadata_result"]
+        metadata_src = job_data["metadata_src"]
+        job = Job(
+            id=job_data["_id"],
+            src=src,
+            name=job_data["name"],
+            params=JobParams(
+                metadata=[MetadataField(**m) for m in job_data["params"]["metadata"]],
+                trace_context=job_data["params"].get("trace_context", {}),
+            ),
+            type=self._job_types[job_data["type"]],
+            created=job_data["created"],
+            log=job_data["log"],
+            metadata_result=(
+                self._create_document_metadata(metadata_result)
+                if metadata_result is not None
+                else None
+            ),
+            metadata_src=(
+                self._create_document_metadata(metadata_src)
+                if metadata_src is not None
+                else None
+            ),
+            result=result,
+            status=JobStatus(job_data["status"]),
+            session_id=job_data["session_id"],
+        )
+        job.updated = job_data["updated"]
         return job
 
     @staticmethod
@@ -0,0 +1,827 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from datetime import datetime, timedelta
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+from docleaner.api.adapters.metrics.prometheus import instrument_repository
+from docleaner.api.adapters.tracing.otel import trace_repository
+from docleaner.api.core.document import DocumentStream
+from docleaner.api.core.job import Job, JobParams, JobStatus, JobSummary, JobType
+from docleaner.api.core.metadata import DocumentMetadata, MetadataField
+from docleaner.api.core.session import Session
+from docleaner.api.services.blob_store import BlobStore
+from docleaner.api.services.clock import Clock
+from docleaner.api.services.repository import Repository
+from docleaner.api.utils import generate_token
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    created TEXT NOT NULL,
+    updated TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated);
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    session_id TEXT,
+    type TEXT NOT NULL,
+    name TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    created TEXT NOT NULL,
+    updated TEXT NOT NULL,
+    params TEXT NOT NULL,
+    log TEXT NOT NULL,
+    metadata_result TEXT,
+    metadata_src TEXT,
+    -- Either inline document data (BLOB) or the digest of a blob (TEXT)
+    src BLOB NOT NULL,
+    result BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_created ON jobs (created);
+CREATE INDEX IF NOT EXISTS jobs_session_id ON jobs (session_id, created);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);
+CREATE INDEX IF NOT EXISTS jobs_updated ON jobs (updated);
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    refcount INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stats (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+# Columns of job queries that only return the fields of a JobSummary
+JOB_SUMMARY_COLUMNS = "id, session_id, type, status, created, updated"
+# Columns of job queries that omit src and result document data
+JOB_COLUMNS = f"{JOB_SUMMARY_COLUMNS}, name, params, log, metadata_result, metadata_src"
+# Number of locks that serialize storing and deleting blobs (selected by digest)
+BLOB_LOCK_STRIPES = 64
+
+
+@trace_repository
+@instrument_repository
+class SQLiteRepository(Repository):
+    """Repository implementation backed by an embedded SQLite database (in WAL mode),
+    intended for single-node deployments. All writes are serialized by a dedicated writer
+    thread, reads are performed concurrently by a small pool of reader threads.
+    Documents (job sources and results) smaller than inline_threshold bytes are stored
+    inline within their job's row. Larger ones are stored out-of-line in blob_store once per
+    SHA-256 digest and reference counted in the 'blobs' table."""
+
+    def __init__(
+        self,
+        clock: Clock,
+        job_types: List[JobType],
+        db_path: str,
+        blob_store: BlobStore,
+        inline_threshold: int = 64 * 1024,
+        readers: int = 4,
+    ) -> None:
+        super().__init__()
+        self._clock = clock
+        self._job_types = {jt.id: jt for jt in job_types}
+        self._db_path = db_path
+        self._blob_store = blob_store
+        self._inline_threshold = inline_threshold
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix="sqlite-writer")
+        self._readers = ThreadPoolExecutor(readers, thread_name_prefix="sqlite-reader")
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._local = threading.local()
+        self._blob_locks = [asyncio.Lock() for _ in range(BLOB_LOCK_STRIPES)]
+        # Initialize the database schema synchronously, before any other operation is scheduled
+        self._writer.submit(self._init_db).result()
+        logger.info("Database backend: SQLite (%s)", db_path)
+
+    async def add_job(
+        self,
+        src: bytes,
+        src_name: str,
+        job_type: JobType,
+        params: Optional[JobParams] = None,
+        sid: Optional[str] = None,
+    ) -> str:
+        jid = generate_token()
+        await self._insert_jobs(
+            [(jid, await self._store_blob(jid, src), src_name, job_type)], params, sid
+        )
+        return jid
+
+    async def add_job_from_stream(
+        self,
+        src: AsyncIterator[bytes],
+        src_name: str,
+        job_type: JobType,
+        params: Optional[JobParams] = None,
+        sid: Optional[str] = None,
+    ) -> str:
+        jid = generate_token()
+        await self._insert_jobs(
+            [(jid, await self._store_blob_stream(jid, src), src_name, job_type)],
+            params,
+            sid,
+        )
+        return jid
+
+    async def add_jobs(
+        self,
+        sources: List[Tuple[AsyncIterator[bytes], str, JobType]],
+        params: Optional[JobParams] = None,
+        sid: Optional[str] = None,
+    ) -> List[str]:
+        jobs: List[Tuple[str, Union[bytes, str], str, JobType]] = []
+        try:
+            for src, src_name, job_type in sources:
+                jid = generate_token()
+                jobs.append(
+                    (jid, await self._store_blob_stream(jid, src), src_name, job_type)
+                )
+        except Exception:
+            await self._release_blobs([src_ref for _, src_ref, _, _ in jobs])
+            raise
+        await self._insert_jobs(jobs, params, sid)
+        return [jid for jid, _, _, _ in jobs]
+
+    async def find_job(self, jid: str, include_blobs: bool = True) -> Optional[Job]:
+        columns = f"{JOB_COLUMNS}, src, result" if include_blobs else JOB_COLUMNS
+        row = await self._read(
+            lambda db: db.execute(
+                f"SELECT {columns} FROM jobs WHERE id = ?", (jid,)
+            ).fetchone()
+        )
+        if row is None:
+            return None
+        job = self._create_job_from_row(row)
+        if include_blobs:
+            job.src = await self._load_blob(row["src"])
+            job.result = await self._load_blob(row["result"])
+        return job
+
+    async def find_job_summary(self, jid: str) -> Optional[JobSummary]:
+        row = await self._read(
+            lambda db: db.execute(
+                f"SELECT {JOB_SUMMARY_COLUMNS} FROM jobs WHERE id = ?", (jid,)
+            ).fetchone()
+        )
+        return self._create_job_summary_from_row(row) if row is not None else None
+
+    async def find_jobs(
+        self,
+        sid: Optional[str] = None,
+        status: Optional[List[JobStatus]] = None,
+        not_updated_for: Optional[timedelta] = None,
+        after: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[JobSummary]:
+        conditions, args = self._get_job_conditions(sid, status, not_updated_for)
+
+        def select(db: sqlite3.Connection) -> List[sqlite3.Row]:
+            self._check_session(db, sid)
+            if after is not None:
+                cursor = db.execute(
+                    "SELECT created, rowid FROM jobs WHERE id = ?", (after,)
+                ).fetchone()
+                if cursor is None:
+                    raise ValueError(
+                        f"Can't fetch jobs after {after}, no job with that ID"
+                    )
+                conditions.append("(created < ? OR (created = ? AND rowid > ?))")
+                args.extend([cursor["created"], cursor["created"], cursor["rowid"]])
+            where = f"WHERE {' AND '.join(conditions)}" if len(conditions) > 0 else ""
+            # Jobs created at the same time are returned in insertion order
+            query = f"SELECT {JOB_SUMMARY_COLUMNS} FROM jobs {where} ORDER BY created DESC, rowid"
+            if limit is not None:
+                query += " LIMIT ?"
+                args.append(limit)
+            return db.execute(query, args).fetchall()
+
+        return [
+            self._create_job_summary_from_row(row) for row in await self._read(select)
+        ]
+
+    async def count_jobs(
+        self, sid: Optional[str] = None, status: Optional[List[JobStatus]] = None
+    ) -> int:
+        conditions, args = self._get_job_conditions(sid, status, None)
+        where = f"WHERE {' AND '.join(conditions)}" if len(conditions) > 0 else ""
+
+        def count(db: sqlite3.Connection) -> int:
+            self._check_session(db, sid)
+            return int(
+                db.execute(f"SELECT COUNT(*) FROM jobs {where}", args).fetchone()[0]
+            )
+
+        return await self._read(count)
+
+    async def update_job(
+        self,
+        jid: str,
+        metadata_result: Optional[DocumentMetadata] = None,
+        metadata_src: Optional[DocumentMetadata] = None,
+        result: Optional[bytes] = None,
+        status: Optional[JobStatus] = None,
+        log: Optional[List[str]] = None,
+    ) -> None:
+        now = _serialize_datetime(self._clock.now())
+        update_fields: Dict[str, Any] = {"updated": now}
+        if metadata_result is not None:
+            update_fields["metadata_result"] = json.dumps(asdict(metadata_result))
+        if metadata_src is not None:
+            update_fields["metadata_src"] = json.dumps(asdict(metadata_src))
+        if result is not None:
+            update_fields["result"] = await self._store_blob(jid, result)
+        if status is not None:
+            update_fields["status"] = status
+        logger.debug("Updating job %s (%s)", jid, ", ".join(update_fields.keys()))
+
+        def update(db: sqlite3.Connection) -> Tuple[Optional[str], List[str]]:
+            row = db.execute(
+                "SELECT session_id, log, result FROM jobs WHERE id = ?", (jid,)
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"No job with ID {jid}")
+            if log is not None:
+                update_fields["log"] = json.dumps(json.loads(row["log"]) + log)
+            db.execute(
+                f"UPDATE jobs SET {', '.join(f'{k} = ?' for k in update_fields)} WHERE id = ?",
+                [*update_fields.values(), jid],
+            )
+            # If associated with a session, also update that session
+            if row["session_id"] is not None:
+                db.execute(
+                    "UPDATE sessions SET updated = ? WHERE id = ?",
+                    (now, row["session_id"]),
+                )
+            # Release a previous result
+            if result is None:
+                return row["session_id"], []
+            return row["session_id"], self._release_blob_refs(db, [row["result"]])
+
+        try:
+            sid, unreferenced_digests = await self._write(update)
+        except ValueError:
+            if "result" in update_fields:
+                await self._release_blobs([update_fields["result"]])
+            raise
+        self._notify_updates(jid, sid)
+        await self._delete_blobs(unreferenced_digests)
+
+    async def update_jobs(self, jids: List[str], status: JobStatus) -> None:
+        now = _serialize_datetime(self._clock.now())
+        logger.debug("Updating status of %d jobs to %s", len(jids), status.name)
+
+        def update(db: sqlite3.Connection) -> Set[str]:
+            if db.executemany(
+                "UPDATE jobs SET status = ?, updated = ? WHERE id = ?",
+                [(status, now, jid) for jid in jids],
+            ).rowcount < len(jids):
+                raise ValueError(f"No job with one of the IDs {', '.join(jids)}")
+            # If associated with sessions, also update those sessions
+            sids = {
+                row["session_id"]
+                for row in db.execute(
+                    "SELECT DISTINCT session_id FROM jobs"
+                    f" WHERE id IN ({', '.join('?' * len(jids))})"
+                    " AND session_id IS NOT NULL",
+                    jids,
+                )
+            }
+            db.executemany(
+                "UPDATE sessions SET updated = ? WHERE id = ?",
+                [(now, sid) for sid in sids],
+            )
+            return sids
+
+        sids = await self._write(update)
+        self._notify_updates(*jids, *sids)
+
+    async def add_to_job_log(self, jid: str, entry: str) -> None:
+        def update(db: sqlite3.Connection) -> None:
+            row = db.execute("SELECT log FROM jobs WHERE id = ?", (jid,)).fetchone()
+            if row is None:
+                raise ValueError(f"No job with ID {jid}")
+            db.execute(
+                "UPDATE jobs SET log = ? WHERE id = ?",
+                (json.dumps(json.loads(row["log"]) + [entry]), jid),
+            )
+
+        await self._write(update)
+
+    async def delete_job(self, jid: str) -> None:
+        logger.debug("Deleting job %s", jid)
+        now = _serialize_datetime(self._clock.now())
+
+        def delete(db: sqlite3.Connection) -> Tuple[Optional[str], List[str]]:
+            row = db.execute(
+                "DELETE FROM jobs WHERE id = ? RETURNING session_id, src, result",
+                (jid,),
+            ).fetchone()
+            if row is None:
+                raise ValueError(
+                    f"Can't delete job {jid}, because the ID doesn't exist"
+                )
+            if row["session_id"] is not None:
+                db.execute(
+                    "UPDATE sessions SET updated = ? WHERE id = ?",
+                    (now, row["session_id"]),
+                )
+            return row["session_id"], self._release_blob_refs(
+                db, [row["src"], row["result"]]
+            )
+
+        sid, unreferenced_digests = await self._write(delete)
+        self._notify_updates(jid, sid)
+        await self._delete_blobs(unreferenced_digests)
+
+    async def find_job_result_stream(self, jid: str) -> Optional[DocumentStream]:
+        row = await self._read(
+            lambda db: db.execute(
+                "SELECT jobs.result, blobs.size FROM jobs"
+                " LEFT JOIN blobs ON blobs.digest = jobs.result WHERE jobs.id = ?",
+                (jid,),
+            ).fetchone()
+        )
+        if row is None:
+            return None
+        if not isinstance(row["result"], str):
+            return DocumentStream.from_bytes(row["result"])
+        digest = row["result"]
+        return DocumentStream(
+            digest=digest,
+            size=row["size"],
+            read=lambda start, end: self._blob_store.get_stream(digest, start, end),
+            path=self._blob_store.get_path(digest),
+        )
+
+    async def get_storage_stats(self) -> Tuple[int, int]:
+        def select(db: sqlite3.Connection) -> Tuple[int, int]:
+            inline_size = db.execute(
+                "SELECT TOTAL(IIF(typeof(src) = 'blob', length(src), 0)"
+                " + IIF(typeof(result) = 'blob', length(result), 0)) FROM jobs"
+            ).fetchone()[0]
+            referenced_size, stored_size = db.execute(
+                "SELECT TOTAL(size * refcount), TOTAL(size) FROM blobs"
+            ).fetchone()
+            return int(inline_size + referenced_size), int(inline_size + stored_size)
+
+        return await self._read(select)
+
+    async def get_total_job_count(self) -> int:
+        row = await self._read(
+            lambda db: db.execute(
+                "SELECT value FROM stats WHERE key = 'total_jobs'"
+            ).fetchone()
+        )
+        return 0 if row is None else int(row["value"])
+
+    async def add_session(self) -> str:
+        sid = generate_token()
+        now = _serialize_datetime(self._clock.now())
+        await self._write(
+            lambda db: db.execute(
+                "INSERT INTO sessions (id, created, updated) VALUES (?, ?, ?)",
+                (sid, now, now),
+            )
+        )
+        return sid
+
+    async def find_session(self, sid: str) -> Optional[Session]:
+        row = await self._read(
+            lambda db: db.execute(
+                "SELECT id, created, updated FROM sessions WHERE id = ?", (sid,)
+            ).fetchone()
+        )
+        return None if row is None else self._create_session_from_row(row)
+
+    async def find_session_progress(
+        self, sid: str
+    ) -> Optional[Tuple[Session, int, int]]:
+        def find(db: sqlite3.Connection) -> Optional[Tuple[Session, int, int]]:
+            row = db.execute(
+                "SELECT id, created, updated FROM sessions WHERE id = ?", (sid,)
+            ).fetchone()
+            if row is None:
+                return None
+            total_jobs, finished_jobs = db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(status IN (?, ?)), 0) FROM jobs WHERE session_id = ?",
+                (JobStatus.SUCCESS, JobStatus.ERROR, sid),
+            ).fetchone()
+            return self._create_session_from_row(row), total_jobs, finished_jobs
+
+        return await self._read(find)
+
+    async def find_sessions(
+        self, not_updated_for: Optional[timedelta] = None
+    ) -> Set[Session]:
+        query = "SELECT id, created, updated FROM sessions"
+        args = []
+        if not_updated_for is not None:
+            query += " WHERE updated < ?"
+            args.append(_serialize_datetime(self._clock.now() - not_updated_for))
+        rows = await self._read(lambda db: db.execute(query, args).fetchall())
+        return {self._create_session_from_row(row) for row in rows}
+
+    async def delete_session(self, sid: str) -> None:
+        def delete(db: sqlite3.Connection) -> Tuple[List[str], List[str]]:
+            if db.execute("DELETE FROM sessions WHERE id = ?", (sid,)).rowcount == 0:
+                raise ValueError(
+                    f"Can't delete session {sid}, because the ID doesn't exist"
+                )
+            jids = []
+            refs = []
+            for row in db.execute(
+                "DELETE FROM jobs WHERE session_id = ? RETURNING id, src, result",
+                (sid,),
+            ).fetchall():
+                jids.append(row["id"])
+                refs.extend([row["src"], row["result"]])
+            return jids, self._release_blob_refs(db, refs)
+
+        jids, unreferenced_digests = await self._write(delete)
+        self._notify_updates(sid, *jids)
+        await self._delete_blobs(unreferenced_digests)
+
+    async def disconnect(self) -> None:
+        def shutdown() -> None:
+            self._writer.shutdown()
+            self._readers.shutdown()
+            with self._connections_lock:
+                for connection in self._connections:
+                    connection.close()
+                self._connections.clear()
+
+        await asyncio.to_thread(shutdown)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Opens a new database connection in autocommit mode (transactions are explicit)."""
+        db = sqlite3.connect(
+            self._db_path, isolation_level=None, check_same_thread=False
+        )
+        db.row_factory = sqlite3.Row
+        db.execute("PRAGMA busy_timeout = 5000")
+        # WAL mode guarantees durability on checkpoints when using synchronous=NORMAL
+        db.execute("PRAGMA synchronous = NORMAL")
+        with self._connections_lock:
+            self._connections.append(db)
+        return db
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """Returns the connection of the current (writer or reader) thread."""
+        db: Optional[sqlite3.Connection] = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = self._connect()
+        return db
+
+    def _init_db(self) -> None:
+        """Enables WAL mode and creates tables and indexes (if required)."""
+        db = self._get_connection()
+        db.execute("PRAGMA journal_mode = WAL")
+        db.executescript(SCHEMA)
+
+    async def _write(self, operation: Callable[[sqlite3.Connection], T]) -> T:
+        """Performs an operation within a transaction on the writer thread.
+        Changes are committed if the operation succeeds and rolled back otherwise."""
+
+        def transaction() -> T:
+            db = self._get_connection()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                result = operation(db)
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+            return result
+
+        return await asyncio.get_running_loop().run_in_executor(
+            self._writer, transaction
+        )
+
+    async def _read(self, operation: Callable[[sqlite3.Connection], T]) -> T:
+        """Performs an operation within a (consistent) read transaction on a reader thread."""
+
+        def transaction() -> T:
+            db = self._get_connection()
+            db.execute("BEGIN")
+            try:
+                return operation(db)
+            finally:
+                db.execute("COMMIT")
+
+        return await asyncio.get_running_loop().run_in_executor(
+            self._readers, transaction
+        )
+
+    async def _insert_jobs(
+        self,
+        jobs: List[Tuple[str, Union[bytes, str], str, JobType]],
+        params: Optional[JobParams],
+        sid: Optional[str],
+    ) -> None:
+        """Inserts jobs given as (jid, source reference, source name, type) tuples referring
+        to already stored source documents within a single transaction.
+        Releases those documents if the jobs can't be created."""
+        if params is None:
+            params = JobParams()
+        now = _serialize_datetime(self._clock.now())
+        serialized_params = json.dumps(asdict(params))
+
+        def insert(db: sqlite3.Connection) -> None:
+            if (
+                sid is not None
+                and db.execute(
+                    "UPDATE sessions SET updated = ? WHERE id = ?", (now, sid)
+                ).rowcount
+                == 0
+            ):
+                raise ValueError(
+                    f"Can't add to session {sid}, because the ID doesn't exist"
+                )
+            db.executemany(
+                "INSERT INTO jobs (id, session_id, type, name, status, created, updated,"
+                " params, log, metadata_result, metadata_src, src, result)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, '[]', NULL, NULL, ?, ?)",
+                [
+                    (
+                        jid,
+                        sid,
+                        job_type.id,
+                        src_name,
+                        JobStatus.CREATED,
+                        now,
+                        now,
+                        serialized_params,
+                        src_ref,
+                        b"",
+                    )
+                    for jid, src_ref, src_name, job_type in jobs
+                ],
+            )
+            db.execute(
+                "INSERT INTO stats (key, value) VALUES ('total_jobs', ?)"
+                " ON CONFLICT (key) DO UPDATE SET value = value + excluded.value",
+                (len(jobs),),
+            )
+
+        try:
+            await self._write(insert)
+        except ValueError:
+            await self._release_blobs([src_ref for _, src_ref, _, _ in jobs])
+            raise
+        self._notify_updates(sid, *(jid for jid, _, _, _ in jobs))
+
+    async def _store_blob(self, jid: str, data: bytes) -> Union[bytes, str]:
+        """Stores a document of the job identified by jid and returns a reference to be saved
+        within the job's row: Either the document itself (if small enough to be stored inline)
+        or the SHA-256 digest of a content-addressed blob. Identical blobs are only stored once.
+        """
+        if len(data) < self._inline_threshold:
+            return data
+        digest = hashlib.sha256(data).hexdigest()
+        async with self._get_blob_lock(digest):
+            if await self._write(
+                lambda db: db.execute(
+                    "UPDATE blobs SET refcount = refcount + 1 WHERE digest = ?",
+                    (digest,),
+                ).rowcount
+                == 1
+            ):
+                logger.debug("Deduplicated %d bytes of job %s", len(data), jid)
+                return digest
+            logger.debug(
+                "Storing %d bytes of job %s as blob %s", len(data), jid, digest
+            )
+            await self._blob_store.put(digest, data)
+            await self._write(
+                lambda db: db.execute(
+                    "INSERT INTO blobs (digest, refcount, size) VALUES (?, 1, ?)",
+                    (digest, len(data)),
+                )
+            )
+        return digest
+
+    async def _store_blob_stream(
+        self, jid: str, chunks: AsyncIterator[bytes]
+    ) -> Union[bytes, str]:
+        """Like _store_blob(), but consumes the document from a stream of chunks. Large
+        documents are streamed into the blob store under a temporary key while computing
+        their digest and renamed afterwards (or discarded if they turn out to be duplicates).
+        """
+        head = bytearray()
+        async for chunk in chunks:
+            head += chunk
+            if len(head) >= self._inline_threshold:
+                break
+        else:
+            return await self._store_blob(jid, bytes(head))
+        digest = hashlib.sha256(head)
+        size = len(head)
+
+        async def hashed_chunks() -> AsyncIterator[bytes]:
+            nonlocal size
+            yield bytes(head)
+            async for chunk in chunks:
+                digest.update(chunk)
+                size += len(chunk)
+                yield chunk
+
+        upload_key = f"upload-{jid}"
+        await self._blob_store.put_stream(upload_key, hashed_chunks())
+        hexdigest = digest.hexdigest()
+        async with self._get_blob_lock(hexdigest):
+            if await self._write(
+                lambda db: db.execute(
+                    "UPDATE blobs SET refcount = refcount + 1 WHERE digest = ?",
+                    (hexdigest,),
+                ).rowcount
+                == 1
+            ):
+                logger.debug("Deduplicated %d bytes of job %s", size, jid)
+                await self._blob_store.delete(upload_key)
+                return hexdigest
+            logger.debug("Stored %d bytes of job %s as blob %s", size, jid, hexdigest)
+            await self._blob_store.rename(upload_key, hexdigest)
+            await self._write(
+                lambda db: db.execute(
+                    "INSERT INTO blobs (digest, refcount, size) VALUES (?, 1, ?)",
+                    (hexdigest, size),
+                )
+            )
+        return hexdigest
+
+    async def _load_blob(self, ref: Union[bytes, str]) -> bytes:
+        """Returns the document for a reference created by _store_blob()."""
+        if isinstance(ref, bytes):
+            return ref
+        return await self._blob_store.get(ref)
+
+    async def _release_blobs(self, refs: List[Union[bytes, str]]) -> None:
+        """Releases documents that are not referenced by a job (anymore)."""
+        await self._delete_blobs(
+            await self._write(lambda db: self._release_blob_refs(db, refs))
+        )
+
+    @staticmethod
+    def _release_blob_refs(
+        db: sqlite3.Connection, refs: List[Union[bytes, str]]
+    ) -> List[str]:
+        """Decrements the reference count of content-addressed blobs within an ongoing
+        write transaction. Returns the digests of blobs that aren't referenced anymore,
+        which should be deleted from the blob store after committing."""
+        unreferenced_digests = []
+        for ref in refs:
+            if not isinstance(ref, str):
+                continue
+            db.execute(
+                "UPDATE blobs SET refcount = refcount - 1 WHERE digest = ?", (ref,)
+            )
+            if (
+                db.execute(
+                    "DELETE FROM blobs WHERE digest = ? AND refcount <= 0", (ref,)
+                ).rowcount
+                == 1
+            ):
+                unreferenced_digests.append(ref)
+        return unreferenced_digests
+
+    async def _delete_blobs(self, digests: List[str]) -> None:
+        """Deletes unreferenced blobs from the blob store. Blobs that have been stored
+        again since their release are kept."""
+        for digest in digests:
+            async with self._get_blob_lock(digest):
+                if await self._write(
+                    lambda db: db.execute(
+                        "SELECT 1 FROM blobs WHERE digest = ?", (digest,)
+                    ).fetchone()
+                    is not None
+                ):
+                    logger.debug(
+                        "Keeping blob %s, it has been referenced again", digest
+                    )
+                    continue
+                logger.debug("Deleting unreferenced blob %s", digest)
+                try:
+                    await self._blob_store.delete(digest)
+                except ValueError:
+                    logger.warning(f"Blob {digest} is missing from the blob store")
+
+    def _get_blob_lock(self, digest: str) -> asyncio.Lock:
+        """Returns the lock that serializes storing and deleting the blob identified by
+        digest, so that a blob isn't deleted after being stored (and referenced) again.
+        """
+        return self._blob_locks[int(digest[:8], 16) % BLOB_LOCK_STRIPES]
+
+    @staticmethod
+    def _create_document_metadata(raw_data: str) -> DocumentMetadata:
+        metadata = json.loads(raw_data)
+        return DocumentMetadata(
+            primary={k: MetadataField(**v) for k, v in metadata["primary"].items()},
+            embeds={
+                embed_id: {k: MetadataField(**v) for k, v in embed_data.items()}
+                for embed_id, embed_data in metadata["embeds"].items()
+            },
+            signed=metadata["signed"],
+        )
+
+    def _get_job_conditions(
+        self,
+        sid: Optional[str],
+        status: Optional[List[JobStatus]],
+        not_updated_for: Optional[timedelta],
+    ) -> Tuple[List[str], List[Any]]:
+        """Translates job filters (see find_jobs()) into WHERE conditions and their arguments."""
+        conditions = []
+        args: List[Any] = []
+        if sid is not None:
+            conditions.append("session_id = ?")
+            args.append(sid)
+        if status is not None:
+            conditions.append(f"status IN ({', '.join('?' * len(status))})")
+            args.extend(status)
+        if not_updated_for is not None:
+            conditions.append("updated < ?")
+            args.append(_serialize_datetime(self._clock.now() - not_updated_for))
+        return conditions, args
+
+    @staticmethod
+    def _check_session(db: sqlite3.Connection, sid: Optional[str]) -> None:
+        """Raises a ValueError if sid is given, but no such session exists."""
+        if (
+            sid is not None
+            and db.execute("SELECT 1 FROM sessions WHERE id = ?", (sid,)).fetchone()
+            is None
+        ):
+            raise ValueError(
+                f"Can't fetch jobs from session {sid}, because the ID doesn't exist"
+            )
+
+    def _create_job_summary_from_row(self, row: sqlite3.Row) -> JobSummary:
+        return JobSummary(
+            id=row["id"],
+            type=self._job_types[row["type"]],
+            status=JobStatus(row["status"]),
+            created=_deserialize_datetime(row["created"]),
+            updated=_deserialize_datetime(row["updated"]),
+            session_id=row["session_id"],
+        )
+
+    def _create_job_from_row(self, row: sqlite3.Row) -> Job:
+        """Creates Job instances from database rows without src and result document data."""
+        params = json.loads(row["params"])
+        job = Job(
+            id=row["id"],
+            src=b"",
+            name=row["name"],
+            params=JobParams(
+                metadata=[MetadataField(**m) for m in params["metadata"]],
+                trace_context=params.get("trace_context", {}),
+            ),
+            type=self._job_types[row["type"]],
+            created=_deserialize_datetime(row["created"]),
+            status=JobStatus(row["status"]),
+            session_id=row["session_id"],
+        )
+        job.updated = _deserialize_datetime(row["updated"])
+        job.log = json.loads(row["log"])
+        if row["metadata_result"] is not None:
+            job.metadata_result = self._create_document_metadata(row["metadata_result"])
+        if row["metadata_src"] is not None:
+            job.metadata_src = self._create_document_metadata(row["metadata_src"])
+        return job
+
+    @staticmethod
+    def _create_session_from_row(row: sqlite3.Row) -> Session:
+        session = Session(id=row["id"], created=_deserialize_datetime(row["created"]))
+        session.updated = _deserialize_datetime(row["updated"])
+        return session
+
+
+def _serialize_datetime(dt: datetime) -> str:
+    """Serializes datetimes with fixed precision, so that they can be compared as strings."""
+    return dt.isoformat(sep=" ", timespec="microseconds")
+
+
+def _deserialize_datetime(value: str) -> datetime:
+    return datetime.fromisoformat(value)
@@ -1,4 +1,5 @@
 import asyncio
+import contextlib
 from dataclasses import asdict
 import json
 import logging
@@ -6,12 +7,18 @@ import os
 import tarfile
 import traceback
 from tempfile import TemporaryDirectory
-from typing import Any, Dict, Union
+from typing import Any, Dict, Iterator, Union
 
 from podman import PodmanClient
 from podman.errors.exceptions import APIError as PodmanAPIError
 from podman.domain.containers import Container
 
+from docleaner.api.adapters.metrics.prometheus import (
+    RESULT_BYTES,
+    SANDBOX_STAGE_DURATION,
+    SOURCE_BYTES,
+)
+from docleaner.api.adapters.tracing.otel import tracer
 from docleaner.api.core.job import JobParams
 from docleaner.api.core.sandbox import Sandbox, SandboxResult
 
@@ -25,11 +32,15 @@ class ContainerizedSandbox(Sandbox):
     execute '/opt/analyze <source_path>' to retrieve source metadata,
     then execute '/opt/process <source_path> <result_path>' for metadata processing,
     then execute '/opt/analyze <result_path>' to retrieve result metadata
-    and finally retrieve+return the result."""
+    and finally retrieve+return the result.
+    The duration of each of those stages is recorded as metric labeled with the given job type
+    and traced as a span.
+    """
 
-    def __init__(self, container_image: str, podman_uri: str):
+    def __init__(self, container_image: str, podman_uri: str, job_type: str):
         self._image = container_image
         self._podman_uri = podman_uri
+        self._job_type = job_type
         logger.info(
             "Containerized sandbox with image %s via %s is ready",
             self._image,
@@ -41,6 +52,23 @@ class ContainerizedSandbox(Sandbox):
         return await asyncio.to_thread(self._process_blocking, source, params)
 
     def _process_blocking(self, source: bytes, params: JobParams) -> SandboxResult:
+        SOURCE_BYTES.labels(self._job_type).inc(len(source))
+        with tracer.start_as_current_span(
+            "ContainerizedSandbox.process",
+            attributes={"docleaner.job_type": self._job_type},
+        ), SANDBOX_STAGE_DURATION.labels(self._job_type, "total").time():
+            result = self._process_stages(source, params)
+        RESULT_BYTES.labels(self._job_type).inc(len(result.result))
+        return result
+
+    def _process_stages(self, source: bytes, params: JobParams) -> SandboxResult:
+        @contextlib.contextmanager
+        def stage(name: str) -> Iterator[None]:
+            with tracer.start_as_current_span(
+                f"ContainerizedSandbox.{name}"
+            ), SANDBOX_STAGE_DURATION.labels(self._job_type, name).time():
+                yield
+
         with PodmanClient(
             base_url=self._podman_uri
         ) as podman, TemporaryDirectory() as tmpdir:
@@ -65,16 +93,20 @@ class ContainerizedSandbox(Sandbox):
             with open(source_path, "wb") as f:
                 f.write(source)
             logger.debug("Writing temporary params to %s", params_path)
-            with open(params_path, "w") as f:
-                f.write(json.dumps(asdict(params)))
+            # The trace context is of no use within the (offline) container
+            serialized_params = asdict(params)
+            del serialized_params["trace_context"]
+            with open(params_path, "w") as params_file:
+                params_file.write(json.dumps(serialized_params))
             logger.debug("Writing temporary source archive to %s", source_tar)
             with tarfile.open(source_tar, "w") as tar:
                 tar.add(source_path, arcname="source")
                 tar.add(params_path, arcname="params")
             try:
-                container = podman.containers.create(
-                    image=self._image, auto_remove=True, network_mode="none"
-                )
+                with stage("create"):
+                    container = podman.containers.create(
+                        image=self._image, auto_remove=True, network_mode="none"
+                    )
             except PodmanAPIError:
                 logger.warning(
                     f"Could not create container for {self._image}:\n{traceback.format_exc()}"
@@ -86,41 +118,53 @@ class ContainerizedSandbox(Sandbox):
                     metadata_result=metadata_result,
                     metadata_src=metadata_src,
                 )
-            logger.debug("Starting container %s", container.name)
-            container.start()
-            logger.debug("Copying %s into container %s", source_tar, container.name)
-            with open(source_tar, "rb") as tar_raw:
-                container.put_archive("/tmp", tar_raw)
+            with stage("start"):
+                logger.debug("Starting container %s", container.name)
+                container.start()
+                logger.debug("Copying %s into container %s", source_tar, container.name)
+                with open(source_tar, "rb") as tar_raw:
+                    container.put_archive("/tmp", tar_raw)
             try:
                 # Pre-process metadata analysis
-                process_status, process_out = container.exec_run(
-                    ["/opt/analyze", "/tmp/source", "/tmp/meta_src", "/tmp/params"]
-                )
+                with stage("analyze_src"):
+                    process_status, process_out = container.exec_run(
+                        ["/opt/analyze", "/tmp/source", "/tmp/meta_src", "/tmp/params"]
+                    )
                 if process_status != 0:
                     log.append(process_out.decode("utf-8", errors="ignore"))
                     raise ValueError()
                 # Metadata processing
-                process_status, process_out = container.exec_run(
-                    ["/opt/process", "/tmp/source", "/tmp/result", "/tmp/params"]
-                )
+                with stage("process"):
+                    process_status, process_out = container.exec_run(
+                        ["/opt/process", "/tmp/source", "/tmp/result", "/tmp/params"]
+                    )
                 log.append(process_out.decode("utf-8", errors="ignore"))
                 if process_status != 0:
                     raise ValueError()
                 # Post-process metadata analysis
-                process_status, process_out = container.exec_run(
-                    ["/opt/analyze", "/tmp/result", "/tmp/meta_result", "/tmp/params"]
-                )
+                with stage("analyze_result"):
+                    process_status, process_out = container.exec_run(
+                        [
+                            "/opt/analyze",
+                            "/tmp/result",
+                            "/tmp/meta_result",
+                            "/tmp/params",
+                        ]
+                    )
                 if process_status != 0:
                     log.append(process_out.decode("utf-8", errors="ignore"))
                     raise ValueError()
                 # Retrieve result from container
-                result_document = self._retrieve_file("/tmp/result", container, tmpdir)
-                metadata_src = json.loads(
-                    self._retrieve_file("/tmp/meta_src", container, tmpdir)
-                )
-                metadata_result = json.loads(
-                    self._retrieve_file("/tmp/meta_result", container, tmpdir)
-                )
+                with stage("retrieve"):
+                    result_document = self._retrieve_file(
+                        "/tmp/result", container, tmpdir
+                    )
+                    metadata_src = json.loads(
+                        self._retrieve_file("/tmp/meta_src", container, tmpdir)
+                    )
+                    metadata_result = json.loads(
+                        self._retrieve_file("/tmp/meta_result", container, tmpdir)
+                    )
                 success = True
             except ValueError:
                 result_document = b""
@@ -129,7 +173,8 @@ class ContainerizedSandbox(Sandbox):
                 )
             finally:
                 logger.debug("Stopping container %s", container.name)
-                container.stop(timeout=10)
+                with stage("stop"):
+                    container.stop(timeout=10)
                 return SandboxResult(
                     success=success,
                     log=log,
@@ -0,0 +1,111 @@
+from contextvars import ContextVar
+import functools
+import inspect
+import logging
+from typing import Any, Callable, Coroutine, Optional, TextIO, TYPE_CHECKING, TypeVar
+
+from opentelemetry import trace
+
+if TYPE_CHECKING:
+    from opentelemetry.sdk.trace import TracerProvider
+
+T = TypeVar("T", bound=type)
+
+logger = logging.getLogger(__name__)
+tracer = trace.get_tracer(__name__)
+# Tracer provider registered by init_tracing() and the file spans are appended to (if any),
+# both are released by shutdown_tracing()
+_provider: Optional["TracerProvider"] = None
+_span_file: Optional[TextIO] = None
+# Set while a repository operation is being traced, so that operations invoked by
+# another one (e.g. add_job() via add_jobs()) don't open a span of their own
+_tracing_repository: ContextVar[bool] = ContextVar("tracing_repository", default=False)
+
+
+def init_tracing(
+    exporter: str,
+    otlp_endpoint: Optional[str] = None,
+    file_path: Optional[str] = None,
+) -> None:
+    """Registers a global tracer provider that exports spans either via OTLP (HTTP)
+    to otlp_endpoint (or the endpoint set via OTEL_EXPORTER_OTLP_* environment variables)
+    or as JSON lines appended to file_path. Requires the OpenTelemetry SDK, without it
+    (and without calling this function) all spans are no-ops.
+    Call shutdown_tracing() to export pending spans and close the file before exiting.
+    """
+    global _provider, _span_file
+    if exporter not in ["otlp", "file"]:
+        raise ValueError(f"Invalid tracing exporter {exporter}")
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+        from opentelemetry.sdk.trace.export import (
+            BatchSpanProcessor,
+            ConsoleSpanExporter,
+            SpanExporter,
+        )
+    except ImportError:
+        raise ValueError(
+            "Tracing requires the OpenTelemetry SDK, install docleaner-api[tracing]"
+        )
+    span_exporter: SpanExporter
+    if exporter == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+            OTLPSpanExporter,
+        )
+
+        span_exporter = OTLPSpanExporter(endpoint=otlp_endpoint)
+        logger.info("Tracing: OTLP to %s", otlp_endpoint or "default endpoint")
+    else:
+        if file_path is None:
+            raise ValueError("Tracing to a file requires a file path")
+
+        def format_span(span: ReadableSpan) -> str:
+            return str(span.to_json(indent=None)) + "\n"
+
+        _span_file = open(file_path, "a")
+        span_exporter = ConsoleSpanExporter(out=_span_file, formatter=format_span)
+        logger.info("Tracing: JSON lines to %s", file_path)
+    provider = TracerProvider(resource=Resource.create({"service.name": "docleaner"}))
+    provider.add_span_processor(BatchSpanProcessor(span_exporter))
+    trace.set_tracer_provider(provider)
+    _provider = provider
+
+
+def shutdown_tracing() -> None:
+    """Exports all pending spans and releases the resources of the tracer provider
+    registered by init_tracing(), including the file spans are appended to."""
+    global _provider, _span_file
+    if _provider is not None:
+        _provider.shutdown()
+        _provider = None
+    if _span_file is not None:
+        _span_file.close()
+        _span_file = None
+
+
+def trace_repository(cls: T) -> T:
+    """Class decorator for repository adapters that wraps all public coroutine methods
+    defined by the decorated class in a span named after the class and method.
+    Only the outermost of nested calls is traced."""
+    for name, method in list(vars(cls).items()):
+        if not name.startswith("_") and inspect.iscoroutinefunction(method):
+            setattr(cls, name, _trace(method, f"{cls.__name__}.{name}"))
+    return cls
+
+
+def _trace(
+    method: Callable[..., Coroutine[Any, Any, Any]], span_name: str
+) -> Callable[..., Coroutine[Any, Any, Any]]:
+    @functools.wraps(method)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        if _tracing_repository.get():
+            return await method(*args, **kwargs)
+        token = _tracing_repository.set(True)
+        try:
+            with tracer.start_as_current_span(span_name):
+                return await method(*args, **kwargs)
+        finally:
+            _tracing_repository.reset(token)
+
+    return wrapper
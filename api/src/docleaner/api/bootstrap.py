@@ -1,20 +1,30 @@
 import socket
 from configparser import ConfigParser
+from datetime import timedelta
 import importlib
 import importlib.metadata
 import logging
 import logging.handlers
 import os
-from typing import List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
+from pymongo.write_concern import WriteConcern
+
+from docleaner.api.adapters.blob_store.filesystem_blob_store import (
+    FilesystemBlobStore,
+)
 from docleaner.api.adapters.clock.system_clock import SystemClock
 from docleaner.api.adapters.file_identifier.magic_file_identifier import (
     MagicFileIdentifier,
 )
 from docleaner.api.adapters.job_queue.async_job_queue import AsyncJobQueue
 from docleaner.api.adapters.logging.syslog import SysLogHandler5424
+from docleaner.api.adapters.repository.memory_repository import MemoryRepository
 from docleaner.api.adapters.repository.mongodb_repository import MongoDBRepository
+from docleaner.api.adapters.repository.sqlite_repository import SQLiteRepository
+from docleaner.api.adapters.tracing.otel import init_tracing
 from docleaner.api.core.job import JobType
+from docleaner.api.services.blob_store import BlobStore
 from docleaner.api.services.clock import Clock
 from docleaner.api.services.file_identifier import FileIdentifier
 from docleaner.api.services.job_queue import JobQueue
@@ -65,6 +75,15 @@ def bootstrap(
         "Bootstrapping docleaner r%s", importlib.metadata.version("docleaner-api")
     )
     logger.info("Log level: %s", log_level)
+    # Optional tracing via OpenTelemetry
+    if (tracing := config.get("docleaner", "tracing", fallback="none")) != "none":
+        init_tracing(
+            tracing,
+            otlp_endpoint=config.get(
+                "docleaner", "tracing.otlp_endpoint", fallback=None
+            ),
+            file_path=config.get("docleaner", "tracing.file", fallback=None),
+        )
     # Load configured plugins
     job_types = []
     for section in config.sections():
@@ -79,8 +98,98 @@ def bootstrap(
     if file_identifier is None:
         file_identifier = MagicFileIdentifier()
     if repo is None:
-        repo = MongoDBRepository(clock, job_types, "database", 27017)
+        repo = create_repository(config, clock, job_types)
     if queue is None:
         available_cpu_cores = len(os.sched_getaffinity(0))
         queue = AsyncJobQueue(repo, available_cpu_cores)
     return clock, file_identifier, job_types, queue, repo
+
+
+def create_repository(
+    config: ConfigParser, clock: Clock, job_types: List[JobType]
+) -> Repository:
+    """Initializes the repository (and blob store) selected by the configuration."""
+    logger = logging.getLogger(__name__)
+    repo_type = config.get("docleaner", "repository", fallback="mongodb")
+    if repo_type == "sqlite":
+        db_path = config.get(
+            "docleaner", "sqlite.path", fallback="/var/lib/docleaner/docleaner.db"
+        )
+        blob_store_path = config.get(
+            "docleaner",
+            "blob_store.path",
+            fallback=os.path.join(os.path.dirname(db_path), "blobs"),
+        )
+        return SQLiteRepository(
+            clock, job_types, db_path, FilesystemBlobStore(blob_store_path)
+        )
+    elif repo_type == "memory":
+        max_resident_size = config.getint(
+            "docleaner", "memory.max_resident_size", fallback=0
+        )
+        return MemoryRepository(
+            clock,
+            max_resident_bytes=(
+                max_resident_size * 1024 * 1024 if max_resident_size > 0 else None
+            ),
+        )
+    elif repo_type != "mongodb":
+        raise ValueError(f"Invalid repository {repo_type}")
+    blob_store: Optional[BlobStore] = None
+    blob_store_type = config.get("docleaner", "blob_store", fallback="gridfs")
+    if blob_store_type == "filesystem":
+        blob_store = FilesystemBlobStore(config.get("docleaner", "blob_store.path"))
+    elif blob_store_type != "gridfs":
+        raise ValueError(f"Invalid blob store {blob_store_type}")
+    logger.info("Blob store: %s", blob_store_type)
+    # Options of the MongoDB client, mapped from their configuration keys
+    client_options: Dict[str, Any] = {}
+    for key, option in [
+        ("mongodb.max_pool_size", "maxPoolSize"),
+        ("mongodb.min_pool_size", "minPoolSize"),
+        ("mongodb.connect_timeout", "connectTimeoutMS"),
+        ("mongodb.server_selection_timeout", "serverSelectionTimeoutMS"),
+        ("mongodb.socket_timeout", "socketTimeoutMS"),
+    ]:
+        if config.has_option("docleaner", key):
+            client_options[option] = config.getint("docleaner", key)
+    for key, option in [
+        ("mongodb.compressors", "compressors"),
+        ("mongodb.replica_set", "replicaSet"),
+    ]:
+        if len(value := config.get("docleaner", key, fallback="")) > 0:
+            client_options[option] = value
+    write_concerns = {}
+    for op_class in ["create", "update", "delete"]:
+        w = config.get("docleaner", f"mongodb.write_concern.{op_class}", fallback="")
+        if len(w) > 0:
+            write_concerns[op_class] = WriteConcern(w=int(w) if w.isdigit() else w)
+    compression = config.get("docleaner", "mongodb.compression", fallback="none")
+    return MongoDBRepository(
+        clock,
+        job_types,
+        config.get("docleaner", "mongodb.host", fallback="database"),
+        config.getint("docleaner", "mongodb.port", fallback=27017),
+        ttl_expiry=config.getboolean("docleaner", "mongodb.ttl_expiry", fallback=False),
+        job_keepalive=timedelta(
+            minutes=config.getint("docleaner", "mongodb.job_keepalive", fallback=10)
+        ),
+        session_keepalive=timedelta(
+            minutes=config.getint(
+                "docleaner", "mongodb.session_keepalive", fallback=60 * 24
+            )
+        ),
+        blob_store=blob_store,
+        session_refresh_delay=config.getfloat(
+            "docleaner", "mongodb.session_refresh_delay", fallback=1.0
+        ),
+        client_options=client_options,
+        list_read_preference=config.get(
+            "docleaner", "mongodb.list_read_preference", fallback="primary"
+        ),
+        write_concerns=write_concerns,
+        compression=compression if compression != "none" else None,
+        compression_level=config.getint(
+            "docleaner", "mongodb.compression_level", fallback=3
+        ),
+    )
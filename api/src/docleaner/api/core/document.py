@@ -0,0 +1,24 @@
+from dataclasses import dataclass
+import hashlib
+from typing import AsyncIterator, Callable, Optional
+
+
+@dataclass(frozen=True, kw_only=True)
+class DocumentStream:
+    """Handle to a stored document (e.g. a job result) that can be read
+    in parts as a stream of chunks instead of loading it into memory."""
+
+    digest: str  # SHA-256 digest (hex) of the document
+    size: int  # Document size in bytes
+    # Yields the document's bytes from start (inclusive) to end (exclusive, None for all)
+    read: Callable[[int, Optional[int]], AsyncIterator[bytes]]
+    path: Optional[str] = None  # Local file holding the document as-is (if any)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "DocumentStream":
+        """Creates a handle for a document that is held in memory."""
+
+        async def read(start: int, end: Optional[int]) -> AsyncIterator[bytes]:
+            yield data[start:end]
+
+        return cls(digest=hashlib.sha256(data).hexdigest(), size=len(data), read=read)
@@ -38,6 +38,8 @@ class JobParams:
     metadata: List[MetadataField] = field(
         default_factory=list
     )  # Metadata to assign to specific fields (instead of using the plugin defaults)
+    # Trace context (W3C headers) of the job's creation, joined by its asynchronous processing
+    trace_context: Dict[str, str] = field(default_factory=dict)
 
 
 @dataclass(eq=False, kw_only=True)
@@ -63,3 +65,15 @@ class Job:
 
     def __post_init__(self) -> None:
         self.updated = self.created
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class JobSummary:
+    """Compact, immutable view of a job as returned by job listings."""
+
+    id: str
+    type: JobType
+    status: JobStatus
+    created: datetime
+    updated: datetime
+    session_id: Optional[str] = None
@@ -34,18 +34,21 @@ async def purge(
     clock, file_identifier, job_types, queue, repo = bootstrap(
         config, log_level="warning"
     )
-    if not no_standalone_job_purging:
-        purged_jids = await purge_jobs(
-            purge_after=timedelta(minutes=job_keepalive), repo=repo
-        )
-        if len(purged_jids) > 0 and not quiet:
-            print(f"Purged standalone jobs: {len(purged_jids)}")
-    if not no_session_purging:
-        purged_sids = await purge_sessions(
-            purge_after=timedelta(minutes=session_keepalive), repo=repo
-        )
-        if len(purged_sids) > 0 and not quiet:
-            print(f"Purged sessions: {len(purged_sids)}")
+    try:
+        if not no_standalone_job_purging:
+            purged_jids = await purge_jobs(
+                purge_after=timedelta(minutes=job_keepalive), repo=repo
+            )
+            if len(purged_jids) > 0 and not quiet:
+                print(f"Purged standalone jobs: {len(purged_jids)}")
+        if not no_session_purging:
+            purged_sids = await purge_sessions(
+                purge_after=timedelta(minutes=session_keepalive), repo=repo
+            )
+            if len(purged_sids) > 0 and not quiet:
+                print(f"Purged sessions: {len(purged_sids)}")
+    finally:
+        await repo.disconnect()
 
 
 async def show_status(
@@ -54,22 +57,30 @@ async def show_status(
     clock, file_identifier, job_types, queue, repo = bootstrap(
         config, log_level="warning"
     )
-    total_jobs, created, queued, running, success, error = await get_job_stats(repo)
-    current_jobs = created + queued + running + success + error
-    print(
-        f"{current_jobs} jobs in db (C: {created} | Q: {queued} | R: {running} |"
-        f" S: {success} | E: {error}), {total_jobs} total"
-    )
+    try:
+        total_jobs, created, queued, running, success, error, dedup_ratio = (
+            await get_job_stats(repo)
+        )
+        current_jobs = created + queued + running + success + error
+        print(
+            f"{current_jobs} jobs in db (C: {created} | Q: {queued} | R: {running} |"
+            f" S: {success} | E: {error}), {total_jobs} total, dedup ratio {dedup_ratio:.2f}"
+        )
+    finally:
+        await repo.disconnect()
 
 
 async def diag_list(config: ConfigParser, status: JobStatus) -> None:
     clock, file_identifier, job_types, queue, repo = bootstrap(
         config, log_level="warning"
     )
-    jobs = await get_jobs(status, repo)
-    print("jid / type")
-    for jid, job_type, job_log in jobs:
-        print(f"{jid} / {job_type}")
+    try:
+        jobs = await get_jobs(status, repo)
+        print("jid / type")
+        for jid, job_type in jobs:
+            print(f"{jid} / {job_type}")
+    finally:
+        await repo.disconnect()
 
 
 async def diag_job_details(
@@ -102,6 +113,8 @@ async def diag_job_details(
     except ValueError as e:
         print(e)
         sys.exit(1)
+    finally:
+        await repo.disconnect()
 
 
 async def debug_delete_job(config: ConfigParser, jid: str) -> None:
@@ -114,6 +127,8 @@ async def debug_delete_job(config: ConfigParser, jid: str) -> None:
     except ValueError as e:
         print(e)
         sys.exit(1)
+    finally:
+        await repo.disconnect()
 
 
 def cmd_tasks(args: argparse.Namespace, config: ConfigParser) -> None:
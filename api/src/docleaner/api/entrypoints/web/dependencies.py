@@ -89,6 +89,15 @@ def get_contact() -> Optional[str]:
     return contact
 
 
+def get_max_upload_size() -> Optional[int]:
+    """Returns the maximum size of uploaded documents in bytes (or None if unlimited)."""
+    global _config
+    max_size = _config.getint("docleaner", "max_upload_size", fallback=100)
+    if max_size <= 0:
+        return None
+    return max_size * 1024 * 1024
+
+
 def get_version() -> str:
     global _version
     return _version
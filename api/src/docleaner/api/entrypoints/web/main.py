@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import asynccontextmanager
 from importlib.metadata import version
 import os
@@ -7,22 +8,36 @@ from fastapi import FastAPI, Request, Response
 from fastapi.exception_handlers import http_exception_handler
 from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 import starlette.status as status
 
+from docleaner.api.adapters.metrics.prometheus import monitor_event_loop_lag
+from docleaner.api.adapters.tracing.otel import shutdown_tracing
 from docleaner.api.entrypoints.web.dependencies import (
     base_path,
     init as init_dependencies,
+    get_max_upload_size,
     get_queue,
+    get_repo,
     templates,
 )
+from docleaner.api.entrypoints.web.middleware import (
+    MetricsMiddleware,
+    UploadSizeLimitMiddleware,
+)
 from docleaner.api.entrypoints.web.routers import rest, web
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     init_dependencies()
+    event_loop_monitor = asyncio.create_task(monitor_event_loop_lag())
     yield
+    event_loop_monitor.cancel()
     await get_queue().shutdown()
+    # Writes pending session refreshes
+    await get_repo().disconnect()
+    shutdown_tracing()
 
 
 app = FastAPI(
@@ -33,6 +48,15 @@ app.mount(
 )
 app.include_router(rest.rest_api)
 app.include_router(web.web_api)
+app.add_middleware(UploadSizeLimitMiddleware, get_max_size=get_max_upload_size)
+# Outermost middleware, so that rejected uploads are recorded as well
+app.add_middleware(MetricsMiddleware)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    """Exposes runtime metrics in Prometheus' text format."""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 
 @app.exception_handler(web.ValidationException)
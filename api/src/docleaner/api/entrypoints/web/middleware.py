@@ -0,0 +1,91 @@
+import time
+from typing import Callable, Optional
+
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+import starlette.status as status
+
+from docleaner.api.adapters.metrics.prometheus import HTTP_REQUEST_DURATION
+
+
+class UploadSizeLimitMiddleware:
+    """Rejects requests with a body larger than the size returned by get_max_size
+    (None if unlimited) before it is buffered: Requests announcing a larger body via
+    Content-Length are answered right away, streamed bodies are aborted as soon as
+    they exceed that size."""
+
+    def __init__(self, app: ASGIApp, get_max_size: Callable[[], Optional[int]]):
+        self._app = app
+        self._get_max_size = get_max_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        max_size = self._get_max_size() if scope["type"] == "http" else None
+        if max_size is None:
+            await self._app(scope, receive, send)
+            return
+        content_length = Headers(scope=scope).get("content-length", "")
+        if content_length.isdigit() and int(content_length) > max_size:
+            response = JSONResponse(
+                {"detail": self._get_detail(max_size)},
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+            await response(scope, receive, send)
+            return
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_size:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=self._get_detail(max_size),
+                    )
+            return message
+
+        await self._app(scope, limited_receive, send)
+
+    @staticmethod
+    def _get_detail(max_size: int) -> str:
+        return f"The request body exceeds the maximum size of {max_size // 1024**2} MB."
+
+
+class MetricsMiddleware:
+    """Records the time until the response to each HTTP request starts per method,
+    route (its path template, such as /api/v1/jobs/{jid}) and status code.
+    Requests that don't match any route are recorded with route 'other'."""
+
+    def __init__(self, app: ASGIApp):
+        self._app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self._app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        response_status: Optional[int] = None
+
+        def observe(status_code: int) -> None:
+            # The matching route is attached to the scope during routing
+            route = getattr(scope.get("route"), "path", "other")
+            HTTP_REQUEST_DURATION.labels(scope["method"], route, status_code).observe(
+                time.perf_counter() - start
+            )
+
+        async def timed_send(message: Message) -> None:
+            nonlocal response_status
+            if message["type"] == "http.response.start":
+                response_status = message["status"]
+                observe(message["status"])
+            await send(message)
+
+        try:
+            await self._app(scope, receive, timed_send)
+        except Exception:
+            if response_status is None:
+                observe(status.HTTP_500_INTERNAL_SERVER_ERROR)
+            raise
@@ -1,7 +1,23 @@
+import asyncio
 from datetime import datetime
-from typing import Any, List, Optional
+import functools
+import json
+import os
+import tarfile
+from typing import IO, Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+import zipfile
 
-from fastapi import APIRouter, Depends, HTTPException, Response, UploadFile
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    UploadFile,
+)
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import starlette.status as status
 
@@ -11,22 +27,52 @@ from docleaner.api.entrypoints.web.dependencies import (
     get_base_url,
     get_file_identifier,
     get_job_types,
+    get_max_upload_size,
     get_queue,
     get_repo,
 )
 from docleaner.api.entrypoints.web.routers.web import (
+    UPLOAD_CHUNK_SIZE,
     OctetStreamResponse,
     jobs_get_result as web_jobs_get_result,
+    read_upload,
 )
+from docleaner.api.entrypoints.web.zip_stream import stream_zip
 from docleaner.api.services.file_identifier import FileIdentifier
 from docleaner.api.services.job_queue import JobQueue
-from docleaner.api.services.jobs import create_job, delete_job, get_job
+from docleaner.api.services.jobs import (
+    await_job,
+    create_job_from_stream,
+    create_jobs_from_streams,
+    delete_job,
+    get_job,
+    get_job_status,
+    watch_job,
+)
 from docleaner.api.services.repository import Repository
-from docleaner.api.services.sessions import create_session, delete_session, get_session
+from docleaner.api.services.sessions import (
+    await_session,
+    create_session,
+    delete_session,
+    get_session,
+    get_session_results,
+    watch_session,
+)
 
 
 rest_api = APIRouter(prefix="/api/v1")
 
+# Disables caching and response buffering (by nginx) of event streams
+EVENT_STREAM_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+# Comment sent to keep idle event streams alive
+EVENT_STREAM_KEEPALIVE = ": keepalive\n\n"
+# Maximum number of documents that can be submitted at once
+MAX_BATCH_SIZE = 1000
+# Maximum number of seconds a request may wait for a job or session to finish
+MAX_WAIT = 30.0
+# Maximum number of jobs per page of a session's job list
+MAX_PAGE_SIZE = 1000
+
 
 class JobDetails(BaseModel):
     id: str
@@ -37,12 +83,27 @@ class JobDetails(BaseModel):
     status: JobStatus
 
 
-class JobAbbreviatedDetails(BaseModel):
+class JobStatusDetails(BaseModel):
     id: str
+    type: str
+    status: JobStatus
     created: datetime
     updated: datetime
+
+
+class JobAbbreviatedDetails(BaseModel):
+    id: str
+    # Optional, since job listings can be restricted to selected fields
+    created: Optional[datetime] = None
+    updated: Optional[datetime] = None
+    type: Optional[str] = None
+    status: Optional[JobStatus] = None
+
+
+class BatchJobDetails(BaseModel):
+    id: str
+    name: str
     type: str
-    status: JobStatus
 
 
 class SessionDetails(BaseModel):
@@ -52,12 +113,90 @@ class SessionDetails(BaseModel):
     jobs_total: int
     jobs_finished: int
     jobs: Optional[List[JobAbbreviatedDetails]]
+    jobs_next: Optional[str] = None
 
 
 class RESTException(HTTPException):
     pass
 
 
+class EventStreamResponse(StreamingResponse):
+    media_type = "text/event-stream"
+
+
+class ZipResponse(StreamingResponse):
+    media_type = "application/zip"
+
+
+async def read_archive(
+    archive: UploadFile, max_size: Optional[int]
+) -> List[Tuple[AsyncIterator[bytes], str]]:
+    """Returns a stream and name for each regular file within an uploaded zip or
+    (uncompressed) tar archive. Raises a ValueError if the archive can't be read
+    or its contents exceed max_size bytes."""
+
+    def list_members() -> List[Tuple[Callable[[], Optional[IO[bytes]]], str, int]]:
+        archive.file.seek(0)
+        if zipfile.is_zipfile(archive.file):
+            zip_archive = zipfile.ZipFile(archive.file)
+            return [
+                (
+                    functools.partial(zip_archive.open, info),
+                    info.filename,
+                    info.file_size,
+                )
+                for info in zip_archive.infolist()
+                if not info.is_dir()
+            ]
+        archive.file.seek(0)
+        try:
+            # Members of compressed tar archives can't be read interleaved efficiently
+            tar_archive = tarfile.open(fileobj=archive.file, mode="r:")
+        except tarfile.TarError:
+            raise ValueError("Unsupported archive type")
+        return [
+            (
+                functools.partial(tar_archive.extractfile, member),
+                member.name,
+                member.size,
+            )
+            for member in tar_archive.getmembers()
+            if member.isfile()
+        ]
+
+    async def read_member(
+        open_member: Callable[[], Optional[IO[bytes]]],
+    ) -> AsyncIterator[bytes]:
+        member_file = await asyncio.to_thread(open_member)
+        if member_file is None:
+            raise ValueError("Archive member is not a regular file")
+        try:
+            while (
+                len(
+                    chunk := await asyncio.to_thread(
+                        member_file.read, UPLOAD_CHUNK_SIZE
+                    )
+                )
+                > 0
+            ):
+                yield chunk
+        finally:
+            member_file.close()
+
+    members = await asyncio.to_thread(list_members)
+    if max_size is not None and sum(size for _, _, size in members) > max_size:
+        raise ValueError("Archive contents are too large")
+    return [
+        (read_member(open_member), os.path.basename(name))
+        for open_member, name, _ in members
+    ]
+
+
+def format_event(event: str, event_id: str, data: Dict[str, Any]) -> str:
+    """Serializes a server-sent event carrying JSON data."""
+    return f"event: {event}\nid: {event_id}\ndata: {json.dumps(data)}\n\n"
+
+
 @rest_api.post("/jobs", response_model=JobDetails, status_code=201)
 async def jobs_create(
     response: Response,
@@ -70,8 +209,8 @@ async def jobs_create(
     queue: JobQueue = Depends(get_queue),
 ) -> Any:
     try:
-        jid, _ = await create_job(
-            await doc_src.read(),
+        jid, _ = await create_job_from_stream(
+            read_upload(doc_src),
             doc_src.filename or "",
             repo,
             queue,
@@ -105,8 +244,14 @@ async def jobs_create(
 
 
 @rest_api.get("/jobs/{jid}", response_model=JobDetails)
-async def jobs_get(jid: str, repo: Repository = Depends(get_repo)) -> Any:
+async def jobs_get(
+    jid: str, wait: float = Query(0, ge=0), repo: Repository = Depends(get_repo)
+) -> Any:
+    """Returns the job's details. If wait is given, the response is delayed until the
+    job has finished or wait seconds (at most MAX_WAIT) have passed."""
     try:
+        if wait > 0:
+            await await_job(jid, repo, min(wait, MAX_WAIT))
         (
             job_status,
             job_type,
@@ -115,7 +260,7 @@ async def jobs_get(jid: str, repo: Repository = Depends(get_repo)) -> Any:
             job_metadata_result,
             _,
         ) = await get_job(jid, repo)
-    except ValueError:
+    except (ValueError, RuntimeError):  # Nonexistent or deleted while waiting
         raise RESTException(status_code=status.HTTP_404_NOT_FOUND)
     return {
         "id": jid,
@@ -127,11 +272,84 @@ async def jobs_get(jid: str, repo: Repository = Depends(get_repo)) -> Any:
     }
 
 
+@rest_api.get("/jobs/{jid}/status", response_model=JobStatusDetails)
+async def jobs_get_status(
+    jid: str,
+    request: Request,
+    response: Response,
+    repo: Repository = Depends(get_repo),
+) -> Any:
+    """Returns only the job's status, type and timestamps, which is considerably cheaper
+    than retrieving the job's details and thus suited for frequent polling. Responses carry
+    an ETag that changes with every job update to support conditional requests."""
+    try:
+        job_status, job_type, created, updated = await get_job_status(jid, repo)
+    except ValueError:
+        raise RESTException(status_code=status.HTTP_404_NOT_FOUND)
+    headers = {
+        "Cache-Control": "no-cache",
+        "ETag": f'"{job_status.value}-{updated.timestamp():.6f}"',
+    }
+    if any(
+        tag.strip() in ["*", headers["ETag"], f"W/{headers['ETag']}"]
+        for tag in request.headers.get("if-none-match", "").split(",")
+    ):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return {
+        "id": jid,
+        "type": job_type.id,
+        "status": job_status,
+        "created": created,
+        "updated": updated,
+    }
+
+
 @rest_api.get(
     "/jobs/{jid}/result", response_class=OctetStreamResponse, response_model=None
 )
-async def jobs_get_result(jid: str, repo: Repository = Depends(get_repo)) -> Response:
-    return await web_jobs_get_result(jid, repo)
+async def jobs_get_result(
+    jid: str, request: Request, repo: Repository = Depends(get_repo)
+) -> Response:
+    return await web_jobs_get_result(jid, request, repo)
+
+
+@rest_api.get(
+    "/jobs/{jid}/events", response_class=EventStreamResponse, response_model=None
+)
+async def jobs_get_events(
+    jid: str,
+    last_event_id: Optional[str] = None,
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+    repo: Repository = Depends(get_repo),
+) -> Response:
+    """Streams server-sent 'status' events whenever the job's status changes, starting with
+    its current one. A status that's already known to the client can be passed as event id
+    via the Last-Event-ID header or query parameter. Ends after the job has finished."""
+    if await repo.find_job_summary(jid) is None:
+        raise RESTException(status_code=status.HTTP_404_NOT_FOUND)
+    try:
+        known_status: Optional[JobStatus] = JobStatus(
+            int(last_event_id_header or last_event_id or "")
+        )
+    except ValueError:
+        known_status = None
+
+    async def events() -> AsyncIterator[str]:
+        try:
+            async for job_status in watch_job(jid, repo, known_status):
+                if job_status is None:
+                    yield EVENT_STREAM_KEEPALIVE
+                    continue
+                yield format_event(
+                    "status",
+                    str(job_status.value),
+                    {"id": jid, "status": job_status.value},
+                )
+        except ValueError:
+            pass  # Deleted in the meantime
+
+    return EventStreamResponse(events(), headers=EVENT_STREAM_HEADERS)
 
 
 @rest_api.delete("/jobs/{jid}", response_model=None, status_code=204)
@@ -166,17 +384,42 @@ async def sessions_create(
     }
 
 
-@rest_api.get("/sessions/{sid}", response_model=SessionDetails)
+@rest_api.get(
+    "/sessions/{sid}", response_model=SessionDetails, response_model_exclude_unset=True
+)
 async def sessions_get(
-    sid: str, jobs: bool = True, repo: Repository = Depends(get_repo)
+    sid: str,
+    jobs: bool = True,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    status_filter: Optional[List[JobStatus]] = Query(None, alias="status"),
+    fields: Optional[List[str]] = Query(None),
+    wait: float = Query(0, ge=0),
+    repo: Repository = Depends(get_repo),
 ) -> Any:
+    """Returns the session's details. If wait is given, the response is delayed until all
+    jobs of the session have finished or wait seconds (at most MAX_WAIT) have passed.
+    The job list can be filtered by status, restricted to selected (comma-separated) fields
+    and paged through with limit and after, which takes the jobs_next value of the previous page.
+    """
+    available_fields = set(JobAbbreviatedDetails.model_fields)
+    job_fields = available_fields
+    if fields is not None:
+        job_fields = {f.strip() for entry in fields for f in entry.split(",")} | {"id"}
+        if not job_fields <= available_fields:
+            raise RESTException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"Unknown job fields {', '.join(sorted(job_fields - available_fields))}",
+            )
     try:
+        if wait > 0:
+            await await_session(sid, repo, min(wait, MAX_WAIT))
         created, updated, jobs_total, jobs_finished, job_list = await get_session(
-            sid, repo
+            sid, repo, limit=limit if jobs else 0, after=after, status=status_filter
         )
     except ValueError:
         raise RESTException(status_code=status.HTTP_404_NOT_FOUND)
-    result = {
+    result: Dict[str, Any] = {
         "id": sid,
         "created": created,
         "updated": updated,
@@ -187,17 +430,127 @@ async def sessions_get(
     if jobs:
         result["jobs"] = [
             {
-                "id": jid,
-                "created": job_created,
-                "updated": job_updated,
-                "type": job_type.id,
-                "status": job_status,
+                field: value
+                for field, value in {
+                    "id": jid,
+                    "created": job_created,
+                    "updated": job_updated,
+                    "type": job_type.id,
+                    "status": job_status,
+                }.items()
+                if field in job_fields
             }
             for jid, job_created, job_updated, job_status, job_type in job_list
         ]
+        if limit is not None and len(job_list) == limit:
+            result["jobs_next"] = job_list[-1][0]
     return result
 
 
+@rest_api.post(
+    "/sessions/{sid}/jobs", response_model=List[BatchJobDetails], status_code=201
+)
+async def sessions_create_jobs(
+    sid: str,
+    doc_src: Optional[List[UploadFile]] = None,
+    archive: Optional[UploadFile] = None,
+    file_identifier: FileIdentifier = Depends(get_file_identifier),
+    job_types: List[JobType] = Depends(get_job_types),
+    max_upload_size: Optional[int] = Depends(get_max_upload_size),
+    repo: Repository = Depends(get_repo),
+    queue: JobQueue = Depends(get_queue),
+) -> Any:
+    """Creates jobs for multiple documents within a session at once. Documents can be
+    uploaded as individual files (doc_src) and/or within a zip or tar archive (archive).
+    Either all documents are accepted or none of them."""
+    if await repo.find_session(sid) is None:
+        raise RESTException(status_code=status.HTTP_404_NOT_FOUND)
+    sources = [(read_upload(upload), upload.filename or "") for upload in doc_src or []]
+    if archive is not None:
+        try:
+            sources.extend(await read_archive(archive, max_upload_size))
+        except (ValueError, zipfile.BadZipFile, tarfile.TarError):
+            raise RESTException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="You uploaded an unsupported or too large archive.",
+            )
+    if len(sources) > MAX_BATCH_SIZE:
+        raise RESTException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"You can't upload more than {MAX_BATCH_SIZE} documents at once.",
+        )
+    try:
+        jobs = await create_jobs_from_streams(
+            sources, repo, queue, file_identifier, job_types, JobParams(), sid
+        )
+    except (ValueError, zipfile.BadZipFile, tarfile.TarError):
+        raise RESTException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="You uploaded no or an unsupported document type.",
+        )
+    return [
+        {"id": jid, "name": name, "type": job_type.id}
+        for (jid, job_type), (_, name) in zip(jobs, sources)
+    ]
+
+
+@rest_api.get(
+    "/sessions/{sid}/results.zip", response_class=ZipResponse, response_model=None
+)
+async def sessions_get_results(
+    sid: str, repo: Repository = Depends(get_repo)
+) -> Response:
+    """Streams a ZIP archive of the results of all successfully completed jobs of a session."""
+    try:
+        results = await get_session_results(sid, repo)
+    except ValueError:
+        raise RESTException(status_code=status.HTTP_404_NOT_FOUND)
+    return ZipResponse(
+        stream_zip(results),
+        headers={"Content-Disposition": f'attachment; filename="{sid}.zip"'},
+    )
+
+
+@rest_api.get(
+    "/sessions/{sid}/events", response_class=EventStreamResponse, response_model=None
+)
+async def sessions_get_events(
+    sid: str,
+    last_event_id: Optional[str] = None,
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+    repo: Repository = Depends(get_repo),
+) -> Response:
+    """Streams server-sent 'progress' events with the session's job counters whenever
+    a job is added, removed or changes its status, starting with the current counters.
+    The id of the last received event can be passed via the Last-Event-ID header or
+    query parameter to only receive subsequent changes."""
+    if await repo.find_session(sid) is None:
+        raise RESTException(status_code=status.HTTP_404_NOT_FOUND)
+
+    async def events() -> AsyncIterator[str]:
+        try:
+            async for progress in watch_session(
+                sid, repo, last_event_id_header or last_event_id
+            ):
+                if progress is None:
+                    yield EVENT_STREAM_KEEPALIVE
+                    continue
+                progress_id, jobs_total, jobs_finished = progress
+                yield format_event(
+                    "progress",
+                    progress_id,
+                    {
+                        "id": sid,
+                        "jobs_total": jobs_total,
+                        "jobs_finished": jobs_finished,
+                    },
+                )
+        except ValueError:
+            pass  # Deleted in the meantime
+
+    return EventStreamResponse(events(), headers=EVENT_STREAM_HEADERS)
+
+
 @rest_api.delete("/sessions/{sid}", response_model=None, status_code=204)
 async def sessions_delete(sid: str, repo: Repository = Depends(get_repo)) -> Response:
     try:
@@ -1,8 +1,14 @@
 from dataclasses import asdict, dataclass
-from typing import Any, Dict, List, Optional, Union
+import re
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
 
 from fastapi import APIRouter, Depends, HTTPException, Request, Response, UploadFile
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import (
+    FileResponse,
+    HTMLResponse,
+    RedirectResponse,
+    StreamingResponse,
+)
 import starlette.status as status
 from starlette.templating import _TemplateResponse
 from urllib.parse import quote
@@ -20,13 +26,23 @@ from docleaner.api.entrypoints.web.dependencies import (
 )
 from docleaner.api.services.file_identifier import FileIdentifier
 from docleaner.api.services.job_queue import JobQueue
-from docleaner.api.services.jobs import create_job, delete_job, get_job, get_job_result
+from docleaner.api.services.jobs import (
+    create_job_from_stream,
+    delete_job,
+    get_job,
+    get_job_result_stream,
+)
 from docleaner.api.services.repository import Repository
-from docleaner.api.services.sessions import get_session
+from docleaner.api.services.sessions import get_progress_id, get_session
 
 
 web_api = APIRouter(include_in_schema=False)
 
+# Size of the chunks uploaded documents are read in
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Single byte range as in "bytes=<first>-<last>", "bytes=<first>-" or "bytes=-<suffix length>"
+BYTE_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
 
 class WebException(HTTPException):
     pass
@@ -46,6 +62,12 @@ class ValidationException(HTTPException):
         super().__init__(status_code=422)
 
 
+async def read_upload(upload: UploadFile) -> AsyncIterator[bytes]:
+    """Yields the contents of an uploaded document in chunks."""
+    while len(chunk := await upload.read(UPLOAD_CHUNK_SIZE)) > 0:
+        yield chunk
+
+
 @web_api.get("/", response_class=HTMLResponse, response_model=None)
 def landing_get(
     request: Request,
@@ -74,8 +96,8 @@ async def landing_post(
     version: str = Depends(get_version),
 ) -> Union[_TemplateResponse, RedirectResponse]:
     try:
-        jid, _ = await create_job(
-            await doc_src.read(),
+        jid, _ = await create_job_from_stream(
+            read_upload(doc_src),
             doc_src.filename or "",
             repo,
             queue,
@@ -152,9 +174,11 @@ async def jobs_get(
 @web_api.get(
     "/jobs/{jid}/result", response_class=OctetStreamResponse, response_model=None
 )
-async def jobs_get_result(jid: str, repo: Repository = Depends(get_repo)) -> Response:
+async def jobs_get_result(
+    jid: str, request: Request, repo: Repository = Depends(get_repo)
+) -> Response:
     try:
-        job_result, document_name = await get_job_result(jid, repo)
+        result, document_name = await get_job_result_stream(jid, repo)
     except ValueError:
         raise WebException(status_code=status.HTTP_404_NOT_FOUND)
     quoted_document_name = quote(document_name)
@@ -163,9 +187,48 @@ async def jobs_get_result(jid: str, repo: Repository = Depends(get_repo)) -> Res
         file_name = f"filename*=utf-8''{quoted_document_name}"
     else:
         file_name = f'filename="{document_name}"'
-    response_headers = {"Content-Disposition": f"attachment; {file_name}"}
-    return Response(
-        content=job_result,
+    # The result's digest serves as strong validator
+    etag = f'"{result.digest}"'
+    if any(
+        tag.strip() in ["*", etag, f"W/{etag}"]
+        for tag in request.headers.get("if-none-match", "").split(",")
+    ):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+        )
+    response_headers = {"Content-Disposition": f"attachment; {file_name}", "ETag": etag}
+    if result.path is not None:
+        # Stream the result from disk, which also takes care of range requests
+        return FileResponse(
+            result.path,
+            media_type="application/octet-stream",
+            headers=response_headers,
+        )
+    start, end = 0, result.size
+    status_code = status.HTTP_200_OK
+    byte_range = BYTE_RANGE_PATTERN.match(request.headers.get("range", "").strip())
+    if byte_range is not None and request.headers.get("if-range", etag) == etag:
+        first, last = byte_range.groups()
+        # Invalid ranges are ignored, in which case the whole result is returned
+        if first != "" and (last == "" or int(last) >= int(first)):
+            start = int(first)
+            end = result.size if last == "" else min(int(last) + 1, result.size)
+            status_code = status.HTTP_206_PARTIAL_CONTENT
+        elif first == "" and last != "":
+            start = max(result.size - int(last), 0)
+            status_code = status.HTTP_206_PARTIAL_CONTENT
+        if start >= end:
+            return Response(
+                status_code=status.HTTP_416_RANGE_NOT_SATISFIABLE,
+                headers={"Content-Range": f"bytes */{result.size}"},
+            )
+        if status_code == status.HTTP_206_PARTIAL_CONTENT:
+            response_headers["Content-Range"] = f"bytes {start}-{end - 1}/{result.size}"
+    response_headers["Accept-Ranges"] = "bytes"
+    response_headers["Content-Length"] = str(end - start)
+    return StreamingResponse(
+        result.read(start, end),
+        status_code=status_code,
         media_type="application/octet-stream",
         headers=response_headers,
     )
@@ -204,8 +267,9 @@ async def sessions_get(
 ) -> _TemplateResponse:
     try:
         created, updated, jobs_total, jobs_finished, job_list = await get_session(
-            sid, repo
+            sid, repo, limit=None if jobs else 0
         )
+        progress_id = get_progress_id(updated, jobs_total, jobs_finished)
     except ValueError:
         raise WebException(status_code=status.HTTP_404_NOT_FOUND)
     return templates.TemplateResponse(
@@ -221,6 +285,7 @@ async def sessions_get(
             "jobs_total": jobs_total,
             "jobs_finished": jobs_finished,
             "jobs": job_list if jobs else None,
+            "progress_id": progress_id,
             "supported_job_types": job_types,
             "version": version,
         },
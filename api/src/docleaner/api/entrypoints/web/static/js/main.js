@@ -2,4 +2,5 @@ import "../scss/base.scss";
 import "bootstrap/js/dist/collapse";
 import "htmx.org";
 import "./app.js";
+import "htmx-ext-sse";  // Requires window.htmx, which is set by app.js
 import "./theme.js";
@@ -0,0 +1,64 @@
+import io
+import os
+import time
+from typing import AsyncIterator, Set, Tuple
+import zipfile
+
+from docleaner.api.core.document import DocumentStream
+
+
+class _ZipBuffer(io.RawIOBase):
+    """Unseekable sink for zipfile that collects written data until it is taken."""
+
+    def __init__(self) -> None:
+        self._data = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: bytes) -> int:  # type: ignore[override]
+        self._data += data
+        return len(data)
+
+    def take(self) -> bytes:
+        data = bytes(self._data)
+        self._data.clear()
+        return data
+
+
+async def stream_zip(
+    documents: AsyncIterator[Tuple[DocumentStream, str]],
+) -> AsyncIterator[bytes]:
+    """Yields a ZIP archive of the given (document, name) tuples in chunks as the documents
+    are read. Entries are stored uncompressed and written with trailing data descriptors,
+    so neither the archive nor any of its entries has to be held in memory.
+    Duplicate names are disambiguated by appending a counter."""
+    buffer = _ZipBuffer()
+    names: Set[str] = set()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+        async for document, name in documents:
+            info = zipfile.ZipInfo(
+                _get_unique_name(name, names), date_time=time.localtime()[:6]
+            )
+            info.external_attr = 0o644 << 16
+            # Allows zipfile to decide whether ZIP64 extensions are required
+            info.file_size = document.size
+            with archive.open(info, "w") as entry:
+                async for chunk in document.read(0, None):
+                    entry.write(chunk)
+                    yield buffer.take()
+            yield buffer.take()
+    yield buffer.take()
+
+
+def _get_unique_name(name: str, names: Set[str]) -> str:
+    """Strips any path from a document name and appends a counter (in front of its
+    extension) if an entry with that name has already been added to names."""
+    name = os.path.basename(name.replace("\\", "/")) or "document"
+    stem, extension = os.path.splitext(name)
+    counter = 1
+    while name in names:
+        counter += 1
+        name = f"{stem}-{counter}{extension}"
+    names.add(name)
+    return name
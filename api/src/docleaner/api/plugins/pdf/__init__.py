@@ -22,6 +22,7 @@ def get_job_types(config: configparser.ConfigParser) -> List[JobType]:
             sandbox=ContainerizedSandbox(
                 container_image=config.get(section, "containerized.image"),
                 podman_uri=config.get("docleaner", "podman_uri"),
+                job_type="pdf",
             ),
             metadata_processor=process_pdf_metadata,
         )
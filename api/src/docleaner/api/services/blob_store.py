@@ -0,0 +1,51 @@
+import abc
+from typing import AsyncIterable, AsyncIterator, Optional
+
+
+class BlobStore(abc.ABC):
+    """Interface for a storage of opaque binary objects (blobs), such as job sources and results.
+    Blobs are identified by a key, which is expected to be derived from their content.
+    Therefore, storing a blob under an existing key doesn't alter the stored data."""
+
+    @abc.abstractmethod
+    async def put(self, key: str, data: bytes) -> None:
+        """Stores data as a blob identified by key."""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def put_stream(self, key: str, chunks: AsyncIterable[bytes]) -> None:
+        """Stores data read from an iterable of chunks as a blob identified by key
+        without holding all of it in memory. Consumes all chunks even if key already exists.
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def rename(self, key: str, new_key: str) -> None:
+        """Renames the blob identified by key, replacing any existing blob named new_key.
+        Used to move blobs stored under a temporary key to their content-derived key."""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def get(self, key: str) -> bytes:
+        """Returns the data of the blob identified by key."""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def get_stream(
+        self, key: str, start: int = 0, end: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        """Yields the data of the blob identified by key in chunks, optionally limited
+        to the bytes from start (inclusive) to end (exclusive)."""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def delete(self, key: str) -> None:
+        """Deletes the blob identified by key."""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def get_path(self, key: str) -> Optional[str]:
+        """Returns the path of a local file holding the data of the blob identified by key
+        (if this store keeps blobs as files, otherwise None). Can be used to serve blobs
+        without reading them into memory."""
+        raise NotImplementedError()
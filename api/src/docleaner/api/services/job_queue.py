@@ -1,4 +1,5 @@
 import abc
+from typing import List
 
 from docleaner.api.core.job import Job
 
@@ -13,6 +14,11 @@ class JobQueue(abc.ABC):
         A job is only accepted if it carries an ID and is in CREATED state."""
         raise NotImplementedError()
 
+    async def enqueue_many(self, jobs: List[Job]) -> None:
+        """Adds multiple jobs to the processing queue at once."""
+        for job in jobs:
+            await self.enqueue(job)
+
     async def shutdown(self) -> None:
         """Instructs the job queue to perform any required shutdown work
         such as cancelling or waiting for remaining tasks."""
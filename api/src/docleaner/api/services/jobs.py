@@ -1,8 +1,12 @@
 import asyncio
-from datetime import timedelta
+from dataclasses import replace
+from datetime import datetime, timedelta
 import logging
-from typing import Dict, List, Optional, Set, Tuple
+from typing import AsyncGenerator, AsyncIterator, Dict, List, Optional, Set, Tuple
 
+from opentelemetry import propagate, trace
+
+from docleaner.api.core.document import DocumentStream
 from docleaner.api.core.job import JobParams, JobStatus, JobType
 from docleaner.api.core.metadata import DocumentMetadata
 from docleaner.api.services.file_identifier import FileIdentifier
@@ -10,6 +14,12 @@ from docleaner.api.services.job_queue import JobQueue
 from docleaner.api.services.repository import Repository
 
 logger = logging.getLogger(__name__)
+tracer = trace.get_tracer(__name__)
+
+# Number of leading bytes of streamed source documents used to identify their type
+IDENTIFY_SIZE = 64 * 1024
+# Seconds after which watched jobs (and sessions) are re-checked even without notification
+WATCH_INTERVAL = 15.0
 
 
 async def create_job(
@@ -25,49 +35,158 @@ async def create_job(
     """Creates and schedules a job to transform the given source document.
     Can optionally be added to a session by providing a session id (sid).
     Returns the job id and (identified) type."""
-    # Identify source MIME type
-    source_mimetype = file_identifier.identify(source)
-    try:
-        source_type = next(
-            filter(lambda jt: source_mimetype in jt.mimetypes, job_types)
+    with tracer.start_as_current_span("create_job") as span:
+        source_type = _identify_job_type(source, file_identifier, job_types)
+        logger.debug(
+            "Creating job for %s of type %s (%s)", source_name, source_type.id, sid
         )
-    except StopIteration:
-        raise ValueError("Unsupported document type")
-    # Create and schedule job
-    logger.debug(
-        "Creating job for %s of type %s (%s)", source_name, source_type.id, sid
-    )
-    jid = await repo.add_job(source, source_name, source_type, params, sid)
-    job = await repo.find_job(jid)
-    if job is None:
-        raise RuntimeError(f"Race condition: added job {jid} is now gone")
-    await queue.enqueue(job)
+        jid = await repo.add_job(
+            source, source_name, source_type, _add_trace_context(params), sid
+        )
+        span.set_attributes(
+            {"docleaner.job.id": jid, "docleaner.job_type": source_type.id}
+        )
+        await _enqueue_job(jid, repo, queue)
     return jid, source_type
 
 
-async def await_job(jid: str, repo: Repository) -> Tuple[
+async def create_job_from_stream(
+    source: AsyncIterator[bytes],
+    source_name: str,
+    repo: Repository,
+    queue: JobQueue,
+    file_identifier: FileIdentifier,
+    job_types: List[JobType],
+    params: Optional[JobParams] = None,
+    sid: Optional[str] = None,
+) -> Tuple[str, JobType]:
+    """Like create_job(), but consumes the source document from a stream of chunks,
+    which is handed over to the repository without reading it into memory as a whole.
+    The document type is identified from its first IDENTIFY_SIZE bytes."""
+    with tracer.start_as_current_span("create_job_from_stream") as span:
+        chunks, source_type = await _identify_stream(source, file_identifier, job_types)
+        logger.debug(
+            "Creating job for %s of type %s (%s)", source_name, source_type.id, sid
+        )
+        jid = await repo.add_job_from_stream(
+            chunks, source_name, source_type, _add_trace_context(params), sid
+        )
+        span.set_attributes(
+            {"docleaner.job.id": jid, "docleaner.job_type": source_type.id}
+        )
+        await _enqueue_job(jid, repo, queue)
+    return jid, source_type
+
+
+async def create_jobs_from_streams(
+    sources: List[Tuple[AsyncIterator[bytes], str]],
+    repo: Repository,
+    queue: JobQueue,
+    file_identifier: FileIdentifier,
+    job_types: List[JobType],
+    params: Optional[JobParams] = None,
+    sid: Optional[str] = None,
+) -> List[Tuple[str, JobType]]:
+    """Like create_job_from_stream(), but creates a batch of jobs for multiple source documents
+    given as (stream, name) tuples. All documents are identified before any job is created, so
+    that either all or none of them are accepted. Jobs are then added to the repository in bulk
+    and enqueued together. Returns the job ids and types in the order of the given sources.
+    """
+    if len(sources) == 0:
+        raise ValueError("No source documents given")
+    with tracer.start_as_current_span(
+        "create_jobs_from_streams", attributes={"docleaner.jobs": len(sources)}
+    ):
+        batch = []
+        for source, source_name in sources:
+            chunks, source_type = await _identify_stream(
+                source, file_identifier, job_types
+            )
+            batch.append((chunks, source_name, source_type))
+        logger.debug("Creating batch of %d jobs (%s)", len(batch), sid)
+        jids = await repo.add_jobs(batch, _add_trace_context(params), sid)
+        jobs = []
+        # Jobs are looked up concurrently rather than one after another
+        for jid, job in zip(
+            jids,
+            await asyncio.gather(
+                *(repo.find_job(jid, include_blobs=False) for jid in jids)
+            ),
+        ):
+            if job is None:
+                raise RuntimeError(f"Race condition: added job {jid} is now gone")
+            jobs.append(job)
+        await queue.enqueue_many(jobs)
+    return [(jid, source_type) for jid, (_, _, source_type) in zip(jids, batch)]
+
+
+async def await_job(
+    jid: str, repo: Repository, timeout: Optional[float] = None
+) -> Tuple[
     JobStatus,
     JobType,
     List[str],
     Optional[DocumentMetadata],
     Optional[DocumentMetadata],
 ]:
-    """Blocks until the job identified by jid has been processed.
-    Returns the job's final status, type, log data, source metadata and resulting metadata.
+    """Blocks until the job identified by jid has been processed or (if given) timeout seconds
+    have passed. Returns the job's final (or, after a timeout, current) status, type, log data,
+    source metadata and resulting metadata.
     """
-    job = await repo.find_job(jid)
-    if job is None:
-        raise ValueError(f"A job with jid {jid} does not exist")
-    while True:
-        if job is None or job.status in [JobStatus.SUCCESS, JobStatus.ERROR]:
-            break
-        job = await repo.find_job(jid)
-        await asyncio.sleep(0.1)
+
+    async def wait_until_finished() -> None:
+        async for _ in watch_job(jid, repo):
+            pass
+
+    try:
+        await asyncio.wait_for(wait_until_finished(), timeout)
+    except asyncio.TimeoutError:
+        pass
+    job = await repo.find_job(jid, include_blobs=False)
     if job is not None:
         return job.status, job.type, job.log, job.metadata_src, job.metadata_result
     raise RuntimeError(f"Race condition: awaited job {jid} is now gone")
 
 
+async def watch_job(
+    jid: str,
+    repo: Repository,
+    since: Optional[JobStatus] = None,
+    interval: float = WATCH_INTERVAL,
+) -> AsyncGenerator[Optional[JobStatus], None]:
+    """Yields the status of the job identified by jid whenever it differs from the previously
+    yielded one (initially from since, if given). Relies on in-process update notifications of the
+    repository, but re-checks the job at least every interval seconds and yields None if its
+    status hasn't changed meanwhile (e.g. to keep connections alive).
+    Stops as soon as the job has finished (SUCCESS or ERROR) or has been deleted."""
+    status = since
+    first_check = True
+    timed_out = False
+    while True:
+        update = repo.watch_updates(jid)
+        try:
+            job = await repo.find_job_summary(jid)
+            if job is None:
+                if first_check:
+                    raise ValueError(f"A job with jid {jid} does not exist")
+                return
+            first_check = False
+            if job.status != status:
+                status = job.status
+                yield status
+            elif timed_out:
+                yield None
+            if status in [JobStatus.SUCCESS, JobStatus.ERROR]:
+                return
+            try:
+                await asyncio.wait_for(update, interval)
+                timed_out = False
+            except asyncio.TimeoutError:
+                timed_out = True
+        finally:
+            update.cancel()
+
+
 async def get_job(jid: str, repo: Repository) -> Tuple[
     JobStatus,
     JobType,
@@ -77,7 +196,7 @@ async def get_job(jid: str, repo: Repository) -> Tuple[
     Optional[str],
 ]:
     """Returns details for the job identified by jid."""
-    job = await repo.find_job(jid)
+    job = await repo.find_job(jid, include_blobs=False)
     if job is None:
         raise ValueError(f"A job with jid {jid} does not exist")
     return (
@@ -90,12 +209,21 @@ async def get_job(jid: str, repo: Repository) -> Tuple[
     )
 
 
-async def get_jobs(
-    status: JobStatus, repo: Repository
-) -> List[Tuple[str, JobType, List[str]]]:
-    """Returns all jobs with a specific status as tuples (jid, type, log)."""
+async def get_job_status(
+    jid: str, repo: Repository
+) -> Tuple[JobStatus, JobType, datetime, datetime]:
+    """Returns the status, type, creation and last update timestamp of the job identified
+    by jid. In contrast to get_job(), neither metadata nor the job log are retrieved."""
+    job = await repo.find_job_summary(jid)
+    if job is None:
+        raise ValueError(f"A job with jid {jid} does not exist")
+    return job.status, job.type, job.created, job.updated
+
+
+async def get_jobs(status: JobStatus, repo: Repository) -> List[Tuple[str, JobType]]:
+    """Returns all jobs with a specific status as tuples (jid, type)."""
     jobs = await repo.find_jobs(status=[status])
-    return [(j.id, j.type, j.log) for j in jobs]
+    return [(j.id, j.type) for j in jobs]
 
 
 async def get_job_src(jid: str, repo: Repository) -> Tuple[bytes, str]:
@@ -118,9 +246,32 @@ async def get_job_result(jid: str, repo: Repository) -> Tuple[bytes, str]:
     return job.result, job.name
 
 
-async def get_job_stats(repo: Repository) -> Tuple[int, int, int, int, int, int]:
+async def get_job_result_stream(
+    jid: str, repo: Repository
+) -> Tuple[DocumentStream, str]:
+    """Retrieves a handle to stream the result and the document name for a successfully
+    completed job identified by jid. Unlike get_job_result(), the result isn't loaded into
+    memory, but can be read (in parts) via the returned handle."""
+    job = await repo.find_job(jid, include_blobs=False)
+    if job is None:
+        raise ValueError(f"A job with jid {jid} does not exist")
+    if job.status != JobStatus.SUCCESS:
+        raise ValueError(
+            f"Job with jid {jid} didn't complete (yet), current state is {job.status}"
+        )
+    result = await repo.find_job_result_stream(jid)
+    if result is None:
+        raise ValueError(f"A job with jid {jid} does not exist")
+    return result, job.name
+
+
+async def get_job_stats(
+    repo: Repository,
+) -> Tuple[int, int, int, int, int, int, float]:
     """Returns the number of overall total and currently registered jobs differentiated by their status:
-    # total jobs ever seen, # created, # queued, # running, # successful, # error."""
+    # total jobs ever seen, # created, # queued, # running, # successful, # error.
+    In addition, returns the storage deduplication ratio of all job documents
+    (referenced size / stored size, 1.0 without any deduplication)."""
     result: Dict[JobStatus, int] = {
         JobStatus.CREATED: 0,
         JobStatus.QUEUED: 0,
@@ -130,6 +281,7 @@ async def get_job_stats(repo: Repository) -> Tuple[int, int, int, int, int, int]
     }
     for job in await repo.find_jobs():
         result[job.status] += 1
+    referenced_size, stored_size = await repo.get_storage_stats()
     return (
         await repo.get_total_job_count(),
         result[JobStatus.CREATED],
@@ -137,12 +289,13 @@ async def get_job_stats(repo: Repository) -> Tuple[int, int, int, int, int, int]
         result[JobStatus.RUNNING],
         result[JobStatus.SUCCESS],
         result[JobStatus.ERROR],
+        referenced_size / stored_size if stored_size > 0 else 1.0,
     )
 
 
 async def delete_job(jid: str, repo: Repository) -> None:
     """Deletes a single job if it is in a finished state (SUCCESS or ERROR)."""
-    job = await repo.find_job(jid)
+    job = await repo.find_job(jid, include_blobs=False)
     if job is None:
         raise ValueError(f"A job with jid {jid} does not exist")
     if job.status in [JobStatus.CREATED, JobStatus.QUEUED, JobStatus.RUNNING]:
@@ -165,3 +318,53 @@ async def purge_jobs(purge_after: timedelta, repo: Repository) -> Set[str]:
     if len(purged_jobs) > 0:
         logger.debug("Purged %d jobs", len(purged_jobs))
     return purged_jobs
+
+
+def _add_trace_context(params: Optional[JobParams]) -> JobParams:
+    """Returns a copy of params carrying the current trace context (if any),
+    so that the asynchronous processing of a job joins the trace it was created in."""
+    trace_context: Dict[str, str] = {}
+    propagate.inject(trace_context)
+    return replace(params or JobParams(), trace_context=trace_context)
+
+
+def _identify_job_type(
+    source: bytes, file_identifier: FileIdentifier, job_types: List[JobType]
+) -> JobType:
+    """Returns the job type matching the MIME type of a source document."""
+    source_mimetype = file_identifier.identify(source)
+    try:
+        return next(filter(lambda jt: source_mimetype in jt.mimetypes, job_types))
+    except StopIteration:
+        raise ValueError("Unsupported document type")
+
+
+async def _identify_stream(
+    source: AsyncIterator[bytes],
+    file_identifier: FileIdentifier,
+    job_types: List[JobType],
+) -> Tuple[AsyncIterator[bytes], JobType]:
+    """Identifies the job type of a streamed source document from its first IDENTIFY_SIZE
+    bytes. Returns a stream of the whole document (including those bytes) and the type.
+    """
+    head = b""
+    async for chunk in source:
+        head += chunk
+        if len(head) >= IDENTIFY_SIZE:
+            break
+    source_type = _identify_job_type(head, file_identifier, job_types)
+
+    async def chunks() -> AsyncIterator[bytes]:
+        yield head
+        async for chunk in source:
+            yield chunk
+
+    return chunks(), source_type
+
+
+async def _enqueue_job(jid: str, repo: Repository, queue: JobQueue) -> None:
+    """Schedules a newly created job."""
+    job = await repo.find_job(jid, include_blobs=False)
+    if job is None:
+        raise RuntimeError(f"Race condition: added job {jid} is now gone")
+    await queue.enqueue(job)
@@ -1,14 +1,22 @@
 import abc
+import asyncio
 from datetime import timedelta
-from typing import List, Optional, Set
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
 
-from docleaner.api.core.job import Job, JobParams, JobStatus, JobType
+from docleaner.api.core.document import DocumentStream
+from docleaner.api.core.job import Job, JobParams, JobStatus, JobSummary, JobType
 from docleaner.api.core.metadata import DocumentMetadata
 from docleaner.api.core.session import Session
 
 
 class Repository(abc.ABC):
-    """Repository to store and retrieve job data without support for transactions."""
+    """Repository to store and retrieve job data without support for transactions.
+    Implementations notify in-process watchers (see watch_updates()) about changed jobs
+    and sessions by calling _notify_updates()."""
+
+    def __init__(self) -> None:
+        # Pending futures of watch_updates() per job or session id
+        self._update_watchers: Dict[str, Set["asyncio.Future[None]"]] = {}
 
     @abc.abstractmethod
     async def add_job(
@@ -25,8 +33,45 @@ class Repository(abc.ABC):
         raise NotImplementedError()
 
     @abc.abstractmethod
-    async def find_job(self, jid: str) -> Optional[Job]:
-        """Returns the job identified by jid, if it exists. Otherwise, this returns None."""
+    async def add_job_from_stream(
+        self,
+        src: AsyncIterator[bytes],
+        src_name: str,
+        job_type: JobType,
+        params: Optional[JobParams] = None,
+        sid: Optional[str] = None,
+    ) -> str:
+        """Like add_job(), but consumes the source document from a stream of chunks.
+        Repositories that store large documents out of line pass them on to their storage
+        chunk by chunk instead of reading them into memory as a whole."""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def add_jobs(
+        self,
+        sources: List[Tuple[AsyncIterator[bytes], str, JobType]],
+        params: Optional[JobParams] = None,
+        sid: Optional[str] = None,
+    ) -> List[str]:
+        """Creates multiple jobs at once, one per tuple of source document stream, document name
+        and job type, all sharing the same parameters and (optional) session. Streams are consumed
+        in the given order before the jobs are inserted in bulk, so that either all or none of
+        them are created. Returns the resulting job ids in the same order."""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def find_job(self, jid: str, include_blobs: bool = True) -> Optional[Job]:
+        """Returns the job identified by jid, if it exists. Otherwise, this returns None.
+        If include_blobs is False, the returned Job object holds no src/result document data,
+        which spares fetching potentially large documents if only status, log or metadata are required.
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def find_job_summary(self, jid: str) -> Optional[JobSummary]:
+        """Returns a summary of the job identified by jid or None if it doesn't exist.
+        Only reads the job's summary fields, which is considerably cheaper than find_job().
+        """
         raise NotImplementedError()
 
     @abc.abstractmethod
@@ -35,17 +80,30 @@ class Repository(abc.ABC):
         sid: Optional[str] = None,
         status: Optional[List[JobStatus]] = None,
         not_updated_for: Optional[timedelta] = None,
-    ) -> List[Job]:
+        after: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[JobSummary]:
         """Returns a list of all currently registered jobs, optionally filtered by different criteria:
         * a session id to find all jobs associated with that session
         * a list of status flags to only find jobs that have one of the given statuses
         * a timedelta to find jobs that haven't been updated for a given amount of time.
         The result is sorted descending by job creation date.
-        To improve performance, the resulting Job objects hold no metadata, no job log
-        and no src/result document data. Those attributes have to be fetched individually via find_job().
+        To page through large results, after (the id of the last job of the previous page)
+        skips all jobs up to and including that job in sort order, independent of whether it
+        still matches the given filters. At most limit jobs are returned.
+        To improve performance, jobs are returned as JobSummary records. All other attributes
+        (metadata, job log, src/result document data) have to be fetched individually via find_job().
         """
         raise NotImplementedError()
 
+    @abc.abstractmethod
+    async def count_jobs(
+        self, sid: Optional[str] = None, status: Optional[List[JobStatus]] = None
+    ) -> int:
+        """Returns the number of currently registered jobs, optionally filtered
+        by session id and/or a list of status flags (see find_jobs())."""
+        raise NotImplementedError()
+
     @abc.abstractmethod
     async def update_job(
         self,
@@ -54,12 +112,21 @@ class Repository(abc.ABC):
         metadata_src: Optional[DocumentMetadata] = None,
         result: Optional[bytes] = None,
         status: Optional[JobStatus] = None,
+        log: Optional[List[str]] = None,
     ) -> None:
-        """Updates a job's result and/or status flag.
+        """Updates a job's result and/or status flag. Entries given as log are appended
+        to the job's log as part of the same update.
         In addition, transparently refreshes the 'updated' field of the job itself and its
         session (in case it's associated with one)."""
         raise NotImplementedError()
 
+    @abc.abstractmethod
+    async def update_jobs(self, jids: List[str], status: JobStatus) -> None:
+        """Sets the status of multiple jobs at once (e.g. when enqueuing a batch), refreshing
+        the 'updated' field of the jobs and their sessions like update_job(). Raises a ValueError
+        without updating any job if one of them doesn't exist."""
+        raise NotImplementedError()
+
     @abc.abstractmethod
     async def add_to_job_log(self, jid: str, entry: str) -> None:
         """Adds an entry to a job's log."""
@@ -70,6 +137,20 @@ class Repository(abc.ABC):
         """Deletes a job, identified by its jid, from the repository."""
         raise NotImplementedError()
 
+    @abc.abstractmethod
+    async def find_job_result_stream(self, jid: str) -> Optional[DocumentStream]:
+        """Returns a handle to read the result document of the job identified by jid
+        in chunks (e.g. to serve it in parts), or None if the job doesn't exist.
+        Its path is set if the result is available as a local file as-is."""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def get_storage_stats(self) -> Tuple[int, int]:
+        """Returns the accumulated size of all documents (sources and results) as referenced by jobs
+        and the size those documents actually occupy in storage, which is lower if identical
+        documents are deduplicated."""
+        raise NotImplementedError()
+
     @abc.abstractmethod
     async def get_total_job_count(self) -> int:
         """Returns the total number of jobs this database has processed,
@@ -86,6 +167,15 @@ class Repository(abc.ABC):
         """Returns the session identified by sid, if it exists. Otherwise, this returns None."""
         raise NotImplementedError()
 
+    @abc.abstractmethod
+    async def find_session_progress(
+        self, sid: str
+    ) -> Optional[Tuple[Session, int, int]]:
+        """Returns the session identified by sid together with the number of its total and
+        finished (success/error) jobs, queried at once. Returns None if there's no such session.
+        """
+        raise NotImplementedError()
+
     @abc.abstractmethod
     async def find_sessions(
         self, not_updated_for: Optional[timedelta] = None
@@ -105,3 +195,29 @@ class Repository(abc.ABC):
     async def disconnect(self) -> None:
         """Instruct the repository to disconnect from its backend and perform cleanup work."""
         pass
+
+    def watch_updates(self, key: str) -> "asyncio.Future[None]":
+        """Returns a future that completes as soon as the job or session identified by key
+        (its jid or sid) has been added, changed or deleted by this process. Changes made by
+        other processes (sharing the same backend) are not observed, so watchers should
+        re-check the state from time to time. Cancel the future to stop watching."""
+        future: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        self._update_watchers.setdefault(key, set()).add(future)
+        future.add_done_callback(lambda f: self._forget_watcher(key, f))
+        return future
+
+    def _notify_updates(self, *keys: Optional[str]) -> None:
+        """Completes the futures of everyone watching one of the given jobs or sessions."""
+        for key in keys:
+            if key is None:
+                continue
+            for future in self._update_watchers.pop(key, set()):
+                if not future.done():
+                    future.set_result(None)
+
+    def _forget_watcher(self, key: str, future: "asyncio.Future[None]") -> None:
+        watchers = self._update_watchers.get(key)
+        if watchers is not None:
+            watchers.discard(future)
+            if len(watchers) == 0:
+                del self._update_watchers[key]
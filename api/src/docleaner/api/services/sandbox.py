@@ -1,15 +1,20 @@
 import logging
 import traceback
 
+from opentelemetry import trace
+
 from docleaner.api.core.job import JobStatus
 from docleaner.api.services.repository import Repository
 
 logger = logging.getLogger(__name__)
+tracer = trace.get_tracer(__name__)
 
 
+@tracer.start_as_current_span("process_job_in_sandbox")
 async def process_job_in_sandbox(jid: str, repo: Repository) -> None:
     """Executes the job identified by jid in a sandbox, post-processes the resulting metadata
     and updates the job within the repository according to the result."""
+    trace.get_current_span().set_attribute("docleaner.job.id", jid)
     job = await repo.find_job(jid)
     if job is None:
         raise ValueError(f"No job with ID {jid} found")
@@ -28,18 +33,17 @@ async def process_job_in_sandbox(jid: str, repo: Repository) -> None:
         result = await job.type.sandbox.process(job.src, job.params)
     except Exception:
         logger.warning(f"Exception in sandbox.process():\n{traceback.format_exc()}")
-        await repo.add_to_job_log(jid, "Error during sandbox processing")
         await repo.update_job(
             jid=jid,
             status=JobStatus.ERROR,
             result=None,
             metadata_result=None,
             metadata_src=None,
+            log=["Error during sandbox processing"],
         )
         return
     logger.debug("Job %s has been processed", jid)
-    for logline in result.log:
-        await repo.add_to_job_log(jid, logline)
+    # The sandbox log is stored along with the final job update
     try:
         metadata_result = job.type.metadata_processor(result.metadata_result)
         metadata_src = job.type.metadata_processor(result.metadata_src)
@@ -49,16 +53,17 @@ async def process_job_in_sandbox(jid: str, repo: Repository) -> None:
             result=result.result,
             metadata_result=metadata_result,
             metadata_src=metadata_src,
+            log=result.log,
         )
     except Exception:
         logger.warning(
             f"Exception during metadata post-processing:\n{traceback.format_exc()}"
         )
-        await repo.add_to_job_log(jid, "Error during metadata post-processing")
         await repo.update_job(
             jid=jid,
             status=JobStatus.ERROR,
             result=None,
             metadata_result=None,
             metadata_src=None,
+            log=result.log + ["Error during metadata post-processing"],
         )
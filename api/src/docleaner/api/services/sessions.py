@@ -1,9 +1,15 @@
+import asyncio
 from datetime import datetime, timedelta
+import hashlib
 import logging
-from typing import List, Set, Tuple
+from typing import AsyncGenerator, AsyncIterator, List, Optional, Set, Tuple
 
+from docleaner.api.core.document import DocumentStream
 from docleaner.api.core.job import JobStatus, JobType
-from docleaner.api.services.jobs import await_job
+from docleaner.api.services.jobs import (
+    WATCH_INTERVAL,
+    get_job_result_stream,
+)
 from docleaner.api.services.repository import Repository
 
 logger = logging.getLogger(__name__)
@@ -16,13 +22,51 @@ async def create_session(repo: Repository) -> str:
     return sid
 
 
-async def await_session(sid: str, repo: Repository) -> None:
-    """Blocks until all jobs of the given session have been processed."""
-    for job in await repo.find_jobs(sid):
-        await await_job(job.id, repo)
+async def await_session(
+    sid: str, repo: Repository, timeout: Optional[float] = None
+) -> None:
+    """Blocks until all jobs of the given session have been processed
+    or (if given) timeout seconds have passed. Like watch_session(), re-checks the session
+    on each update notification (or every WATCH_INTERVAL seconds), but only counts its
+    unfinished jobs. Returns early if the session is deleted in the meantime."""
 
+    async def wait_until_finished() -> None:
+        first_check = True
+        while True:
+            update = repo.watch_updates(sid)
+            try:
+                try:
+                    unfinished_jobs = await repo.count_jobs(
+                        sid,
+                        status=[JobStatus.CREATED, JobStatus.QUEUED, JobStatus.RUNNING],
+                    )
+                except ValueError:
+                    if first_check:
+                        raise ValueError("Invalid session id")
+                    return
+                first_check = False
+                if unfinished_jobs == 0:
+                    return
+                try:
+                    await asyncio.wait_for(update, WATCH_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+            finally:
+                update.cancel()
 
-async def get_session(sid: str, repo: Repository) -> Tuple[
+    try:
+        await asyncio.wait_for(wait_until_finished(), timeout)
+    except asyncio.TimeoutError:
+        pass
+
+
+async def get_session(
+    sid: str,
+    repo: Repository,
+    limit: Optional[int] = None,
+    after: Optional[str] = None,
+    status: Optional[List[JobStatus]] = None,
+) -> Tuple[
     datetime,
     datetime,
     int,
@@ -31,17 +75,104 @@ async def get_session(sid: str, repo: Repository) -> Tuple[
 ]:
     """Returns session details: The number of total associated jobs,
     the number of finished (success/error) jobs and a list with
-    abbreviated job details (jid, created, updated, status, type)."""
-    session = await repo.find_session(sid)
-    if session is None:
+    abbreviated job details (jid, created, updated, status, type).
+    The job list can be filtered by status and paged through with limit and
+    after (the jid of the last job of the previous page, see Repository.find_jobs())."""
+    progress = await repo.find_session_progress(sid)
+    if progress is None:
         raise ValueError("Invalid session id")
+    session, total_jobs, finished_jobs = progress
     jobs = []
-    finished_jobs = 0
-    for job in await repo.find_jobs(sid):
-        if job.status in [JobStatus.SUCCESS, JobStatus.ERROR]:
-            finished_jobs += 1
-        jobs.append((job.id, job.created, job.updated, job.status, job.type))
-    return session.created, session.updated, len(jobs), finished_jobs, jobs
+    if limit != 0:
+        jobs = [
+            (job.id, job.created, job.updated, job.status, job.type)
+            for job in await repo.find_jobs(
+                sid, status=status, after=after, limit=limit
+            )
+        ]
+    return session.created, session.updated, total_jobs, finished_jobs, jobs
+
+
+async def get_session_results(
+    sid: str, repo: Repository
+) -> AsyncIterator[Tuple[DocumentStream, str]]:
+    """Returns an iterator over the results of all successfully completed jobs of a session,
+    each as handle to stream the result together with the document name. Results are looked
+    up one after another while iterating, jobs deleted in the meantime are skipped."""
+    if await repo.find_session(sid) is None:
+        raise ValueError("Invalid session id")
+    jobs = await repo.find_jobs(sid, status=[JobStatus.SUCCESS])
+
+    async def results() -> AsyncIterator[Tuple[DocumentStream, str]]:
+        for job in jobs:
+            try:
+                yield await get_job_result_stream(job.id, repo)
+            except ValueError:
+                continue
+
+    return results()
+
+
+async def get_session_progress(sid: str, repo: Repository) -> Tuple[str, int, int]:
+    """Returns a progress identifier, the number of total associated jobs and the number
+    of finished (success/error) jobs of a session. The progress identifier changes whenever
+    a job is added to or removed from the session or one of its jobs changes its status,
+    since each of these refreshes the session. Only job counters are queried, not the jobs.
+    """
+    progress = await repo.find_session_progress(sid)
+    if progress is None:
+        raise ValueError("Invalid session id")
+    session, total_jobs, finished_jobs = progress
+    return (
+        get_progress_id(session.updated, total_jobs, finished_jobs),
+        total_jobs,
+        finished_jobs,
+    )
+
+
+def get_progress_id(updated: datetime, total_jobs: int, finished_jobs: int) -> str:
+    """Returns the progress identifier of a session (see get_session_progress())."""
+    progress = hashlib.sha256(
+        f"{updated.isoformat()};{total_jobs};{finished_jobs}".encode()
+    )
+    return progress.hexdigest()[:16]
+
+
+async def watch_session(
+    sid: str,
+    repo: Repository,
+    since: Optional[str] = None,
+    interval: float = WATCH_INTERVAL,
+) -> AsyncGenerator[Optional[Tuple[str, int, int]], None]:
+    """Yields the progress of a session as returned by get_session_progress() whenever its
+    progress identifier differs from the previously yielded one (initially from since, if given).
+    Like watch_job(), yields None if nothing has changed within interval seconds.
+    Stops as soon as the session has been deleted."""
+    progress_id = since
+    first_check = True
+    timed_out = False
+    while True:
+        update = repo.watch_updates(sid)
+        try:
+            try:
+                progress = await get_session_progress(sid, repo)
+            except ValueError:
+                if first_check:
+                    raise
+                return
+            first_check = False
+            if progress[0] != progress_id:
+                progress_id = progress[0]
+                yield progress
+            elif timed_out:
+                yield None
+            try:
+                await asyncio.wait_for(update, interval)
+                timed_out = False
+            except asyncio.TimeoutError:
+                timed_out = True
+        finally:
+            update.cancel()
 
 
 async def delete_session(sid: str, repo: Repository) -> None:
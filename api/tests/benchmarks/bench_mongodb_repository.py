@@ -0,0 +1,182 @@
+import dataclasses
+from pathlib import Path
+import time
+from typing import List
+
+import zstandard
+
+from docleaner.api.adapters.repository.mongodb_repository import MongoDBRepository
+from docleaner.api.core.job import Job, JobParams, JobStatus, JobType
+from docleaner.api.core.metadata import DocumentMetadata, MetadataField
+from docleaner.api.services.clock import Clock
+from tests.benchmarks.utils import (
+    CommandCounter,
+    MongoDBRepositoryFactory,
+    print_latencies,
+)
+
+ITERATIONS = 500
+
+
+async def test_small_document_latency(
+    mongodb_repo_factory: MongoDBRepositoryFactory,
+    sample_pdf: bytes,
+    job_types: List[JobType],
+) -> None:
+    """Latency from job creation until the result of a small document has been retrieved,
+    once with documents stored inline and once with every document saved to GridFS."""
+    for label, inline_threshold in [("inline", 256 * 1024), ("GridFS", 0)]:
+        repo = await mongodb_repo_factory(inline_threshold=inline_threshold)
+        samples = []
+        for _ in range(ITERATIONS):
+            start = time.perf_counter()
+            jid = await repo.add_job(sample_pdf, "sample.pdf", job_types[0])
+            await repo.update_job(jid, result=sample_pdf, status=JobStatus.SUCCESS)
+            job = await repo.find_job(jid)
+            samples.append(time.perf_counter() - start)
+            assert job is not None and job.result == sample_pdf
+        print_latencies(f"create -> result ({label})", samples)
+
+
+async def test_operations_per_job(
+    mongodb_repo_factory: MongoDBRepositoryFactory,
+    sample_pdf: bytes,
+    job_types: List[JobType],
+) -> None:
+    """Number of database operations issued during the lifecycle of a session job,
+    as performed by the job services and AsyncJobQueue. Only relies on repository methods
+    that already existed before write paths were reduced to fewer round trips, so that the
+    operations of older revisions can be measured for comparison by running this benchmark
+    against their sources, e.g. those of the parent of a commit in a separate worktree:
+    git worktree add /tmp/baseline <commit>~1
+    PYTHONPATH=/tmp/baseline/api/src pytest -s tests/benchmarks/bench_mongodb_repository.py
+    -k test_operations_per_job"""
+    counter = CommandCounter()
+    repo = await mongodb_repo_factory()
+    sid = await repo.add_session()
+    jobs = 50
+    counter.reset()
+    for _ in range(jobs):
+        jid = await repo.add_job(sample_pdf, "sample.pdf", job_types[0], sid=sid)
+        await repo.update_job(jid, status=JobStatus.QUEUED)
+        await repo.update_job(jid, status=JobStatus.RUNNING)
+        await repo.update_job(
+            jid,
+            status=JobStatus.SUCCESS,
+            result=sample_pdf,
+            metadata_src=DocumentMetadata(),
+            metadata_result=DocumentMetadata(),
+            log=["analyze", "process", "analyze"],
+        )
+        await repo.delete_job(jid)
+    print(
+        f"Operations per job: {counter.total() / jobs:.1f}",
+        f"({', '.join(f'{c}: {n / jobs:.1f}' for c, n in counter.commands.items())})",
+    )
+
+
+async def test_deserialization_latency(
+    clock: Clock, job_types: List[JobType], sample_pdf: bytes
+) -> None:
+    """Time to create Job and JobSummary instances from raw job data as returned by MongoDB,
+    with several installed job types. Doesn't require a database container."""
+    job_types = [
+        dataclasses.replace(job_types[0], id=f"type{i}") for i in range(7)
+    ] + job_types
+    repo = MongoDBRepository(clock, job_types, "database", 27017)
+    metadata = DocumentMetadata(
+        primary={
+            f"field{i}": MetadataField(id=f"field{i}", value="value", tags=[])
+            for i in range(20)
+        },
+        signed=False,
+    )
+    job = Job(
+        id="0",
+        src=sample_pdf,
+        name="sample.pdf",
+        params=JobParams(),
+        type=job_types[-1],
+        created=clock.now(),
+        log=["analyze", "process", "analyze"],
+        metadata_src=metadata,
+        metadata_result=metadata,
+        result=sample_pdf,
+        status=JobStatus.SUCCESS,
+    )
+    job_data = dataclasses.asdict(job)
+    job_data["_id"] = job_data.pop("id")
+    job_data["type"] = job.type.id
+    rows = 5000
+    for include_blobs in [True, False]:
+        start = time.perf_counter()
+        for _ in range(rows):
+            await repo._create_job_from_job_data(job_data, include_blobs=include_blobs)
+        elapsed = time.perf_counter() - start
+        print(
+            f"Job from job data (include_blobs={include_blobs}):"
+            f" {elapsed / rows * 1_000_000:.2f} µs per job"
+        )
+    start = time.perf_counter()
+    for _ in range(rows):
+        repo._create_job_summary_from_job_data(job_data)
+    elapsed = time.perf_counter() - start
+    print(f"JobSummary from job data: {elapsed / rows * 1_000_000:.2f} µs per job")
+    await repo.disconnect()
+
+
+def test_compression_tradeoff() -> None:
+    """Compression ratio and throughput of zstd at various levels on the PDF corpus
+    in tests/resources. Doesn't require a database container."""
+    corpus = [
+        path.read_bytes()
+        for path in sorted((Path(__file__).parent.parent / "resources").glob("*.pdf"))
+    ]
+    size = sum(len(document) for document in corpus)
+    for level in [1, 3, 9, 19]:
+        compressor = zstandard.ZstdCompressor(level=level)
+        decompressor = zstandard.ZstdDecompressor()
+        start = time.perf_counter()
+        compressed = [compressor.compress(document) for document in corpus]
+        compression_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for document in compressed:
+            decompressor.decompress(document)
+        decompression_time = time.perf_counter() - start
+        print(
+            f"zstd level {level}: ratio {size / sum(len(c) for c in compressed):.2f}"
+            f" | compression {size / compression_time / 1024**2:.0f} MiB/s"
+            f" | decompression {size / decompression_time / 1024**2:.0f} MiB/s"
+        )
+
+
+async def test_compressed_document_latency(
+    mongodb_repo_factory: MongoDBRepositoryFactory, job_types: List[JobType]
+) -> None:
+    """Latency of storing and retrieving each PDF of the corpus in tests/resources
+    with and without compression, once inline and once as content-addressed blobs,
+    alongside the number of bytes stored within the database."""
+    corpus = [
+        path.read_bytes()
+        for path in sorted((Path(__file__).parent.parent / "resources").glob("*.pdf"))
+    ]
+    for compression in [None, "zstd"]:
+        for label, inline_threshold in [("inline", 256 * 1024), ("blobs", 0)]:
+            repo = await mongodb_repo_factory(
+                compression=compression, inline_threshold=inline_threshold
+            )
+            samples = []
+            for i in range(ITERATIONS):
+                document = corpus[i % len(corpus)]
+                start = time.perf_counter()
+                jid = await repo.add_job(document, "sample.pdf", job_types[0])
+                await repo.update_job(jid, result=document + str(i).encode())
+                job = await repo.find_job(jid)
+                samples.append(time.perf_counter() - start)
+                assert job is not None and job.src == document
+            db_stats = await repo._db.command("dbStats")
+            print_latencies(
+                f"create -> result ({compression or 'uncompressed'}, {label},"
+                f" {db_stats['dataSize'] / 1024**2:.1f} MiB stored)",
+                samples,
+            )
@@ -0,0 +1,66 @@
+from pathlib import Path
+import time
+import tracemalloc
+from typing import List
+
+import pytest
+
+from docleaner.api.core.job import JobStatus, JobType
+from docleaner.api.core.metadata import DocumentMetadata
+from docleaner.api.services.repository import Repository
+from tests.benchmarks.utils import print_latencies
+
+ITERATIONS = 500
+
+
+@pytest.mark.parametrize("document", ["pdf-ua1.pdf", "pdf-x4.pdf"])
+async def test_job_lifecycle_latency(
+    backend: Repository, document: str, job_types: List[JobType]
+) -> None:
+    """Latency of the repository operations issued during the lifecycle of a session job,
+    as performed by the job services and AsyncJobQueue, for a small and a larger document.
+    """
+    with open(Path(__file__).parent.parent / "resources" / document, "rb") as f:
+        src = f.read()
+    sid = await backend.add_session()
+    samples = []
+    for _ in range(ITERATIONS):
+        start = time.perf_counter()
+        jid = await backend.add_job(src, document, job_types[0], sid=sid)
+        await backend.update_job(jid, status=JobStatus.QUEUED)
+        await backend.update_job(jid, status=JobStatus.RUNNING)
+        await backend.update_job(
+            jid,
+            status=JobStatus.SUCCESS,
+            result=src,
+            metadata_src=DocumentMetadata(),
+            metadata_result=DocumentMetadata(),
+            log=["analyze", "process", "analyze"],
+        )
+        await backend.find_jobs(sid)
+        job = await backend.find_job(jid)
+        await backend.delete_job(jid)
+        samples.append(time.perf_counter() - start)
+        assert job is not None and job.result == src
+    print_latencies(f"job lifecycle ({type(backend).__name__}, {document})", samples)
+    await backend.disconnect()
+
+
+async def test_list_jobs_allocations(
+    backend: Repository, sample_pdf: bytes, job_types: List[JobType]
+) -> None:
+    """Memory allocated while listing a large number of jobs."""
+    jobs = 50000
+    for _ in range(jobs):
+        await backend.add_job(sample_pdf, "sample.pdf", job_types[0])
+    tracemalloc.start()
+    start = time.perf_counter()
+    assert len(await backend.find_jobs()) == jobs
+    duration = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"Listing {jobs} jobs ({type(backend).__name__}): {duration * 1000:.0f} ms,"
+        f" peak allocation {peak / 1024 / 1024:.1f} MiB"
+    )
+    await backend.disconnect()
@@ -0,0 +1,61 @@
+import asyncio
+from pathlib import Path
+import time
+from typing import List
+
+from fastapi import FastAPI
+import httpx
+import pytest
+
+from docleaner.api.core.job import JobStatus, JobType
+from docleaner.api.core.metadata import DocumentMetadata
+from docleaner.api.entrypoints.web.dependencies import get_repo
+from docleaner.api.entrypoints.web.routers.rest import rest_api
+from docleaner.api.services.repository import Repository
+from tests.benchmarks.utils import print_latencies
+
+DURATION = 5.0
+CLIENTS = 50
+
+
+@pytest.mark.parametrize("endpoint", ["", "/status"])
+async def test_job_status_throughput(
+    backend: Repository, endpoint: str, job_types: List[JobType]
+) -> None:
+    """Requests per second a single API worker can answer when CLIENTS concurrent clients
+    continuously poll a finished job (with a larger document), comparing the job details
+    endpoint with the lightweight status endpoint. Requests are passed to the ASGI app
+    directly and thus exclude the overhead of the HTTP server and network."""
+    with open(Path(__file__).parent.parent / "resources" / "pdf-x4.pdf", "rb") as f:
+        src = f.read()
+    jid = await backend.add_job(src, "pdf-x4.pdf", job_types[0])
+    await backend.update_job(
+        jid,
+        status=JobStatus.SUCCESS,
+        result=src,
+        metadata_src=DocumentMetadata(),
+        metadata_result=DocumentMetadata(),
+        log=["analyze", "process", "analyze"],
+    )
+    app = FastAPI()
+    app.include_router(rest_api)
+    app.dependency_overrides[get_repo] = lambda: backend
+    samples: List[float] = []
+
+    async def poll(client: httpx.AsyncClient, deadline: float) -> None:
+        while (start := time.perf_counter()) < deadline:
+            response = await client.get(f"/api/v1/jobs/{jid}{endpoint}")
+            samples.append(time.perf_counter() - start)
+            assert response.status_code == 200
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://docleaner"
+    ) as client:
+        start = time.perf_counter()
+        deadline = start + DURATION
+        await asyncio.gather(*(poll(client, deadline) for _ in range(CLIENTS)))
+        duration = time.perf_counter() - start
+    label = f"GET /api/v1/jobs/(jid){endpoint} ({type(backend).__name__})"
+    print(f"{label}: {len(samples) / duration:.0f} requests/s")
+    print_latencies(label, samples)
+    await backend.disconnect()
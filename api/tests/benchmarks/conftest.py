@@ -0,0 +1,70 @@
+"""
+Benchmarks aren't collected during regular test runs (see python_files in pytest.ini).
+Run them individually and with output capturing disabled, e.g.
+pytest -s tests/benchmarks/bench_mongodb_repository.py
+"""
+
+from pathlib import Path
+from typing import Any, AsyncGenerator, List
+
+from motor import motor_asyncio
+import pytest
+
+from docleaner.api.adapters.blob_store.filesystem_blob_store import (
+    FilesystemBlobStore,
+)
+from docleaner.api.adapters.repository.memory_repository import MemoryRepository
+from docleaner.api.adapters.repository.mongodb_repository import MongoDBRepository
+from docleaner.api.adapters.repository.sqlite_repository import SQLiteRepository
+from docleaner.api.core.job import JobType
+from docleaner.api.services.clock import Clock
+from docleaner.api.services.repository import Repository
+from tests.benchmarks.utils import MongoDBRepositoryFactory
+
+
+@pytest.fixture
+async def mongodb_repo_factory(
+    clock: Clock, job_types: List[JobType]
+) -> AsyncGenerator[MongoDBRepositoryFactory, None]:
+    """Returns a factory for MongoDBRepository instances, each with an empty database.
+    Keyword arguments are passed on to the repository."""
+    db_host = "database"
+    db_port = 27017
+    db_name = "docleaner_benchmark"
+    repos = []
+
+    async def create(**kwargs: Any) -> MongoDBRepository:
+        mongo = motor_asyncio.AsyncIOMotorClient(db_host, db_port)
+        await mongo.drop_database(db_name)
+        mongo.close()
+        repo = MongoDBRepository(clock, job_types, db_host, db_port, db_name, **kwargs)
+        repos.append(repo)
+        return repo
+
+    yield create
+    for repo in repos:
+        await repo.disconnect()
+
+
+@pytest.fixture(params=["memory", "sqlite", "mongodb"])
+async def backend(
+    request: pytest.FixtureRequest,
+    clock: Clock,
+    job_types: List[JobType],
+    tmp_path: Path,
+) -> Repository:
+    """Returns an empty repository of each type. The MongoDB variant
+    requires a database container (see mongodb_repo_factory)."""
+    if request.param == "memory":
+        return MemoryRepository(clock)
+    elif request.param == "sqlite":
+        repo = SQLiteRepository(
+            clock,
+            job_types,
+            str(tmp_path / "docleaner.db"),
+            FilesystemBlobStore(str(tmp_path / "blobs")),
+        )
+        return repo
+    repo_factory = request.getfixturevalue("mongodb_repo_factory")
+    mongodb_repo: Repository = await repo_factory()
+    return mongodb_repo
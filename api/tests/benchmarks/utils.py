@@ -0,0 +1,45 @@
+from collections import Counter
+import statistics
+from typing import Awaitable, Callable, List
+
+from pymongo import monitoring
+
+from docleaner.api.adapters.repository.mongodb_repository import MongoDBRepository
+
+MongoDBRepositoryFactory = Callable[..., Awaitable[MongoDBRepository]]
+
+
+def print_latencies(label: str, samples: List[float]) -> None:
+    """Prints the median and 99th percentile of the given latency samples (in seconds)."""
+    percentiles = statistics.quantiles(samples, n=100, method="inclusive")
+    print(
+        f"{label}: p50 {percentiles[49] * 1000:.2f} ms | p99 {percentiles[98] * 1000:.2f} ms"
+        f" ({len(samples)} samples)"
+    )
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts the database commands issued by all MongoDB clients created after registration,
+    ignoring connection handshakes and heartbeats."""
+
+    ignored_commands = {"hello", "ismaster", "isMaster", "endSessions", "ping"}
+
+    def __init__(self) -> None:
+        self.commands: Counter[str] = Counter()
+        monitoring.register(self)
+
+    def reset(self) -> None:
+        self.commands.clear()
+
+    def total(self) -> int:
+        return sum(self.commands.values())
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        if event.command_name not in self.ignored_commands:
+            self.commands[event.command_name] += 1
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        pass
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        pass
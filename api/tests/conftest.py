@@ -1,13 +1,18 @@
+from pathlib import Path
 from typing import AsyncGenerator, List, Tuple
 
 import pytest
 
+from docleaner.api.adapters.blob_store.filesystem_blob_store import (
+    FilesystemBlobStore,
+)
 from docleaner.api.adapters.clock.dummy_clock import DummyClock
 from docleaner.api.adapters.file_identifier.magic_file_identifier import (
     MagicFileIdentifier,
 )
 from docleaner.api.adapters.job_queue.async_job_queue import AsyncJobQueue
 from docleaner.api.adapters.repository.memory_repository import MemoryRepository
+from docleaner.api.adapters.repository.sqlite_repository import SQLiteRepository
 from docleaner.api.adapters.sandbox.dummy_sandbox import DummySandbox
 from docleaner.api.core.job import JobType
 from docleaner.api.core.sandbox import Sandbox
@@ -23,9 +28,23 @@ def clock() -> Clock:
     return DummyClock()
 
 
-@pytest.fixture
-async def repo(clock: Clock) -> AsyncGenerator[Repository, None]:
-    repo = MemoryRepository(clock)
+@pytest.fixture(params=["memory", "sqlite"])
+async def repo(
+    request: pytest.FixtureRequest,
+    clock: Clock,
+    job_types: List[JobType],
+    tmp_path: Path,
+) -> AsyncGenerator[Repository, None]:
+    repo: Repository
+    if request.param == "sqlite":
+        repo = SQLiteRepository(
+            clock,
+            job_types,
+            str(tmp_path / "docleaner.db"),
+            FilesystemBlobStore(str(tmp_path / "blobs")),
+        )
+    else:
+        repo = MemoryRepository(clock)
     yield repo
     await repo.disconnect()
 
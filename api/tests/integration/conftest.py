@@ -44,6 +44,7 @@ def sandbox(app_config: ConfigParser) -> Sandbox:
     return ContainerizedSandbox(
         container_image=app_config.get("plugins.pdf", "containerized.image"),
         podman_uri=app_config.get("docleaner", "podman_uri"),
+        job_type="pdf",
     )
 
 
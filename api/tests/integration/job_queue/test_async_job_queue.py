@@ -1,9 +1,9 @@
 import asyncio
-from typing import List
+from typing import List, Optional, Union
 
 from docleaner.api.adapters.job_queue.async_job_queue import AsyncJobQueue
 from docleaner.api.adapters.sandbox.dummy_sandbox import DummySandbox
-from docleaner.api.core.job import Job, JobStatus, JobType
+from docleaner.api.core.job import Job, JobStatus, JobSummary, JobType
 from docleaner.api.services.jobs import await_job
 from docleaner.api.services.repository import Repository
 
@@ -22,7 +22,7 @@ async def test_enforce_concurrent_job_limit(
     # Stop processing and enqueue all five jobs
     await sandbox.halt()
     for jid in jids:
-        job = await repo.find_job(jid)
+        job: Optional[Union[Job, JobSummary]] = await repo.find_job(jid)
         assert isinstance(job, Job)
         await queue.enqueue(job)
     await asyncio.sleep(0.1)  # Give jobs some time to start
@@ -1,6 +1,25 @@
-from typing import List
+import asyncio
+from datetime import datetime, timedelta, timezone
+import os
+import time
+from typing import AsyncIterator, List
 
-from docleaner.api.core.job import Job, JobType
+from bson import Binary
+import pytest
+
+from docleaner.api.adapters.blob_store.filesystem_blob_store import (
+    FilesystemBlobStore,
+)
+from docleaner.api.adapters.clock.dummy_clock import DummyClock
+from docleaner.api.adapters.clock.system_clock import SystemClock
+from docleaner.api.adapters.repository.mongodb_repository import (
+    MongoDBRepository,
+    ZSTD_BINARY_SUBTYPE,
+)
+from docleaner.api.core.job import Job, JobStatus, JobType
+from docleaner.api.core.metadata import DocumentMetadata, MetadataField
+from docleaner.api.core.session import Session
+from docleaner.api.services.clock import Clock
 from docleaner.api.services.repository import Repository
 
 
@@ -16,3 +35,384 @@ async def test_store_large_documents(
     job = await repo.find_job(jid)
     assert isinstance(job, Job)
     assert job.src == job.result == large_document
+
+
+async def test_store_small_documents_inline(
+    repo: Repository, sample_pdf: bytes, job_types: List[JobType]
+) -> None:
+    """Small documents are stored inline within their job's database document
+    instead of being saved to GridFS, which is transparent when retrieving them."""
+    jid = await repo.add_job(sample_pdf, "sample.pdf", job_types[0])
+    await repo.update_job(jid, result=b"TEST")
+    assert isinstance(repo, MongoDBRepository)
+    job_data = await repo._db.jobs.find_one({"_id": jid})
+    assert job_data["src"] == sample_pdf
+    assert job_data["result"] == b"TEST"
+    assert await repo._db["fs.files"].count_documents({}) == 0
+    job = await repo.find_job(jid)
+    assert isinstance(job, Job)
+    assert job.src == sample_pdf
+    assert job.result == b"TEST"
+
+
+async def test_deduplicate_large_documents(
+    repo: Repository, job_types: List[JobType]
+) -> None:
+    """Identical large documents are stored only once and reference counted,
+    the blob is deleted as soon as no job refers to it anymore."""
+    assert isinstance(repo, MongoDBRepository)
+    large_document = b"X" * 1024 * 1024  # 1 MB payload
+    jid1 = await repo.add_job(large_document, "large.pdf", job_types[0])
+    jid2 = await repo.add_job(large_document, "large.pdf", job_types[0])
+    assert await repo._db.blobs.count_documents({}) == 1
+    assert (await repo._db.blobs.find_one({}))["refcount"] == 2
+    assert await repo._db["fs.files"].count_documents({}) == 1
+    assert await repo.get_storage_stats() == (
+        2 * len(large_document),
+        len(large_document),
+    )
+    await repo.delete_job(jid1)
+    job = await repo.find_job(jid2)
+    assert isinstance(job, Job)
+    assert job.src == large_document
+    await repo.delete_job(jid2)
+    assert await repo._db.blobs.count_documents({}) == 0
+    assert await repo._db["fs.files"].count_documents({}) == 0
+
+
+async def test_filesystem_blob_store(
+    repo: Repository, clock: Clock, tmp_path: str, job_types: List[JobType]
+) -> None:
+    """Large documents can be stored within a filesystem blob store,
+    which makes results available as local files."""
+    assert isinstance(repo, MongoDBRepository)
+    fs_repo = MongoDBRepository(
+        clock,
+        job_types,
+        "database",
+        27017,
+        blob_store=FilesystemBlobStore(str(tmp_path)),
+    )
+    large_document = b"X" * 1024 * 1024  # 1 MB payload
+    jid = await fs_repo.add_job(b"TEST", "large.pdf", job_types[0])
+    await fs_repo.update_job(jid, result=large_document)
+    assert await repo._db["fs.files"].count_documents({}) == 0
+    job = await fs_repo.find_job(jid)
+    assert isinstance(job, Job)
+    assert job.result == large_document
+    result = await fs_repo.find_job_result_stream(jid)
+    assert result is not None
+    result_path = result.path
+    assert result_path is not None
+    with open(result_path, "rb") as f:
+        assert f.read() == large_document
+    await fs_repo.delete_job(jid)
+    assert not os.path.exists(result_path)
+    await fs_repo.disconnect()
+
+
+async def test_store_blob_while_deleting_it(
+    repo: Repository, clock: Clock, tmp_path: str, job_types: List[JobType]
+) -> None:
+    """A blob that's stored again while the data of its previous instance is being
+    deleted remains available to the job that stored it."""
+
+    class SlowBlobStore(FilesystemBlobStore):
+        async def delete(self, key: str) -> None:
+            await asyncio.sleep(0.01)
+            await super().delete(key)
+
+    assert isinstance(repo, MongoDBRepository)
+    slow_repo = MongoDBRepository(
+        clock, job_types, "database", 27017, blob_store=SlowBlobStore(str(tmp_path))
+    )
+    large_document = b"X" * 1024 * 1024  # 1 MB payload
+    try:
+        for _ in range(10):
+            jid = await slow_repo.add_job(large_document, "large.pdf", job_types[0])
+            _, new_jid = await asyncio.gather(
+                slow_repo.delete_job(jid),
+                slow_repo.add_job(large_document, "large.pdf", job_types[0]),
+            )
+            job = await slow_repo.find_job(new_jid)
+            assert isinstance(job, Job)
+            assert job.src == large_document
+            await slow_repo.delete_job(new_jid)
+        assert await repo._db.blobs.count_documents({}) == 0
+    finally:
+        await slow_repo.disconnect()
+
+
+async def test_stream_large_documents(
+    repo: Repository, clock: Clock, job_types: List[JobType]
+) -> None:
+    """Large documents read from a stream of chunks are uploaded to the blob store
+    (compressed if enabled) and deduplicated against documents stored before."""
+    assert isinstance(repo, MongoDBRepository)
+    zstd_repo = MongoDBRepository(
+        clock, job_types, "database", 27017, compression="zstd"
+    )
+    large_document = b"X" * 1024 * 1024  # 1 MB payload
+
+    async def chunks() -> AsyncIterator[bytes]:
+        for _ in range(4):
+            yield large_document
+
+    jid1 = await zstd_repo.add_job_from_stream(chunks(), "large.pdf", job_types[0])
+    jid2 = await repo.add_job(large_document * 4, "large.pdf", job_types[0])
+    assert await repo._db.blobs.count_documents({}) == 1
+    blob_data = await repo._db.blobs.find_one({})
+    assert blob_data["refcount"] == 2
+    assert blob_data["codec"] == "zstd"
+    assert blob_data["stored_size"] < blob_data["size"] == 4 * len(large_document)
+    assert await repo._db["fs.files"].count_documents({}) == 1
+    for jid in [jid1, jid2]:
+        job = await repo.find_job(jid)
+        assert isinstance(job, Job)
+        assert job.src == large_document * 4
+    await zstd_repo.disconnect()
+
+
+async def test_compress_documents(
+    repo: Repository,
+    clock: Clock,
+    sample_pdf: bytes,
+    job_types: List[JobType],
+) -> None:
+    """Documents and metadata can be stored compressed, which is transparent when retrieving
+    them. Data stored without compression remains readable after enabling it."""
+    assert isinstance(repo, MongoDBRepository)
+    legacy_jid = await repo.add_job(sample_pdf, "sample.pdf", job_types[0])
+    await repo.update_job(legacy_jid, metadata_src=DocumentMetadata(signed=True))
+    zstd_repo = MongoDBRepository(
+        clock, job_types, "database", 27017, compression="zstd"
+    )
+    compressible_document = b"X" * 1024 * 1024  # 1 MB payload
+    metadata = DocumentMetadata(
+        primary={"author": MetadataField(id="author", value="John Doe" * 100)}
+    )
+    jid = await zstd_repo.add_job(b"TEST" * 100, "sample.pdf", job_types[0])
+    await zstd_repo.update_job(
+        jid, result=compressible_document, metadata_result=metadata
+    )
+    job_data = await repo._db.jobs.find_one({"_id": jid})
+    assert isinstance(job_data["src"], Binary)
+    assert job_data["src"].subtype == ZSTD_BINARY_SUBTYPE
+    assert isinstance(job_data["metadata_result"], Binary)
+    blob_data = await repo._db.blobs.find_one({"_id": job_data["result"]})
+    assert blob_data["codec"] == "zstd"
+    assert blob_data["stored_size"] < blob_data["size"] == len(compressible_document)
+    job = await zstd_repo.find_job(jid)
+    assert isinstance(job, Job)
+    assert job.src == b"TEST" * 100
+    assert job.result == compressible_document
+    assert job.metadata_result == metadata
+    result = await zstd_repo.find_job_result_stream(jid)
+    assert result is not None and result.path is None
+    assert (
+        b"".join([chunk async for chunk in result.read(10, 20)])
+        == compressible_document[10:20]
+    )
+    legacy_job = await zstd_repo.find_job(legacy_jid)
+    assert isinstance(legacy_job, Job)
+    assert legacy_job.src == sample_pdf
+    assert legacy_job.metadata_src == DocumentMetadata(signed=True)
+    await zstd_repo.delete_job(jid)
+    assert await repo._db.blobs.count_documents({}) == 0
+    await zstd_repo.disconnect()
+
+
+async def test_coalesce_session_refreshes(
+    repo: Repository, clock: DummyClock, sample_pdf: bytes, job_types: List[JobType]
+) -> None:
+    """Session refreshes caused by job updates are written behind, single sessions
+    are read with pending refreshes applied and listing sessions flushes them."""
+    assert isinstance(repo, MongoDBRepository)
+    sid = await repo.add_session()
+    jids = [
+        await repo.add_job(sample_pdf, "sample.pdf", job_types[0], sid=sid)
+        for _ in range(3)
+    ]
+    created = (await repo._db.sessions.find_one({"_id": sid}))["updated"]
+    updated = clock.advance(60)
+    for jid in jids:
+        await repo.update_job(jid, status=JobStatus.SUCCESS)
+    assert (await repo._db.sessions.find_one({"_id": sid}))["updated"] == created
+    session = await repo.find_session(sid)
+    assert isinstance(session, Session)
+    assert abs(session.updated - updated) < timedelta(milliseconds=1)
+    assert (await repo._db.sessions.find_one({"_id": sid}))["updated"] == created
+    await repo.find_sessions()
+    session_data = await repo._db.sessions.find_one({"_id": sid})
+    assert abs(session_data["updated"] - updated) < timedelta(milliseconds=1)
+    assert session_data["unfinished_jobs"] == 0
+    # Adding a job to a session writes through, including pending refreshes
+    await repo.update_job(jids[0], status=JobStatus.RUNNING)
+    updated = clock.advance(60)
+    await repo.add_job(sample_pdf, "sample.pdf", job_types[0], sid=sid)
+    session_data = await repo._db.sessions.find_one({"_id": sid})
+    assert abs(session_data["updated"] - updated) < timedelta(milliseconds=1)
+    assert session_data["unfinished_jobs"] == 2
+    assert len(repo._pending_session_refreshes) == 0
+
+
+async def test_ttl_expiry(
+    repo: Repository, clock: DummyClock, sample_pdf: bytes, job_types: List[JobType]
+) -> None:
+    """With TTL expiry enabled, finished standalone jobs and sessions without
+    unfinished jobs carry an expiry date. Jobs of expired sessions and documents
+    of expired jobs are swept once they are due."""
+    assert isinstance(repo, MongoDBRepository)
+    ttl_repo = MongoDBRepository(
+        clock,
+        job_types,
+        "database",
+        27017,
+        ttl_expiry=True,
+        job_keepalive=timedelta(minutes=10),
+        session_keepalive=timedelta(hours=1),
+    )
+    try:
+        # Expiry dates are stored in UTC
+        now = clock.now().astimezone(timezone.utc).replace(tzinfo=None)
+        # Standalone jobs
+        jid = await ttl_repo.add_job(sample_pdf, "sample.pdf", job_types[0])
+        await ttl_repo.update_job(jid, status=JobStatus.RUNNING)
+        job_data = await repo._db.jobs.find_one({"_id": jid})
+        assert job_data["expires_at"] is None
+        await ttl_repo.update_job(jid, status=JobStatus.SUCCESS)
+        job_data = await repo._db.jobs.find_one({"_id": jid})
+        assert abs(job_data["expires_at"] - (now + timedelta(minutes=10))) <= timedelta(
+            seconds=1
+        )
+        # Sessions don't expire while they have unfinished jobs
+        sid = await ttl_repo.add_session()
+        session_jid = await ttl_repo.add_job(
+            sample_pdf, "sample.pdf", job_types[0], sid=sid
+        )
+        session_data = await repo._db.sessions.find_one({"_id": sid})
+        assert session_data["unfinished_jobs"] == 1
+        assert session_data["expires_at"] is None
+        await ttl_repo.update_job(session_jid, status=JobStatus.ERROR)
+        await ttl_repo._flush_session_refreshes()
+        session_data = await repo._db.sessions.find_one({"_id": sid})
+        assert session_data["unfinished_jobs"] == 0
+        assert abs(
+            session_data["expires_at"] - (now + timedelta(hours=1))
+        ) <= timedelta(seconds=1)
+        session = await ttl_repo.find_session(sid)
+        assert isinstance(session, Session)
+        # Large documents of standalone jobs are tracked for garbage collection
+        large_document = b"X" * 1024 * 1024
+        large_jid = await ttl_repo.add_job(large_document, "large.pdf", job_types[0])
+        await ttl_repo.update_job(
+            large_jid, status=JobStatus.SUCCESS, result=large_document
+        )
+        gc_data = await repo._db.pending_gc.find_one({"_id": large_jid})
+        assert gc_data["src"] == gc_data["result"]
+        # Simulate the TTL monitor removing the session and the job, which are
+        # only swept once they are due
+        await repo._db.sessions.delete_one({"_id": sid})
+        await repo._db.jobs.delete_one({"_id": large_jid})
+        await ttl_repo._sweep()
+        assert await ttl_repo.find_job(session_jid) is not None
+        assert await repo._db.blobs.count_documents({}) == 1
+        clock.advance(60 * 60)
+        await ttl_repo._sweep()
+        assert await ttl_repo.find_job(session_jid) is None
+        assert await ttl_repo.find_job(jid) is not None
+        assert await repo._db.blobs.count_documents({}) == 0
+        assert await repo._db.pending_gc.count_documents({"type": "session"}) == 0
+    finally:
+        await ttl_repo.disconnect()
+
+
+async def test_ttl_expiry_of_legacy_data(
+    repo: Repository, clock: DummyClock, sample_pdf: bytes, job_types: List[JobType]
+) -> None:
+    """Jobs and sessions created while TTL expiry was disabled receive expiry dates
+    and counters of unfinished jobs once it's enabled."""
+    assert isinstance(repo, MongoDBRepository)
+    jid = await repo.add_job(sample_pdf, "sample.pdf", job_types[0])
+    await repo.update_job(jid, status=JobStatus.SUCCESS)
+    sid = await repo.add_session()
+    session_jids = [
+        await repo.add_job(sample_pdf, "sample.pdf", job_types[0], sid=sid)
+        for _ in range(3)
+    ]
+    await repo.update_job(session_jids[0], status=JobStatus.SUCCESS)
+    await repo._flush_session_refreshes()
+    ttl_repo = MongoDBRepository(
+        clock,
+        job_types,
+        "database",
+        27017,
+        ttl_expiry=True,
+        job_keepalive=timedelta(minutes=10),
+        session_keepalive=timedelta(hours=1),
+    )
+    try:
+        await ttl_repo._backfill_expiry()
+        job_data = await repo._db.jobs.find_one({"_id": jid})
+        updated = job_data["updated"].astimezone(timezone.utc).replace(tzinfo=None)
+        assert abs(
+            job_data["expires_at"] - (updated + timedelta(minutes=10))
+        ) <= timedelta(seconds=1)
+        session_data = await repo._db.sessions.find_one({"_id": sid})
+        assert session_data["unfinished_jobs"] == 2
+        assert session_data["expires_at"] is None
+        # The session only expires once all of its jobs have finished
+        await ttl_repo.update_job(session_jids[1], status=JobStatus.SUCCESS)
+        await ttl_repo._flush_session_refreshes()
+        session_data = await repo._db.sessions.find_one({"_id": sid})
+        assert session_data["unfinished_jobs"] == 1
+        assert session_data["expires_at"] is None
+        await ttl_repo.update_job(session_jids[2], status=JobStatus.ERROR)
+        await ttl_repo._flush_session_refreshes()
+        session_data = await repo._db.sessions.find_one({"_id": sid})
+        assert session_data["unfinished_jobs"] == 0
+        assert session_data["expires_at"] is not None
+    finally:
+        await ttl_repo.disconnect()
+
+
+async def test_ttl_expiry_in_non_utc_time_zone(
+    repo: Repository,
+    monkeypatch: pytest.MonkeyPatch,
+    sample_pdf: bytes,
+    job_types: List[JobType],
+) -> None:
+    """Expiry dates are stored in UTC (as expected by MongoDB's TTL monitor),
+    even if the clock returns the local time of a host in another time zone."""
+    assert isinstance(repo, MongoDBRepository)
+    monkeypatch.setenv("TZ", "EST+5")
+    time.tzset()
+    ttl_repo = MongoDBRepository(
+        SystemClock(),
+        job_types,
+        "database",
+        27017,
+        ttl_expiry=True,
+        job_keepalive=timedelta(minutes=10),
+        session_keepalive=timedelta(hours=1),
+    )
+    try:
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        jid = await ttl_repo.add_job(sample_pdf, "sample.pdf", job_types[0])
+        await ttl_repo.update_job(jid, status=JobStatus.SUCCESS)
+        job_data = await repo._db.jobs.find_one({"_id": jid})
+        assert abs(job_data["expires_at"] - (now + timedelta(minutes=10))) <= timedelta(
+            seconds=1
+        )
+        sid = await ttl_repo.add_session()
+        session_data = await repo._db.sessions.find_one({"_id": sid})
+        assert abs(
+            session_data["expires_at"] - (now + timedelta(hours=1))
+        ) <= timedelta(seconds=1)
+        # Nothing is due yet
+        await ttl_repo._sweep()
+        assert await repo._db.pending_gc.count_documents({"_id": sid}) == 1
+    finally:
+        await ttl_repo.disconnect()
+        monkeypatch.undo()
+        time.tzset()
@@ -3,7 +3,9 @@ Tests targeting the REST API
 """
 
 import asyncio
+import io
 import re
+import zipfile
 
 import httpx
 
@@ -24,10 +26,17 @@ async def test_clean_document_workflow(web_app: str, sample_pdf_signed: bytes) -
         assert upload_resp.headers["content-type"] == "application/json"
         job_url = f"{web_app}/api/v1/jobs/{jid}"
         assert upload_resp.headers["location"] == job_url
-        # Poll job details until it has been executed
-        while (await client.get(job_url)).json()["status"] != JobStatus.SUCCESS:
-            await asyncio.sleep(0.2)
-        job_data = (await client.get(job_url)).json()
+        # Wait server-side until the job has been executed
+        job_data = (await client.get(job_url, params={"wait": 20}, timeout=30)).json()
+        assert job_data["status"] == JobStatus.SUCCESS
+        # Conditional status requests
+        status_resp = await client.get(f"{job_url}/status")
+        assert status_resp.json()["status"] == JobStatus.SUCCESS
+        assert status_resp.headers["cache-control"] == "no-cache"
+        cached_status_resp = await client.get(
+            f"{job_url}/status", headers={"If-None-Match": status_resp.headers["etag"]}
+        )
+        assert cached_status_resp.status_code == 304
         assert len(job_data["metadata_src"]["primary"]) > 0  # Metadata is present
         assert job_data["metadata_src"]["primary"]["PDF:Author"]["value"] == "John Doe"
         assert "PDF:Author" not in job_data["metadata_result"]["primary"]
@@ -47,12 +56,59 @@ async def test_clean_document_workflow(web_app: str, sample_pdf_signed: bytes) -
         assert filename_match is not None
         assert filename_match.group(1) == "test.pdf"
         assert "PDF" in dl_resp.text
+        # Conditional and partial downloads
+        etag = dl_resp.headers["etag"]
+        cached_resp = await client.get(
+            f"{web_app}/api/v1/jobs/{jid}/result", headers={"If-None-Match": etag}
+        )
+        assert cached_resp.status_code == 304
+        range_resp = await client.get(
+            f"{web_app}/api/v1/jobs/{jid}/result",
+            headers={"Range": "bytes=0-9", "If-Range": etag},
+        )
+        assert range_resp.status_code == 206
+        assert (
+            range_resp.headers["content-range"] == f"bytes 0-9/{len(dl_resp.content)}"
+        )
+        assert range_resp.content == dl_resp.content[:10]
         # Delete job manually
         del_resp = await client.delete(f"{web_app}/api/v1/jobs/{jid}")
         assert del_resp.status_code == 204
         assert (await client.get(job_url)).status_code == 404
 
 
+async def test_stream_job_and_session_events(web_app: str, sample_pdf: bytes) -> None:
+    """End-to-end test following the progress of a job and its session via server-sent events."""
+    async with httpx.AsyncClient(timeout=30) as client:
+        sid = (await client.post(f"{web_app}/api/v1/sessions")).json()["id"]
+        upload_resp = await client.post(
+            f"{web_app}/api/v1/jobs",
+            params={"session": sid},
+            files={"doc_src": ("test.pdf", sample_pdf)},
+        )
+        jid = upload_resp.json()["id"]
+        # The job stream ends after the job has finished
+        async with client.stream("GET", f"{web_app}/api/v1/jobs/{jid}/events") as resp:
+            assert resp.status_code == 200
+            assert resp.headers["content-type"].startswith("text/event-stream")
+            events = [line async for line in resp.aiter_lines() if len(line) > 0]
+        assert events[-3:] == [
+            "event: status",
+            f"id: {JobStatus.SUCCESS.value}",
+            f'data: {{"id": "{jid}", "status": {JobStatus.SUCCESS.value}}}',
+        ]
+        # The session stream starts with the current counters
+        async with client.stream(
+            "GET", f"{web_app}/api/v1/sessions/{sid}/events"
+        ) as resp:
+            lines = resp.aiter_lines()
+            assert await anext(lines) == "event: progress"
+            assert (await anext(lines)).startswith("id: ")
+            assert await anext(lines) == (
+                f'data: {{"id": "{sid}", "jobs_total": 1, "jobs_finished": 1}}'
+            )
+
+
 async def test_upload_invalid_document(web_app: str) -> None:
     """End-to-end test attempting to upload an invalid/unsupported document via the REST API."""
     async with httpx.AsyncClient() as client:
@@ -72,6 +128,8 @@ async def test_request_invalid_ids(web_app: str) -> None:
         assert r_details.status_code == 404
         r_result = await client.get(f"{web_app}/api/v1/jobs/invalid/result")
         assert r_result.status_code == 404
+        r_status = await client.get(f"{web_app}/api/v1/jobs/invalid/status")
+        assert r_status.status_code == 404
         r_details = await client.delete(f"{web_app}/api/v1/jobs/invalid")
         assert r_details.status_code == 404
         r_details = await client.get(f"{web_app}/api/v1/sessions/invalid")
@@ -123,11 +181,32 @@ async def test_clean_multiple_documents_with_session_workflow(
             assert job_data["type"] == "pdf"
             assert isinstance(job_data["created"], str)
             assert isinstance(job_data["updated"], str)
+        # Page through the job list with selected fields only
+        page1 = (
+            await client.get(session_url, params={"limit": 1, "fields": "status"})
+        ).json()
+        assert page1["jobs_total"] == 2
+        assert page1["jobs"] == [{"id": page1["jobs"][0]["id"], "status": 3}]
+        page2 = (
+            await client.get(
+                session_url, params={"limit": 1, "after": page1["jobs_next"]}
+            )
+        ).json()
+        assert {page1["jobs"][0]["id"], page2["jobs"][0]["id"]} == {jid1, jid2}
         # Download one of the results
         dl_resp = await client.get(f"{web_app}/api/v1/jobs/{jid2}/result")
         assert dl_resp.status_code == 200
         assert dl_resp.headers["content-type"] == "application/octet-stream"
         assert "PDF" in dl_resp.text
+        # Download all results at once
+        zip_resp = await client.get(f"{session_url}/results.zip")
+        assert zip_resp.status_code == 200
+        assert zip_resp.headers["content-type"] == "application/zip"
+        with zipfile.ZipFile(io.BytesIO(zip_resp.content)) as zip_archive:
+            assert zip_archive.namelist() == ["test.pdf", "test-2.pdf"]
+            assert dl_resp.content in [
+                zip_archive.read(name) for name in zip_archive.namelist()
+            ]
         # Delete session manually
         del_resp = await client.delete(session_url)
         assert del_resp.status_code == 204
@@ -136,6 +215,51 @@ async def test_clean_multiple_documents_with_session_workflow(
             assert (await client.get(f"{web_app}/api/v1/jobs/{jid}")).status_code == 404
 
 
+async def test_upload_batch_of_documents_into_session(
+    web_app: str, sample_pdf: bytes
+) -> None:
+    """End-to-end test uploading multiple PDFs (individually and as zip archive)
+    into a session with a single request."""
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zip_archive:
+        zip_archive.writestr("folder/test3.pdf", sample_pdf)
+    async with httpx.AsyncClient() as client:
+        sid = (await client.post(f"{web_app}/api/v1/sessions")).json()["id"]
+        batch_url = f"{web_app}/api/v1/sessions/{sid}/jobs"
+        upload_resp = await client.post(
+            batch_url,
+            files=[
+                ("doc_src", ("test1.pdf", sample_pdf)),
+                ("doc_src", ("test2.pdf", sample_pdf)),
+                ("archive", ("test.zip", archive.getvalue())),
+            ],
+        )
+        assert upload_resp.status_code == 201  # Created
+        jobs = upload_resp.json()
+        assert [job["name"] for job in jobs] == ["test1.pdf", "test2.pdf", "test3.pdf"]
+        assert {job["type"] for job in jobs} == {"pdf"}
+        session_data = (await client.get(f"{web_app}/api/v1/sessions/{sid}")).json()
+        assert {job["id"] for job in session_data["jobs"]} == {
+            job["id"] for job in jobs
+        }
+        # Batches containing unsupported documents are rejected as a whole
+        invalid_resp = await client.post(
+            batch_url,
+            files=[
+                ("doc_src", ("test1.pdf", sample_pdf)),
+                ("doc_src", ("test2.pdf", b"INVALID")),
+            ],
+        )
+        assert invalid_resp.status_code == 422
+        session_data = (await client.get(f"{web_app}/api/v1/sessions/{sid}")).json()
+        assert session_data["jobs_total"] == 3
+        invalid_session_resp = await client.post(
+            f"{web_app}/api/v1/sessions/invalid/jobs",
+            files={"doc_src": ("test.pdf", sample_pdf)},
+        )
+        assert invalid_session_resp.status_code == 404
+
+
 async def test_show_and_hide_jobs_in_session_details(
     web_app: str, sample_pdf: bytes
 ) -> None:
@@ -0,0 +1,106 @@
+import io
+import os
+from typing import AsyncIterator
+
+import pytest
+
+from docleaner.api.adapters.blob_store.filesystem_blob_store import (
+    FilesystemBlobStore,
+)
+
+
+@pytest.fixture
+def blob_store(tmp_path: str) -> FilesystemBlobStore:
+    return FilesystemBlobStore(str(tmp_path))
+
+
+async def test_put_and_get_blob(
+    blob_store: FilesystemBlobStore, sample_pdf: bytes
+) -> None:
+    """Storing and retrieving a blob, which is saved to a sharded path."""
+    await blob_store.put("abcdef0123", sample_pdf)
+    assert await blob_store.get("abcdef0123") == sample_pdf
+    path = blob_store.get_path("abcdef0123")
+    assert path is not None
+    assert path.endswith(os.path.join("ab", "cd", "abcdef0123"))
+    with open(path, "rb") as f:
+        assert f.read() == sample_pdf
+
+
+async def test_put_existing_blob(blob_store: FilesystemBlobStore) -> None:
+    """Storing a blob under an existing key leaves the existing blob in place."""
+    await blob_store.put("abcdef0123", b"TEST")
+    await blob_store.put("abcdef0123", b"TEST")
+    assert await blob_store.get("abcdef0123") == b"TEST"
+    assert os.listdir(os.path.dirname(str(blob_store.get_path("abcdef0123")))) == [
+        "abcdef0123"
+    ]
+
+
+async def test_get_empty_blob(blob_store: FilesystemBlobStore) -> None:
+    """Retrieving an empty blob (which can't be memory-mapped)."""
+    await blob_store.put("abcdef0123", b"")
+    assert await blob_store.get("abcdef0123") == b""
+
+
+async def test_delete_blob(blob_store: FilesystemBlobStore) -> None:
+    """Deleting a blob."""
+    await blob_store.put("abcdef0123", b"TEST")
+    await blob_store.delete("abcdef0123")
+    assert blob_store.get_path("abcdef0123") is None
+    with pytest.raises(ValueError):
+        await blob_store.get("abcdef0123")
+
+
+async def test_nonexisting_blob(blob_store: FilesystemBlobStore) -> None:
+    """Attempting to retrieve or delete a blob that doesn't exist."""
+    assert blob_store.get_path("abcdef0123") is None
+    with pytest.raises(ValueError):
+        await blob_store.get("abcdef0123")
+    with pytest.raises(ValueError):
+        await blob_store.delete("abcdef0123")
+
+
+async def test_invalid_blob_key(blob_store: FilesystemBlobStore) -> None:
+    """Keys that could escape the blob store's directory are rejected."""
+    with pytest.raises(ValueError):
+        await blob_store.put("../../etc/passwd", b"TEST")
+
+
+async def test_put_blob_stream_and_rename(
+    blob_store: FilesystemBlobStore, sample_pdf: bytes
+) -> None:
+    """Storing a blob from a stream of chunks under a temporary key,
+    then renaming it (which replaces any existing blob with the new key)."""
+
+    async def chunks() -> AsyncIterator[bytes]:
+        src = io.BytesIO(sample_pdf)
+        while len(chunk := src.read(1024)) > 0:
+            yield chunk
+
+    await blob_store.put_stream("upload-0123", chunks())
+    assert await blob_store.get("upload-0123") == sample_pdf
+    await blob_store.put("abcdef0123", b"TEST")
+    await blob_store.rename("upload-0123", "abcdef0123")
+    assert await blob_store.get("abcdef0123") == sample_pdf
+    assert blob_store.get_path("upload-0123") is None
+    with pytest.raises(ValueError):
+        await blob_store.rename("upload-0123", "abcdef0123")
+
+
+async def test_get_blob_stream(
+    blob_store: FilesystemBlobStore, sample_pdf: bytes
+) -> None:
+    """Retrieving a blob in chunks, either as a whole or only a range of it."""
+    await blob_store.put("abcdef0123", sample_pdf)
+    assert (
+        b"".join([chunk async for chunk in blob_store.get_stream("abcdef0123")])
+        == sample_pdf
+    )
+    assert (
+        b"".join([c async for c in blob_store.get_stream("abcdef0123", 10, 20)])
+        == sample_pdf[10:20]
+    )
+    with pytest.raises(ValueError):
+        async for _ in blob_store.get_stream("0123abcdef"):
+            pass
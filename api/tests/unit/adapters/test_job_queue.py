@@ -1,3 +1,4 @@
+import dataclasses
 import pytest
 from typing import List
 
@@ -28,3 +29,25 @@ async def test_enqueue_job_with_invalid_state(
     assert isinstance(job, Job)
     with pytest.raises(ValueError):
         await queue.enqueue(job)
+
+
+async def test_enqueue_multiple_jobs(
+    queue: JobQueue, repo: Repository, sample_pdf: bytes, job_types: List[JobType]
+) -> None:
+    """Adding multiple jobs at once, which fails for all jobs if one of them is in invalid state."""
+    jobs = []
+    for _ in range(2):
+        job = await repo.find_job(
+            await repo.add_job(sample_pdf, "sample.pdf", job_types[0])
+        )
+        assert isinstance(job, Job)
+        jobs.append(job)
+    with pytest.raises(ValueError):
+        await queue.enqueue_many(
+            [jobs[0], dataclasses.replace(jobs[1], status=JobStatus.SUCCESS)]
+        )
+    found_job = await repo.find_job(jobs[0].id)
+    assert isinstance(found_job, Job) and found_job.status == JobStatus.CREATED
+    await queue.enqueue_many(jobs)
+    for job in jobs:
+        await await_job(job.id, repo)
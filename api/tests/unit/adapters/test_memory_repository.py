@@ -0,0 +1,96 @@
+from datetime import timedelta
+import os
+from typing import List
+
+from prometheus_client import REGISTRY
+
+from docleaner.api.adapters.clock.dummy_clock import DummyClock
+from docleaner.api.adapters.repository.memory_repository import MemoryRepository
+from docleaner.api.core.job import Job, JobStatus, JobType
+from docleaner.api.services.clock import Clock
+
+
+async def test_spill_finished_jobs(
+    clock: Clock, sample_pdf: bytes, job_types: List[JobType]
+) -> None:
+    """Documents of finished jobs are spilled to disk once the memory budget is exceeded
+    and transparently reloaded when accessed."""
+    repo = MemoryRepository(clock, max_resident_bytes=2 * len(sample_pdf))
+    finished_jid = await repo.add_job(sample_pdf, "sample.pdf", job_types[0])
+    await repo.update_job(finished_jid, result=b"TEST", status=JobStatus.SUCCESS)
+    assert repo.get_memory_stats() == (len(sample_pdf) + 4, 0)
+    jids = [
+        await repo.add_job(sample_pdf, "sample.pdf", job_types[0]) for _ in range(2)
+    ]
+    # Unfinished jobs are never spilled
+    assert repo.get_memory_stats() == (2 * len(sample_pdf), len(sample_pdf) + 4)
+    assert REGISTRY.get_sample_value(
+        "docleaner_memory_repository_bytes", {"location": "resident"}
+    ) == (2 * len(sample_pdf))
+    assert REGISTRY.get_sample_value(
+        "docleaner_memory_repository_bytes", {"location": "spilled"}
+    ) == (len(sample_pdf) + 4)
+    total_size = 3 * len(sample_pdf) + 4
+    assert await repo.get_storage_stats() == (total_size, total_size)
+    job = await repo.find_job(finished_jid)
+    assert isinstance(job, Job)
+    assert job.src == sample_pdf
+    assert job.result == b"TEST"
+    job = await repo.find_job(finished_jid, include_blobs=False)
+    assert isinstance(job, Job)
+    assert job.src == job.result == b""
+    # Replacing a spilled result discards the spilled document (the new result
+    # is spilled right away, since the budget is still exceeded)
+    await repo.update_job(finished_jid, result=b"TEST2")
+    assert repo.get_memory_stats() == (2 * len(sample_pdf), len(sample_pdf) + 5)
+    # Deleting a job discards its spilled documents
+    await repo.delete_job(finished_jid)
+    assert repo.get_memory_stats() == (2 * len(sample_pdf), 0)
+    for jid in jids:
+        await repo.delete_job(jid)
+    assert repo.get_memory_stats() == (0, 0)
+    assert repo._spill_store is not None
+    spill_dir = repo._spill_store.root
+    await repo.disconnect()
+    assert not os.path.exists(spill_dir)
+
+
+async def test_secondary_indexes(
+    clock: DummyClock, sample_pdf: bytes, job_types: List[JobType]
+) -> None:
+    """Secondary indexes by session, status and last update are kept in sync."""
+    repo = MemoryRepository(clock)
+    sid = await repo.add_session()
+    jids = [
+        await repo.add_job(sample_pdf, "sample.pdf", job_types[0], sid=sid)
+        for _ in range(3)
+    ]
+    clock.advance(60)
+    await repo.update_job(jids[0], status=JobStatus.SUCCESS)
+    assert [j.id for j in await repo.find_jobs(status=[JobStatus.CREATED])] == jids[1:]
+    assert [j.id for j in await repo.find_jobs(status=[JobStatus.SUCCESS])] == jids[:1]
+    assert [
+        j.id for j in await repo.find_jobs(not_updated_for=timedelta(seconds=60))
+    ] == jids[1:]
+    # Jobs of several statuses are merged in order, starting after the given job
+    assert [
+        j.id
+        for j in await repo.find_jobs(
+            status=[JobStatus.SUCCESS, JobStatus.CREATED], after=jids[0], limit=1
+        )
+    ] == jids[1:2]
+    await repo.delete_job(jids[1])
+    assert [j.id for j in await repo.find_jobs(sid)] == [jids[0], jids[2]]
+    clock.advance(60)
+    await repo.update_jobs([jids[2], jids[0]], JobStatus.ERROR)
+    assert [j.id for j in await repo.find_jobs(status=[JobStatus.ERROR])] == [
+        jids[0],
+        jids[2],
+    ]
+    assert repo._jobs_by_status[JobStatus.CREATED] == []
+    assert await repo.find_jobs(not_updated_for=timedelta(seconds=60)) == []
+    await repo.delete_session(sid)
+    assert repo._jobs_by_key == []
+    assert repo._jobs_by_status == {s: [] for s in JobStatus}
+    assert repo._jobs_by_update == []
+    assert repo._jobs_by_session == {}
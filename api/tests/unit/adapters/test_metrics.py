@@ -0,0 +1,112 @@
+import asyncio
+import time
+from typing import AsyncIterator, Dict, List
+
+from fastapi import FastAPI
+import httpx
+from prometheus_client import REGISTRY
+
+from docleaner.api.adapters.metrics.prometheus import monitor_event_loop_lag
+from docleaner.api.adapters.repository.memory_repository import MemoryRepository
+from docleaner.api.adapters.sandbox.dummy_sandbox import DummySandbox
+from docleaner.api.core.job import Job, JobType
+from docleaner.api.entrypoints.web.middleware import MetricsMiddleware
+from docleaner.api.services.clock import Clock
+from docleaner.api.services.job_queue import JobQueue
+from docleaner.api.services.jobs import await_job
+from docleaner.api.services.repository import Repository
+
+
+def get_sample(name: str, labels: Dict[str, str]) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+async def test_repository_operation_metrics(repo: Repository) -> None:
+    """Repository operations are recorded per repository and method."""
+    labels = {"repository": type(repo).__name__, "operation": "add_session"}
+    count = "docleaner_repository_operation_duration_seconds_count"
+    previous_count = get_sample(count, labels)
+    await repo.add_session()
+    assert get_sample(count, labels) == previous_count + 1
+
+
+async def test_nested_repository_operation_metrics(
+    clock: Clock, sample_pdf: bytes, job_types: List[JobType]
+) -> None:
+    """Repository operations invoked by other operations aren't recorded separately."""
+    repo = MemoryRepository(clock)
+    count = "docleaner_repository_operation_duration_seconds_count"
+    labels = {"repository": "MemoryRepository", "operation": "add_job"}
+    previous_count = get_sample(count, labels)
+    batch_labels = {"repository": "MemoryRepository", "operation": "add_jobs"}
+    previous_batch_count = get_sample(count, batch_labels)
+
+    async def chunks() -> AsyncIterator[bytes]:
+        yield sample_pdf
+
+    await repo.add_jobs([(chunks(), "sample.pdf", job_types[0])])
+    assert get_sample(count, labels) == previous_count
+    assert get_sample(count, batch_labels) == previous_batch_count + 1
+
+
+async def test_job_queue_metrics(
+    queue: JobQueue,
+    repo: Repository,
+    sample_pdf: bytes,
+    job_types: List[JobType],
+    sandbox: DummySandbox,
+) -> None:
+    """Queued and running jobs are tracked per job type."""
+    labels = {"job_type": job_types[0].id}
+    previous_waits = get_sample("docleaner_queue_wait_seconds_count", labels)
+    await sandbox.halt()
+    job = await repo.find_job(
+        await repo.add_job(sample_pdf, "sample.pdf", job_types[0])
+    )
+    assert isinstance(job, Job)
+    await queue.enqueue(job)
+    while get_sample("docleaner_jobs_running", labels) == 0:
+        await asyncio.sleep(0.01)
+    assert get_sample("docleaner_queue_depth", labels) == 0
+    assert get_sample("docleaner_queue_wait_seconds_count", labels) == (
+        previous_waits + 1
+    )
+    await sandbox.resume()
+    await await_job(job.id, repo)
+    while get_sample("docleaner_jobs_running", labels) > 0:
+        await asyncio.sleep(0.01)
+
+
+async def test_http_request_metrics() -> None:
+    """HTTP requests are recorded per route template rather than per path."""
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: str) -> Dict[str, str]:
+        return {"id": item_id}
+
+    count = "docleaner_http_request_duration_seconds_count"
+    route_labels = {"method": "GET", "route": "/items/{item_id}", "status": "200"}
+    other_labels = {"method": "GET", "route": "other", "status": "404"}
+    previous_route_count = get_sample(count, route_labels)
+    previous_other_count = get_sample(count, other_labels)
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        assert (await client.get("/items/a")).status_code == 200
+        assert (await client.get("/items/b")).status_code == 200
+        assert (await client.get("/unknown")).status_code == 404
+    assert get_sample(count, route_labels) == previous_route_count + 2
+    assert get_sample(count, other_labels) == previous_other_count + 1
+
+
+async def test_event_loop_lag_metrics() -> None:
+    """Blocking the event loop is recorded as lag."""
+    previous_lag = get_sample("docleaner_event_loop_lag_seconds_sum", {})
+    monitor = asyncio.create_task(monitor_event_loop_lag(interval=0.01))
+    await asyncio.sleep(0)
+    time.sleep(0.1)
+    await asyncio.sleep(0.05)
+    monitor.cancel()
+    assert get_sample("docleaner_event_loop_lag_seconds_sum", {}) - previous_lag >= 0.05
@@ -1,10 +1,14 @@
+import asyncio
+import dataclasses
 from datetime import datetime, timedelta
-from typing import List
+import hashlib
+import io
+from typing import AsyncIterator, List
 
 import pytest
 
 from docleaner.api.adapters.clock.dummy_clock import DummyClock
-from docleaner.api.core.job import Job, JobParams, JobStatus, JobType
+from docleaner.api.core.job import Job, JobParams, JobStatus, JobSummary, JobType
 from docleaner.api.core.metadata import DocumentMetadata, MetadataField
 from docleaner.api.core.session import Session
 from docleaner.api.services.repository import Repository
@@ -29,6 +33,61 @@ async def test_add_and_fetch_job(
     assert found_job.session_id is None
 
 
+async def test_add_job_from_stream(
+    repo: Repository, sample_pdf: bytes, job_types: List[JobType]
+) -> None:
+    """Adding a job whose source document is read from a stream of chunks."""
+
+    async def chunks() -> AsyncIterator[bytes]:
+        src = io.BytesIO(sample_pdf)
+        while len(chunk := src.read(1024)) > 0:
+            yield chunk
+
+    jid = await repo.add_job_from_stream(chunks(), "sample.pdf", job_types[0])
+    found_job = await repo.find_job(jid)
+    assert isinstance(found_job, Job)
+    assert found_job.src == sample_pdf
+    assert found_job.name == "sample.pdf"
+    assert found_job.status == JobStatus.CREATED
+
+
+async def test_add_multiple_jobs(
+    repo: Repository, sample_pdf: bytes, job_types: List[JobType]
+) -> None:
+    """Adding multiple jobs at once to a session."""
+
+    async def chunks(data: bytes) -> AsyncIterator[bytes]:
+        src = io.BytesIO(data)
+        while len(chunk := src.read(1024)) > 0:
+            yield chunk
+
+    sid = await repo.add_session()
+    jids = await repo.add_jobs(
+        [
+            (chunks(sample_pdf), "sample.pdf", job_types[0]),
+            (chunks(b"TEST"), "test.pdf", job_types[0]),
+        ],
+        JobParams(),
+        sid,
+    )
+    assert len(jids) == 2
+    assert [job.id for job in await repo.find_jobs(sid)] == jids
+    for jid, src, name in zip(jids, [sample_pdf, b"TEST"], ["sample.pdf", "test.pdf"]):
+        found_job = await repo.find_job(jid)
+        assert isinstance(found_job, Job)
+        assert found_job.src == src
+        assert found_job.name == name
+        assert found_job.status == JobStatus.CREATED
+        assert found_job.session_id == sid
+    assert await repo.get_total_job_count() == 2
+    # Either all or none of the jobs are created
+    with pytest.raises(ValueError):
+        await repo.add_jobs(
+            [(chunks(b"TEST"), "test.pdf", job_types[0])], sid="invalid"
+        )
+    assert len(await repo.find_jobs()) == 2
+
+
 async def test_add_and_fetch_job_with_params(
     repo: Repository, sample_pdf: bytes, job_types: List[JobType]
 ) -> None:
@@ -42,12 +101,39 @@ async def test_add_and_fetch_job_with_params(
     )
 
 
+async def test_fetch_job_without_blobs(
+    repo: Repository, sample_pdf: bytes, job_types: List[JobType]
+) -> None:
+    """Retrieving a job without its src and result documents,
+    while status, log and metadata are still present."""
+    jid = await repo.add_job(sample_pdf, "sample.pdf", job_types[0])
+    await repo.add_to_job_log(jid, "debug log entry")
+    await repo.update_job(
+        jid,
+        result=b"TEST",
+        status=JobStatus.SUCCESS,
+        metadata_result=DocumentMetadata(signed=True),
+    )
+    found_job = await repo.find_job(jid, include_blobs=False)
+    assert isinstance(found_job, Job)
+    assert found_job.src == found_job.result == b""
+    assert found_job.status == JobStatus.SUCCESS
+    assert found_job.log == ["debug log entry"]
+    assert isinstance(found_job.metadata_result, DocumentMetadata)
+    assert found_job.metadata_result.signed is True
+    # Blobs are still retrievable afterwards
+    full_job = await repo.find_job(jid)
+    assert isinstance(full_job, Job)
+    assert full_job.src == sample_pdf
+    assert full_job.result == b"TEST"
+
+
 async def test_fetch_all_jobs(
     repo: Repository, sample_pdf: bytes, job_types: List[JobType]
 ) -> None:
     """Adding multiple jobs and fetching all of them at once,
     expecting a list ordered descending by job creation date.
-    For performance reasons, the returned job objects do not contain
+    For performance reasons, jobs are returned as immutable summaries that do not contain
     any metadata, no job log and no source or resulting documents."""
     jids = []
     for i in range(5):
@@ -58,10 +144,13 @@ async def test_fetch_all_jobs(
     assert len(jobs) == 5
     assert list(map(lambda job: job.id, jobs)) == jids
     for job in jobs:
-        assert job.metadata_result is job.metadata_src is None
-        assert job.result == b""
-        assert job.src == b""
-        assert job.log == []
+        assert isinstance(job, JobSummary)
+        assert job.type == job_types[0]
+        assert job.status == JobStatus.CREATED
+        assert job.session_id is None
+        assert not hasattr(job, "log")
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            job.status = JobStatus.SUCCESS  # type: ignore
 
 
 async def test_filter_jobs(
@@ -108,6 +197,101 @@ async def test_filter_jobs(
     }
 
 
+async def test_find_job_summary(
+    repo: Repository, sample_pdf: bytes, job_types: List[JobType]
+) -> None:
+    """Fetching only the summary of a job."""
+    sid = await repo.add_session()
+    jid = await repo.add_job(sample_pdf, "sample.pdf", job_types[0], sid=sid)
+    await repo.update_job(jid, status=JobStatus.RUNNING)
+    summary = await repo.find_job_summary(jid)
+    assert isinstance(summary, JobSummary)
+    assert summary == (await repo.find_jobs(sid))[0]
+    assert summary.status == JobStatus.RUNNING
+    assert summary.type == job_types[0]
+    assert summary.session_id == sid
+    assert await repo.find_job_summary(generate_token()) is None
+
+
+async def test_find_jobs_paginated(
+    repo: Repository, sample_pdf: bytes, job_types: List[JobType]
+) -> None:
+    """Paging through a session's jobs with limit and after (also when filtered by status)."""
+    clock = DummyClock()
+    repo._clock = clock  # type: ignore
+    sid = await repo.add_session()
+    jids = []
+    for i in range(5):
+        jid = await repo.add_job(sample_pdf, "sample.pdf", job_types[0], sid=sid)
+        jids.append(jid)
+        if i % 2 == 0:
+            await repo.update_job(jid, status=JobStatus.SUCCESS)
+        if i == 2:
+            clock.advance(10)
+    await repo.add_job(sample_pdf, "sample.pdf", job_types[0])
+    all_jobs = await repo.find_jobs(sid)
+    # Newest jobs first, jobs created at the same time in insertion order
+    assert [job.id for job in all_jobs] == jids[3:] + jids[:3]
+    assert [job.id for job in await repo.find_jobs(sid, limit=2)] == [
+        job.id for job in all_jobs[:2]
+    ]
+    assert [
+        job.id for job in await repo.find_jobs(sid, after=all_jobs[1].id, limit=2)
+    ] == [job.id for job in all_jobs[2:4]]
+    assert await repo.find_jobs(sid, after=all_jobs[-1].id) == []
+    assert await repo.find_jobs(sid, limit=0) == []
+    # The cursor doesn't have to match the status filter
+    successful_jobs = [job for job in all_jobs if job.status == JobStatus.SUCCESS]
+    assert [
+        job.id
+        for job in await repo.find_jobs(
+            sid, status=[JobStatus.SUCCESS], after=all_jobs[0].id
+        )
+    ] == [job.id for job in successful_jobs if job.id != all_jobs[0].id]
+    with pytest.raises(ValueError):
+        await repo.find_jobs(sid, after=generate_token())
+
+
+async def test_count_jobs(
+    repo: Repository, sample_pdf: bytes, job_types: List[JobType]
+) -> None:
+    """Counting jobs, optionally filtered by session and status."""
+    sid = await repo.add_session()
+    for i in range(3):
+        jid = await repo.add_job(sample_pdf, "sample.pdf", job_types[0], sid=sid)
+        if i == 0:
+            await repo.update_job(jid, status=JobStatus.ERROR)
+    await repo.add_job(sample_pdf, "sample.pdf", job_types[0])
+    assert await repo.count_jobs() == 4
+    assert await repo.count_jobs(sid) == 3
+    assert await repo.count_jobs(status=[JobStatus.CREATED]) == 3
+    assert await repo.count_jobs(sid, [JobStatus.SUCCESS, JobStatus.ERROR]) == 1
+    with pytest.raises(ValueError):
+        await repo.count_jobs(generate_token())
+
+
+async def test_find_session_progress(
+    repo: Repository, sample_pdf: bytes, job_types: List[JobType]
+) -> None:
+    """Finding a session together with the number of its total and finished jobs."""
+    sid = await repo.add_session()
+    progress = await repo.find_session_progress(sid)
+    assert progress is not None
+    assert progress[0].id == sid
+    assert progress[1:] == (0, 0)
+    for status in [JobStatus.SUCCESS, JobStatus.ERROR, JobStatus.RUNNING]:
+        jid = await repo.add_job(sample_pdf, "sample.pdf", job_types[0], sid=sid)
+        await repo.update_job(jid, status=status)
+    await repo.add_job(sample_pdf, "sample.pdf", job_types[0])
+    session = await repo.find_session(sid)
+    assert session is not None
+    progress = await repo.find_session_progress(sid)
+    assert progress is not None
+    assert progress[0].updated == session.updated
+    assert progress[1:] == (3, 2)
+    assert await repo.find_session_progress(generate_token()) is None
+
+
 async def test_update_job(
     repo: Repository, sample_pdf: bytes, job_types: List[JobType]
 ) -> None:
@@ -149,6 +333,23 @@ async def test_update_job(
     assert updated_job.metadata_src.signed is updated_job.metadata_result.signed is True
 
 
+async def test_update_multiple_jobs(
+    repo: Repository, sample_pdf: bytes, job_types: List[JobType]
+) -> None:
+    """Updating the status of multiple jobs at once, either all or none of them."""
+    sid = await repo.add_session()
+    jids = [
+        await repo.add_job(sample_pdf, "sample.pdf", job_types[0], sid=sid),
+        await repo.add_job(sample_pdf, "sample.pdf", job_types[0]),
+    ]
+    await repo.update_jobs(jids, JobStatus.QUEUED)
+    assert await repo.count_jobs(status=[JobStatus.QUEUED]) == 2
+    assert await repo.count_jobs(sid, status=[JobStatus.QUEUED]) == 1
+    with pytest.raises(ValueError):
+        await repo.update_jobs([jids[0], generate_token()], JobStatus.RUNNING)
+    assert await repo.count_jobs(status=[JobStatus.QUEUED]) == 2
+
+
 async def test_update_job_log(
     repo: Repository, sample_pdf: bytes, job_types: List[JobType]
 ) -> None:
@@ -161,6 +362,56 @@ async def test_update_job_log(
     assert found_job.log == ["This is", "logging data"]
 
 
+async def test_update_job_log_with_job_update(
+    repo: Repository, sample_pdf: bytes, job_types: List[JobType]
+) -> None:
+    """Appending multiple log entries as part of a job update."""
+    jid = await repo.add_job(sample_pdf, "sample.pdf", job_types[0])
+    await repo.add_to_job_log(jid, "This is")
+    await repo.update_job(jid, status=JobStatus.SUCCESS, log=["logging", "data"])
+    found_job = await repo.find_job(jid)
+    assert isinstance(found_job, Job)
+    assert found_job.status == JobStatus.SUCCESS
+    assert found_job.log == ["This is", "logging", "data"]
+
+
+async def test_stream_job_result(
+    repo: Repository, sample_pdf: bytes, job_types: List[JobType]
+) -> None:
+    """Retrieving a job's result as stream, either as a whole or in parts."""
+    jid = await repo.add_job(b"TEST", "sample.pdf", job_types[0])
+    await repo.update_job(jid, result=sample_pdf)
+    result = await repo.find_job_result_stream(jid)
+    assert result is not None
+    assert result.digest == hashlib.sha256(sample_pdf).hexdigest()
+    assert result.size == len(sample_pdf)
+    assert b"".join([chunk async for chunk in result.read(0, None)]) == sample_pdf
+    assert b"".join([chunk async for chunk in result.read(10, 20)]) == sample_pdf[10:20]
+    assert await repo.find_job_result_stream("invalid") is None
+
+
+async def test_watch_updates(repo: Repository, job_types: List[JobType]) -> None:
+    """Watchers of jobs and sessions are notified about changes made within this process."""
+    sid = await repo.add_session()
+    session_update = repo.watch_updates(sid)
+    jid = await repo.add_job(b"TEST", "sample.pdf", job_types[0], sid=sid)
+    assert session_update.done()
+    job_update = repo.watch_updates(jid)
+    session_update = repo.watch_updates(sid)
+    other_update = repo.watch_updates("invalid")
+    await repo.update_job(jid, status=JobStatus.RUNNING)
+    assert job_update.done() and session_update.done()
+    assert not other_update.done()
+    # Watching can be stopped by cancelling the returned future
+    other_update.cancel()
+    await asyncio.sleep(0)
+    assert repo._update_watchers == {}
+    job_update = repo.watch_updates(jid)
+    session_update = repo.watch_updates(sid)
+    await repo.delete_session(sid)
+    assert job_update.done() and session_update.done()
+
+
 async def test_delete_job(
     repo: Repository, sample_pdf: bytes, job_types: List[JobType]
 ) -> None:
@@ -0,0 +1,130 @@
+import asyncio
+import io
+from pathlib import Path
+from typing import AsyncIterator, List
+
+from docleaner.api.adapters.blob_store.filesystem_blob_store import (
+    FilesystemBlobStore,
+)
+from docleaner.api.adapters.repository.sqlite_repository import SQLiteRepository
+from docleaner.api.core.job import Job, JobStatus, JobType
+from docleaner.api.services.clock import Clock
+
+
+async def test_persistence(
+    clock: Clock, tmp_path: Path, sample_pdf: bytes, job_types: List[JobType]
+) -> None:
+    """Jobs and sessions survive reopening the database."""
+    blob_store = FilesystemBlobStore(str(tmp_path / "blobs"))
+    repo = SQLiteRepository(clock, job_types, str(tmp_path / "test.db"), blob_store)
+    sid = await repo.add_session()
+    jid = await repo.add_job(sample_pdf, "sample.pdf", job_types[0], sid=sid)
+    await repo.update_job(jid, status=JobStatus.SUCCESS, log=["debug log entry"])
+    await repo.disconnect()
+    repo = SQLiteRepository(clock, job_types, str(tmp_path / "test.db"), blob_store)
+    job = await repo.find_job(jid)
+    assert isinstance(job, Job)
+    assert job.src == sample_pdf
+    assert job.status == JobStatus.SUCCESS
+    assert job.log == ["debug log entry"]
+    assert job.session_id == sid
+    assert await repo.find_session(sid) is not None
+    assert await repo.get_total_job_count() == 1
+    await repo.disconnect()
+
+
+async def test_store_large_documents_out_of_line(
+    clock: Clock, tmp_path: Path, sample_pdf: bytes, job_types: List[JobType]
+) -> None:
+    """Documents exceeding the inline threshold are deduplicated within the blob store,
+    results are available as local files."""
+    repo = SQLiteRepository(
+        clock,
+        job_types,
+        str(tmp_path / "test.db"),
+        FilesystemBlobStore(str(tmp_path / "blobs")),
+        inline_threshold=1024,
+    )
+    jid1 = await repo.add_job(sample_pdf, "sample.pdf", job_types[0])
+    jid2 = await repo.add_job(sample_pdf, "sample.pdf", job_types[0])
+    await repo.update_job(jid1, result=sample_pdf)
+    assert await repo.get_storage_stats() == (3 * len(sample_pdf), len(sample_pdf))
+    result = await repo.find_job_result_stream(jid1)
+    assert result is not None
+    assert result.size == len(sample_pdf)
+    assert result.path is not None
+    with open(result.path, "rb") as f:
+        assert f.read() == sample_pdf
+    assert b"".join([chunk async for chunk in result.read(10, 20)]) == sample_pdf[10:20]
+    await repo.delete_job(jid1)
+    job = await repo.find_job(jid2)
+    assert isinstance(job, Job)
+    assert job.src == sample_pdf
+    await repo.delete_job(jid2)
+    assert await repo.get_storage_stats() == (0, 0)
+    assert not any(p.is_file() for p in (tmp_path / "blobs").rglob("*"))
+    await repo.disconnect()
+
+
+async def test_stream_large_documents_out_of_line(
+    clock: Clock, tmp_path: Path, sample_pdf: bytes, job_types: List[JobType]
+) -> None:
+    """Streamed documents exceeding the inline threshold are written to the blob store
+    chunk by chunk and deduplicated against documents that have been stored before."""
+    repo = SQLiteRepository(
+        clock,
+        job_types,
+        str(tmp_path / "test.db"),
+        FilesystemBlobStore(str(tmp_path / "blobs")),
+        inline_threshold=1024,
+    )
+
+    async def chunks() -> AsyncIterator[bytes]:
+        src = io.BytesIO(sample_pdf)
+        while len(chunk := src.read(512)) > 0:
+            yield chunk
+
+    jid1 = await repo.add_job_from_stream(chunks(), "sample.pdf", job_types[0])
+    jid2 = await repo.add_job(sample_pdf, "sample.pdf", job_types[0])
+    jid3 = await repo.add_job_from_stream(chunks(), "sample.pdf", job_types[0])
+    assert await repo.get_storage_stats() == (3 * len(sample_pdf), len(sample_pdf))
+    assert len([p for p in (tmp_path / "blobs").rglob("*") if p.is_file()]) == 1
+    for jid in [jid1, jid2, jid3]:
+        job = await repo.find_job(jid)
+        assert isinstance(job, Job)
+        assert job.src == sample_pdf
+        await repo.delete_job(jid)
+    assert not any(p.is_file() for p in (tmp_path / "blobs").rglob("*"))
+    await repo.disconnect()
+
+
+async def test_store_blob_while_deleting_it(
+    clock: Clock, tmp_path: Path, sample_pdf: bytes, job_types: List[JobType]
+) -> None:
+    """Blobs that are stored again while being deleted are kept."""
+
+    class SlowBlobStore(FilesystemBlobStore):
+        async def delete(self, key: str) -> None:
+            await asyncio.sleep(0.01)
+            await super().delete(key)
+
+    repo = SQLiteRepository(
+        clock,
+        job_types,
+        str(tmp_path / "test.db"),
+        SlowBlobStore(str(tmp_path / "blobs")),
+        inline_threshold=1024,
+    )
+    jid = await repo.add_job(sample_pdf, "sample.pdf", job_types[0])
+    for _ in range(10):
+        _, jid = await asyncio.gather(
+            repo.delete_job(jid),
+            repo.add_job(sample_pdf, "sample.pdf", job_types[0]),
+        )
+        job = await repo.find_job(jid)
+        assert isinstance(job, Job)
+        assert job.src == sample_pdf
+    assert await repo.get_storage_stats() == (len(sample_pdf), len(sample_pdf))
+    await repo.delete_job(jid)
+    assert not any(p.is_file() for p in (tmp_path / "blobs").rglob("*"))
+    await repo.disconnect()
@@ -0,0 +1,79 @@
+from typing import AsyncIterator, Iterator, List
+
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+import pytest
+
+from docleaner.api.adapters.repository.memory_repository import MemoryRepository
+from docleaner.api.adapters.tracing.otel import init_tracing
+from docleaner.api.core.job import JobType
+from docleaner.api.services.clock import Clock
+from docleaner.api.services.file_identifier import FileIdentifier
+from docleaner.api.services.job_queue import JobQueue
+from docleaner.api.services.jobs import await_job, create_job
+from docleaner.api.services.repository import Repository
+
+_exporter = InMemorySpanExporter()
+
+
+@pytest.fixture
+def spans() -> Iterator[InMemorySpanExporter]:
+    # The global tracer provider can only be set once per process
+    if not isinstance(trace.get_tracer_provider(), TracerProvider):
+        provider = TracerProvider()
+        provider.add_span_processor(SimpleSpanProcessor(_exporter))
+        trace.set_tracer_provider(provider)
+    _exporter.clear()
+    yield _exporter
+    _exporter.clear()
+
+
+async def test_job_processing_joins_creation_trace(
+    spans: InMemorySpanExporter,
+    sample_pdf: bytes,
+    repo: Repository,
+    queue: JobQueue,
+    file_identifier: FileIdentifier,
+    job_types: List[JobType],
+) -> None:
+    """Queueing and processing of a job are traced within the trace of its creation."""
+    jid, _ = await create_job(
+        sample_pdf, "sample.pdf", repo, queue, file_identifier, job_types
+    )
+    await await_job(jid, repo)
+    finished = {s.name: s for s in spans.get_finished_spans()}
+    trace_id = finished["create_job"].context.trace_id
+    for name in [
+        "AsyncJobQueue.enqueue",
+        "AsyncJobQueue.dequeue",
+        "process_job_in_sandbox",
+        f"{type(repo).__name__}.add_job",
+        f"{type(repo).__name__}.update_job",
+    ]:
+        assert finished[name].context.trace_id == trace_id
+    job = await repo.find_job(jid, include_blobs=False)
+    assert job is not None
+    assert len(job.params.trace_context) > 0
+
+
+async def test_nested_repository_operations_are_traced_once(
+    spans: InMemorySpanExporter,
+    clock: Clock,
+    sample_pdf: bytes,
+    job_types: List[JobType],
+) -> None:
+    """Repository operations invoked by other operations don't open a span of their own."""
+    repo = MemoryRepository(clock)
+
+    async def chunks() -> AsyncIterator[bytes]:
+        yield sample_pdf
+
+    await repo.add_jobs([(chunks(), "sample.pdf", job_types[0])])
+    assert [s.name for s in spans.get_finished_spans()] == ["MemoryRepository.add_jobs"]
+
+
+def test_init_tracing_with_invalid_exporter() -> None:
+    with pytest.raises(ValueError):
+        init_tracing("invalid")
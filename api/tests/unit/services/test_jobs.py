@@ -1,5 +1,7 @@
+import asyncio
 from datetime import timedelta
-from typing import List
+import io
+from typing import AsyncIterator, List
 
 import magic
 import pytest
@@ -12,13 +14,18 @@ from docleaner.api.services.job_queue import JobQueue
 from docleaner.api.services.jobs import (
     await_job,
     create_job,
+    create_job_from_stream,
+    create_jobs_from_streams,
     get_job,
     get_jobs,
     get_job_src,
     get_job_result,
+    get_job_result_stream,
     get_job_stats,
+    get_job_status,
     delete_job,
     purge_jobs,
+    watch_job,
 )
 from docleaner.api.services.repository import Repository
 from docleaner.api.services.sessions import create_session
@@ -56,6 +63,70 @@ async def test_process_pdf_job(
     assert result != sample_pdf
 
 
+async def test_process_pdf_job_from_stream(
+    sample_pdf: bytes,
+    repo: Repository,
+    queue: JobQueue,
+    file_identifier: FileIdentifier,
+    job_types: List[JobType],
+) -> None:
+    """Creating a PDF cleaning job from a stream of chunks, e.g. an upload
+    that is never read into memory as a whole."""
+
+    async def chunks() -> AsyncIterator[bytes]:
+        src = io.BytesIO(sample_pdf)
+        while len(chunk := src.read(1024)) > 0:
+            yield chunk
+
+    jid, job_type = await create_job_from_stream(
+        chunks(), "sample.pdf", repo, queue, file_identifier, job_types
+    )
+    assert job_type == job_types[0]
+    result_status, _, _, _, _ = await await_job(jid, repo)
+    assert result_status == JobStatus.SUCCESS
+    assert await get_job_src(jid, repo) == (sample_pdf, "sample.pdf")
+
+
+async def test_process_batch_of_pdf_jobs(
+    sample_pdf: bytes,
+    repo: Repository,
+    queue: JobQueue,
+    file_identifier: FileIdentifier,
+    job_types: List[JobType],
+) -> None:
+    """Creating multiple PDF cleaning jobs within a session at once."""
+
+    async def chunks(data: bytes) -> AsyncIterator[bytes]:
+        yield data
+
+    sid = await create_session(repo)
+    jobs = await create_jobs_from_streams(
+        [(chunks(sample_pdf), "a.pdf"), (chunks(sample_pdf), "b.pdf")],
+        repo,
+        queue,
+        file_identifier,
+        job_types,
+        sid=sid,
+    )
+    assert [job_type for _, job_type in jobs] == [job_types[0], job_types[0]]
+    for jid, _ in jobs:
+        result_status, _, _, _, _ = await await_job(jid, repo)
+        assert result_status == JobStatus.SUCCESS
+    # Batches with unsupported documents are rejected as a whole
+    with pytest.raises(ValueError, match=r".*Unsupported document.*"):
+        await create_jobs_from_streams(
+            [(chunks(sample_pdf), "a.pdf"), (chunks(b"INVALID"), "b.pdf")],
+            repo,
+            queue,
+            file_identifier,
+            job_types,
+            sid=sid,
+        )
+    assert len(await repo.find_jobs(sid)) == 2
+    with pytest.raises(ValueError):
+        await create_jobs_from_streams([], repo, queue, file_identifier, job_types)
+
+
 async def test_process_invalid_job(
     repo: Repository,
     queue: JobQueue,
@@ -107,6 +178,59 @@ async def test_await_twice(
         assert x == y
 
 
+async def test_await_job_with_timeout(
+    sample_pdf: bytes, repo: Repository, job_types: List[JobType]
+) -> None:
+    """Awaiting a job that doesn't finish in time returns its current state after the timeout."""
+    jid = await repo.add_job(sample_pdf, "sample.pdf", job_types[0])
+    result_status, result_type, _, _, _ = await await_job(jid, repo, timeout=0.05)
+    assert result_status == JobStatus.CREATED
+    assert result_type == job_types[0]
+
+    async def finish_job() -> None:
+        await asyncio.sleep(0.05)
+        await repo.update_job(jid, status=JobStatus.SUCCESS)
+
+    # Returns as soon as the job has finished
+    finisher = asyncio.create_task(finish_job())
+    result_status, _, _, _, _ = await await_job(jid, repo, timeout=10)
+    assert result_status == JobStatus.SUCCESS
+    await finisher
+
+
+async def test_watch_job(
+    sample_pdf: bytes,
+    repo: Repository,
+    queue: JobQueue,
+    file_identifier: FileIdentifier,
+    job_types: List[JobType],
+) -> None:
+    """Watching a job yields its status whenever it changes until the job has finished."""
+    jid, _ = await create_job(
+        sample_pdf, "sample.pdf", repo, queue, file_identifier, job_types
+    )
+    statuses = [status async for status in watch_job(jid, repo)]
+    assert statuses[-1] == JobStatus.SUCCESS
+    assert statuses == sorted({s for s in statuses if s is not None})
+    # Watching a finished job whose status is already known doesn't yield anything
+    assert [status async for status in watch_job(jid, repo, JobStatus.SUCCESS)] == []
+    with pytest.raises(ValueError, match=r".*does not exist.*"):
+        await anext(watch_job("invalid", repo))
+
+
+async def test_watch_job_without_notifications(
+    repo: Repository, job_types: List[JobType]
+) -> None:
+    """Watching a job that isn't updated yields None after each interval."""
+    jid = await repo.add_job(b"TEST", "sample.pdf", job_types[0])
+    watcher = watch_job(jid, repo, interval=0.01)
+    assert await anext(watcher) == JobStatus.CREATED
+    assert await anext(watcher) is None
+    await watcher.aclose()
+    await asyncio.sleep(0)
+    assert repo._update_watchers == {}
+
+
 async def test_get_unfinished_job_details(
     sample_pdf: bytes, repo: Repository, job_types: List[JobType]
 ) -> None:
@@ -119,6 +243,23 @@ async def test_get_unfinished_job_details(
     assert job_type == job_types[0]
 
 
+async def test_get_job_status(
+    sample_pdf: bytes, repo: Repository, job_types: List[JobType]
+) -> None:
+    """Retrieving only the status (and timestamps) of a job."""
+    clock = DummyClock()
+    repo._clock = clock  # type: ignore
+    jid = await repo.add_job(sample_pdf, "sample.pdf", job_types[0])
+    clock.advance(10)
+    await repo.update_job(jid, status=JobStatus.QUEUED)
+    job_status, job_type, created, updated = await get_job_status(jid, repo)
+    assert job_status == JobStatus.QUEUED
+    assert job_type == job_types[0]
+    assert updated - created == timedelta(seconds=10)
+    with pytest.raises(ValueError):
+        await get_job_status("invalid", repo)
+
+
 async def test_get_finished_job_details(
     sample_pdf: bytes,
     repo: Repository,
@@ -198,6 +339,8 @@ async def test_get_unfinished_job_result(
     jid = await repo.add_job(sample_pdf, "sample.pdf", job_types[0])
     with pytest.raises(ValueError, match=r".*didn't complete.*"):
         await get_job_result(jid, repo)
+    with pytest.raises(ValueError, match=r".*didn't complete.*"):
+        await get_job_result_stream(jid, repo)
 
 
 async def test_get_job_stats(
@@ -208,7 +351,7 @@ async def test_get_job_stats(
     job_types: List[JobType],
 ) -> None:
     """Retrieving global job statistics."""
-    assert await get_job_stats(repo) == (0, 0, 0, 0, 0, 0)
+    assert await get_job_stats(repo) == (0, 0, 0, 0, 0, 0, 1.0)
     finished_jid, _ = await create_job(
         sample_pdf, "sample.pdf", repo, queue, file_identifier, job_types
     )
@@ -218,7 +361,7 @@ async def test_get_job_stats(
     await repo.add_job(sample_pdf, "sample.pdf", job_types[0])  # in CREATED state
     queued_jid = await repo.add_job(sample_pdf, "sample.pdf", job_types[0])
     await repo.update_job(queued_jid, status=JobStatus.QUEUED)
-    assert await get_job_stats(repo) == (4, 1, 1, 1, 1, 0)
+    assert await get_job_stats(repo) == (4, 1, 1, 1, 1, 0, 1.0)
 
 
 async def test_delete_jobs(
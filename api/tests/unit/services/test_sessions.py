@@ -4,6 +4,7 @@ from typing import List
 import pytest
 
 from docleaner.api.adapters.clock.dummy_clock import DummyClock
+from docleaner.api.adapters.sandbox.dummy_sandbox import DummySandbox
 from docleaner.api.core.job import JobStatus, JobType
 from docleaner.api.services.file_identifier import FileIdentifier
 from docleaner.api.services.job_queue import JobQueue
@@ -13,8 +14,11 @@ from docleaner.api.services.sessions import (
     await_session,
     create_session,
     get_session,
+    get_session_progress,
+    get_session_results,
     delete_session,
     purge_sessions,
+    watch_session,
 )
 from docleaner.api.utils import generate_token
 
@@ -56,6 +60,95 @@ async def test_process_multiple_jobs_via_session(
     assert len(result) > 0
 
 
+async def test_get_session_with_paginated_jobs(
+    sample_pdf: bytes, repo: Repository, job_types: List[JobType]
+) -> None:
+    """Paging through the job list of a session while its job counters cover all jobs."""
+    sid = await create_session(repo)
+    jids = [
+        await repo.add_job(sample_pdf, "sample.pdf", job_types[0], sid=sid)
+        for _ in range(3)
+    ]
+    await repo.update_job(jids[1], status=JobStatus.SUCCESS)
+    _, _, total_jobs, finished_jobs, jobs = await get_session(sid, repo, limit=2)
+    assert (total_jobs, finished_jobs) == (3, 1)
+    assert len(jobs) == 2
+    _, _, _, _, next_jobs = await get_session(sid, repo, limit=2, after=jobs[-1][0])
+    assert {job[0] for job in jobs + next_jobs} == set(jids)
+    _, _, _, _, successful_jobs = await get_session(
+        sid, repo, status=[JobStatus.SUCCESS]
+    )
+    assert [job[0] for job in successful_jobs] == [jids[1]]
+
+
+async def test_await_session_with_timeout(
+    sample_pdf: bytes, repo: Repository, job_types: List[JobType]
+) -> None:
+    """Awaiting a session with unfinished jobs returns after the timeout."""
+    sid = await create_session(repo)
+    jid = await repo.add_job(sample_pdf, "sample.pdf", job_types[0], sid=sid)
+    await await_session(sid, repo, timeout=0.05)
+    _, _, total_jobs, finished_jobs, _ = await get_session(sid, repo)
+    assert (total_jobs, finished_jobs) == (1, 0)
+    await repo.update_job(jid, status=JobStatus.ERROR)
+    await await_session(sid, repo, timeout=10)
+    with pytest.raises(ValueError):
+        await await_session(generate_token(), repo)
+
+
+async def test_get_session_results(
+    sample_pdf: bytes,
+    repo: Repository,
+    queue: JobQueue,
+    file_identifier: FileIdentifier,
+    job_types: List[JobType],
+) -> None:
+    """Retrieving the results of all successfully completed jobs of a session."""
+    sid = await create_session(repo)
+    jid, _ = await create_job(
+        sample_pdf, "sample.pdf", repo, queue, file_identifier, job_types, sid=sid
+    )
+    await await_job(jid, repo)
+    # Unfinished jobs are skipped
+    await repo.add_job(sample_pdf, "unfinished.pdf", job_types[0], sid=sid)
+    results = [result async for result in await get_session_results(sid, repo)]
+    assert len(results) == 1
+    result, document_name = results[0]
+    assert document_name == "sample.pdf"
+    expected_result, _ = await get_job_result(jid, repo)
+    assert b"".join([chunk async for chunk in result.read(0, None)]) == expected_result
+    with pytest.raises(ValueError):
+        await get_session_results(generate_token(), repo)
+
+
+async def test_watch_session(
+    sample_pdf: bytes,
+    repo: Repository,
+    queue: JobQueue,
+    file_identifier: FileIdentifier,
+    job_types: List[JobType],
+) -> None:
+    """Watching a session yields its progress whenever one of its jobs changes."""
+    sid = await create_session(repo)
+    progress_id, jobs_total, jobs_finished = await get_session_progress(sid, repo)
+    assert jobs_total == jobs_finished == 0
+    watcher = watch_session(sid, repo, progress_id)
+    await create_job(
+        sample_pdf, "sample.pdf", repo, queue, file_identifier, job_types, sid=sid
+    )
+    progress = await anext(watcher)
+    assert progress is not None and progress[0] != progress_id and progress[1] == 1
+    while progress is None or progress[2] == 0:
+        progress = await anext(watcher)
+    assert progress[1:] == (1, 1)
+    assert progress == await get_session_progress(sid, repo)
+    # Deleting the session ends the stream
+    await delete_session(sid, repo)
+    assert [progress async for progress in watcher] == []
+    with pytest.raises(ValueError):
+        await anext(watch_session(sid, repo))
+
+
 async def test_get_unfinished_session_details(
     sample_pdf: bytes, repo: Repository, job_types: List[JobType]
 ) -> None:
@@ -155,6 +248,7 @@ async def test_purge_sessions(
     queue: JobQueue,
     file_identifier: FileIdentifier,
     job_types: List[JobType],
+    sandbox: DummySandbox,
 ) -> None:
     """Purge finished (all associated jobs in SUCCESS or ERROR state) sessions
     after some time of inactivity. Standalone jobs - not associated with a session - are ignored.
@@ -171,12 +265,14 @@ async def test_purge_sessions(
     )
     await await_job(finished_jid, repo)
     # Job that remains in QUEUED state
+    await sandbox.halt()
     await create_job(
         sample_pdf, "sample.pdf", repo, queue, file_identifier, job_types, sid=sid
     )
     clock.advance(60)
     purged_sids = await purge_sessions(timedelta(seconds=30), repo)
     assert len(purged_sids) == 0  # Session is not stale, there is still a queued job
+    await sandbox.resume()
     await await_session(sid, repo)
     clock.advance(60)
     purged_sids = await purge_sessions(timedelta(seconds=30), repo)